@@ -0,0 +1,423 @@
+"""跨组件统计分析
+
+把所有组件的记录扫描一次，整理成按时间排序的列式表（每一列是一个
+array），再在上面做分组汇总、时间范围过滤和滑动窗口计算。分组键都是
+建表时算好的整数编码列（日、周、月也是），安装了 numpy 时用 unique 和
+bincount 整列汇总，否则逐行累加编码，最后才把编码换成日期或名称。
+
+命令行示例：
+    python analytics.py --group-by week,category --value actual --start 2024-01-01
+    python analytics.py --group-by period --value score --agg mean
+    python analytics.py --rolling 7 --value actual --category 学习
+"""
+import argparse
+import bisect
+import itertools
+import math
+import sys
+import threading
+from array import array
+from datetime import date, datetime, timedelta
+from instrumentation import metrics
+from stats_cache import record_minutes, record_score
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+SECONDS_PER_DAY = 86400
+
+VALUE_COLUMNS = ('actual', 'estimated', 'score', 'count')
+GROUP_KEYS = ('day', 'week', 'month', 'category', 'period', 'activity', 'component')
+AGGREGATES = ('sum', 'mean', 'count')
+
+
+def parse_timestamp(timestamp):
+    """把 "YYYY-MM-DD HH:MM:SS" 转成从公元 1 年起的秒数，无法解析时返回 None"""
+    try:
+        dt = datetime.fromisoformat(str(timestamp))
+    except ValueError:
+        return None
+    return dt.toordinal() * SECONDS_PER_DAY + dt.hour * 3600 + dt.minute * 60 + dt.second
+
+
+def to_seconds(value):
+    """把日期字符串或 date/datetime 转成与 parse_timestamp 相同的秒数"""
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        value = value.strftime("%Y-%m-%d %H:%M:%S")
+    elif isinstance(value, date):
+        value = value.isoformat()
+    seconds = parse_timestamp(value)
+    if seconds is None:
+        raise ValueError(f"无法识别的日期: {value}")
+    return seconds
+
+
+def _day_label(ordinal):
+    return date.fromordinal(ordinal).isoformat()
+
+
+def _month_label(code):
+    return f"{code // 12:04d}-{code % 12 + 1:02d}"
+
+
+def _parse_minutes(value):
+    text = str(value or '').strip()
+    return int(text) if text.isdigit() else 0
+
+
+class RecordTable:
+    """列式记录表：所有列按时间戳升序排列
+
+    ts          从公元 1 年起的秒数
+    day         日期的序数（date.toordinal）
+    week        所在周星期一的序数
+    month       年 * 12 + 月 - 1
+    component   组件编号（component_ids 的下标）
+    category    类别编号（categories 的下标）
+    period      时间段编号（periods 的下标）
+    activity    活动名编号（activities 的下标）
+    actual      实际时间（分钟）
+    estimated   预估时间（分钟）
+    score       体验感，缺失时为 NaN
+    """
+
+    def __init__(self):
+        self.ts = array('q')
+        self.day = array('i')
+        self.week = array('i')
+        self.month = array('i')
+        self.component = array('i')
+        self.category = array('i')
+        self.period = array('i')
+        self.activity = array('i')
+        self.actual = array('i')
+        self.estimated = array('i')
+        self.score = array('d')
+        self.component_ids = []
+        self.categories = []
+        self.periods = []
+        self.activities = []
+
+    def __len__(self):
+        return len(self.ts)
+
+    @classmethod
+    def build(cls, components):
+        """从 (component_id, records) 序列构建，记录只需遍历一次"""
+        rows = []
+        dictionaries = ({}, {}, {}, {})
+
+        def encode(dictionary, value):
+            code = dictionary.get(value)
+            if code is None:
+                code = dictionary[value] = len(dictionary)
+            return code
+
+        for component_id, records in components:
+            component_code = encode(dictionaries[0], component_id)
+            for record in records:
+                ts = parse_timestamp(record.get('timestamp'))
+                if ts is None:
+                    continue
+                score = record_score(record)
+                rows.append((
+                    ts,
+                    component_code,
+                    encode(dictionaries[1], record.get('类别') or ''),
+                    encode(dictionaries[2], record.get('时间段') or ''),
+                    encode(dictionaries[3], (record.get('活动') or '').strip()),
+                    record_minutes(record),
+                    _parse_minutes(record.get('预估时间')),
+                    math.nan if score is None else score,
+                ))
+
+        rows.sort(key=lambda row: row[0])
+        table = cls()
+        if rows:
+            columns = list(zip(*rows))
+            table.ts = array('q', columns[0])
+            table.component = array('i', columns[1])
+            table.category = array('i', columns[2])
+            table.period = array('i', columns[3])
+            table.activity = array('i', columns[4])
+            table.actual = array('i', columns[5])
+            table.estimated = array('i', columns[6])
+            table.score = array('d', columns[7])
+            table._build_calendar()
+        table.component_ids, table.categories, table.periods, table.activities = (
+            list(dictionary) for dictionary in dictionaries
+        )
+        return table
+
+    def _build_calendar(self):
+        """由时间戳算出日、周、月的编码列（月份按日期缓存，每个日期只换算一次）"""
+        self.day = array('i', (ts // SECONDS_PER_DAY for ts in self.ts))
+        # 公元 1 年 1 月 1 日是星期一
+        self.week = array('i', (ordinal - (ordinal - 1) % 7 for ordinal in self.day))
+        months = {}
+
+        def month(ordinal):
+            code = months.get(ordinal)
+            if code is None:
+                day = date.fromordinal(ordinal)
+                code = months[ordinal] = day.year * 12 + day.month - 1
+            return code
+
+        self.month = array('i', map(month, self.day))
+
+    def row_range(self, start=None, end=None):
+        """时间范围 [start, end) 对应的行区间（二分查找）"""
+        lo = 0 if start is None else bisect.bisect_left(self.ts, to_seconds(start))
+        hi = len(self.ts) if end is None else bisect.bisect_left(self.ts, to_seconds(end))
+        return lo, max(lo, hi)
+
+    def _key_column(self, key):
+        """分组键的 (编码列, 编码 -> 显示值)"""
+        if key == 'day':
+            return self.day, _day_label
+        if key == 'week':
+            return self.week, _day_label
+        if key == 'month':
+            return self.month, _month_label
+        if key == 'category':
+            return self.category, self.categories.__getitem__
+        if key == 'period':
+            return self.period, self.periods.__getitem__
+        if key == 'activity':
+            return self.activity, self.activities.__getitem__
+        if key == 'component':
+            return self.component, self.component_ids.__getitem__
+        raise ValueError(f"未知的分组键: {key}")
+
+    def _conditions(self, category=None, component_id=None):
+        """按类别/组件过滤的 [(编码列, 编码)]，没有符合条件的行时返回 None"""
+        conditions = []
+        if category is not None:
+            if category not in self.categories:
+                return None
+            conditions.append((self.category, self.categories.index(category)))
+        if component_id is not None:
+            if component_id not in self.component_ids:
+                return None
+            conditions.append((self.component, self.component_ids.index(component_id)))
+        return conditions
+
+    def group_by(self, keys, value='actual', agg='sum', start=None, end=None, category=None, component_id=None):
+        """按一个或多个键分组汇总，返回 {分组键: 结果}，键按顺序排列
+
+        keys  分组键，取自 GROUP_KEYS，多个键时结果的键是元组
+        value actual / estimated / score / count
+        agg   sum / mean / count（mean 忽略缺失的体验感）
+        """
+        if isinstance(keys, str):
+            keys = [keys]
+        if value not in VALUE_COLUMNS:
+            raise ValueError(f"未知的数值列: {value}")
+        if agg not in AGGREGATES:
+            raise ValueError(f"未知的汇总方式: {agg}")
+
+        key_columns = [self._key_column(key) for key in keys]
+        codes = [column for column, _ in key_columns]
+        column = None if value == 'count' else getattr(self, value)
+        conditions = self._conditions(category, component_id)
+        lo, hi = self.row_range(start, end)
+        if conditions is None or lo >= hi:
+            return {}
+
+        aggregate = _aggregate_numpy if numpy is not None else _aggregate_python
+        groups = aggregate(codes, column, conditions, lo, hi)
+
+        labels = [label for _, label in key_columns]
+        result = {}
+        for k, (total, count) in groups.items():
+            if len(labels) == 1:
+                k = labels[0](k)
+            else:
+                k = tuple(label(code) for label, code in zip(labels, k))
+            if agg == 'sum':
+                result[k] = total
+            elif agg == 'count':
+                result[k] = count
+            else:
+                result[k] = total / count
+        return dict(sorted(result.items()))
+
+    def rolling(self, window_days, value='actual', agg='sum', start=None, end=None, category=None, component_id=None):
+        """按天计算滑动窗口（窗口包含当天及之前 window_days-1 天），返回 [(日期, 结果)]"""
+        daily_sums = self.group_by('day', value, 'sum', start, end, category, component_id)
+        daily_counts = self.group_by('day', value, 'count', start, end, category, component_id)
+        if not daily_sums:
+            return []
+
+        first = date.fromisoformat(min(daily_sums))
+        if start is not None:
+            first = min(first, date.fromordinal(to_seconds(start) // SECONDS_PER_DAY))
+        last = date.fromisoformat(max(daily_sums))
+        result = []
+        window_sum = 0
+        window_count = 0
+        days = (last - first).days + 1
+        for offset in range(days):
+            day = (first + timedelta(days=offset)).isoformat()
+            window_sum += daily_sums.get(day, 0)
+            window_count += daily_counts.get(day, 0)
+            if offset >= window_days:
+                dropped = (first + timedelta(days=offset - window_days)).isoformat()
+                window_sum -= daily_sums.get(dropped, 0)
+                window_count -= daily_counts.get(dropped, 0)
+            if agg == 'mean':
+                result.append((day, window_sum / window_count if window_count else None))
+            elif agg == 'count':
+                result.append((day, window_count))
+            else:
+                result.append((day, window_sum))
+        return result
+
+
+def _aggregate_python(codes, column, conditions, lo, hi):
+    """逐行累加，返回 {编码或编码元组: (合计, 条数)}"""
+    keys = codes[0][lo:hi] if len(codes) == 1 else zip(*(c[lo:hi] for c in codes))
+    values = itertools.repeat(1) if column is None else column[lo:hi]
+    wanted = [code for _, code in conditions]
+    sums = {}
+    counts = {}
+    for k, v, *tested in zip(keys, values, *(c[lo:hi] for c, _ in conditions)):
+        if tested != wanted:
+            continue
+        if v != v:  # NaN：缺失的体验感
+            continue
+        sums[k] = sums.get(k, 0) + v
+        counts[k] = counts.get(k, 0) + 1
+    return {k: (sums[k], counts[k]) for k in sums}
+
+
+def _aggregate_numpy(codes, column, conditions, lo, hi):
+    """整列汇总：unique 把分组键压成连续编号，bincount 求合计和条数；结果同 _aggregate_python"""
+    def view(c):
+        return numpy.frombuffer(c, dtype=c.typecode)[lo:hi]
+
+    mask = None
+    for c, code in conditions:
+        selected = view(c) == code
+        mask = selected if mask is None else mask & selected
+    values = None if column is None else view(column)
+    if values is not None and values.dtype.kind == 'f':
+        present = ~numpy.isnan(values)  # 缺失的体验感
+        mask = present if mask is None else mask & present
+    keys = [view(c) for c in codes]
+    if mask is not None:
+        keys = [k[mask] for k in keys]
+        values = None if values is None else values[mask]
+    if not len(keys[0]):
+        return {}
+
+    # 多个键逐个合并成一个组合编号，每次合并后重新压成连续编号，不会溢出
+    _, combined = numpy.unique(keys[0], return_inverse=True)
+    for k in keys[1:]:
+        distinct, inverse = numpy.unique(k, return_inverse=True)
+        _, combined = numpy.unique(combined * len(distinct) + inverse, return_inverse=True)
+    _, first, groups = numpy.unique(combined, return_index=True, return_inverse=True)
+    counts = numpy.bincount(groups).tolist()
+    if values is None:
+        sums = counts
+    else:
+        sums = numpy.bincount(groups, weights=values).tolist()
+        if values.dtype.kind != 'f':
+            sums = [int(round(total)) for total in sums]
+    group_codes = [k[first].tolist() for k in keys]
+    group_keys = group_codes[0] if len(keys) == 1 else zip(*group_codes)
+    return {k: (total, count) for k, total, count in zip(group_keys, sums, counts)}
+
+
+class Analytics:
+    """在 DataManager 之上维护列式表，记录变化后下次查询时重建
+
+    table() 可能在后台线程中调用，invalidate() 在主线程中由注册表事件触发。
+    """
+
+    def __init__(self, data_manager):
+        self.data_manager = data_manager
+        self._lock = threading.Lock()
+        self._table = None
+        # 每次失效时递增，防止过期的后台扫描覆盖新数据
+        self._generation = 0
+        data_manager.registry.subscribe('records_changed', self.invalidate)
+        data_manager.registry.subscribe('component_removed', self.invalidate)
+
+    def invalidate(self, component_id=None, *args):
+        with self._lock:
+            self._table = None
+            self._generation += 1
+
+    def table(self):
+        """获取列式表（需要时扫描所有组件一次）"""
+        with self._lock:
+            table = self._table
+            generation = self._generation
+        if table is not None:
+            return table
+        with metrics.span('analytics.build_table'):
+            table = RecordTable.build(
+                (key, self.data_manager.open_component_records(key))
+                for key in self.data_manager.storage.list_keys()
+            )
+        with self._lock:
+            if self._generation == generation:
+                self._table = table
+        return table
+
+    def group_by(self, *args, **kwargs):
+        return self.table().group_by(*args, **kwargs)
+
+    def rolling(self, *args, **kwargs):
+        return self.table().rolling(*args, **kwargs)
+
+
+def main(argv=None):
+    from data_manager import DataManager
+    from storage import STORAGE_BACKENDS
+
+    parser = argparse.ArgumentParser(description="跨组件统计分析")
+    parser.add_argument("--data-dir", default="data", help="数据目录")
+    parser.add_argument("--backend", choices=sorted(STORAGE_BACKENDS), default="journal", help="数据存储后端")
+    query = parser.add_mutually_exclusive_group(required=True)
+    query.add_argument("--group-by", help=f"逗号分隔的分组键：{', '.join(GROUP_KEYS)}")
+    query.add_argument("--rolling", type=int, metavar="DAYS", help="按天计算的滑动窗口长度")
+    parser.add_argument("--value", choices=VALUE_COLUMNS, default="actual", help="汇总的数值列")
+    parser.add_argument("--agg", choices=AGGREGATES, default="sum", help="汇总方式")
+    parser.add_argument("--start", help="起始日期（含）")
+    parser.add_argument("--end", help="结束日期（不含）")
+    parser.add_argument("--category", help="只统计某个类别")
+    parser.add_argument("--component", help="只统计某个组件")
+    args = parser.parse_args(argv)
+
+    data_manager = DataManager(data_dir=args.data_dir, backend=args.backend)
+    try:
+        analytics = Analytics(data_manager)
+        if args.group_by:
+            rows = analytics.group_by(
+                args.group_by.split(','), args.value, args.agg,
+                args.start, args.end, args.category, args.component
+            ).items()
+        else:
+            rows = analytics.rolling(
+                args.rolling, args.value, args.agg,
+                args.start, args.end, args.category, args.component
+            )
+        for key, result in rows:
+            label = " | ".join(key) if isinstance(key, tuple) else key
+            print(f"{label or '(空)'}\t{'' if result is None else round(result, 2)}")
+    except ValueError as e:
+        print(f"错误: {e}", file=sys.stderr)
+        return 1
+    finally:
+        data_manager.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,315 @@
+"""归档格式：不再编辑的组件的紧凑只读存储
+
+文件结构：
+    MAGIC(4) VERSION(1) CODEC(1)
+    数据块 × N      每块最多 BLOCK_SIZE 条记录，按列存放后压缩
+    目录            压缩的 JSON：字段表、总条数、每块的
+                    [偏移, 长度, 条数, 最早时间戳, 最晚时间戳]
+                    以及按时间戳倒序的记录顺序（分段表示）
+    目录长度(8) MAGIC(4)
+
+字段名只在目录的字段表中出现一次。每块是一个 JSON 数组，第 i 个元素是
+字段表第 i 个字段在这些记录中的取值（记录没有该字段时为 null），同一列的
+值放在一起压缩率更高。读取时只解压需要的块，可以逐块遍历或按时间范围
+跳过不相关的块，不必把整个文件解压进内存。open_archive() 返回按块解压
+的记录序列，只保留最近用到的几块，详细视图和统计读取归档都不需要解压
+整个文件。
+
+安装了 zstandard 时使用 zstd 压缩，否则使用 zlib；读取时按文件头选择。
+"""
+import bisect
+import io
+import json
+import os
+import struct
+import threading
+import zlib
+from array import array
+from collections import OrderedDict
+from collections.abc import MutableSequence
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+MAGIC = b"LTAR"
+VERSION = 1
+CODEC_ZLIB = 1
+CODEC_ZSTD = 2
+BLOCK_SIZE = 512
+HEADER = struct.Struct("<4sBB")
+FOOTER = struct.Struct("<Q4s")
+# ArchiveRecords 缓存的最近解压的块数
+BLOCK_CACHE = 4
+
+
+class ArchiveError(ValueError):
+    """归档文件损坏或格式不支持"""
+
+
+def _compress(data, codec):
+    if codec == CODEC_ZSTD:
+        return zstandard.ZstdCompressor(level=19).compress(data)
+    return zlib.compress(data, 9)
+
+
+def _decompress(data, codec):
+    if codec == CODEC_ZSTD:
+        if zstandard is None:
+            raise ArchiveError("归档使用 zstd 压缩，需要安装 zstandard")
+        return zstandard.ZstdDecompressor().decompress(data)
+    if codec == CODEC_ZLIB:
+        return zlib.decompress(data)
+    raise ArchiveError(f"未知的压缩方式: {codec}")
+
+
+def _dumps(value):
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def _newest_first(timestamps):
+    """按时间戳倒序的下标（与 storage.sort_newest_first 的稳定排序一致）"""
+    return sorted(range(len(timestamps)), key=timestamps.__getitem__, reverse=True)
+
+
+def _runs(order):
+    """把下标序列压缩为 [起点, 个数, 步长] 分段（按时间先后写入的记录只有一段或几段）"""
+    runs = []
+    for i in order:
+        if runs:
+            run = runs[-1]
+            if run[1] == 1 and abs(i - run[0]) == 1:
+                run[1], run[2] = 2, i - run[0]
+                continue
+            if run[1] > 1 and i == run[0] + run[1] * run[2]:
+                run[1] += 1
+                continue
+        runs.append([i, 1, 1])
+    return runs
+
+
+def _expand(runs):
+    order = array('q')
+    for first, count, step in runs:
+        order.extend(range(first, first + count * step, step))
+    return order
+
+
+def encode_archive(records, block_size=BLOCK_SIZE, codec=None):
+    """把记录编码为归档文件内容（bytes），记录顺序保持不变"""
+    if codec is None:
+        codec = CODEC_ZSTD if zstandard is not None else CODEC_ZLIB
+    fields = list(dict.fromkeys(field for record in records for field in record))
+    chunks = [HEADER.pack(MAGIC, VERSION, codec)]
+    offset = HEADER.size
+    blocks = []
+    for start in range(0, len(records), block_size):
+        block = records[start:start + block_size]
+        columns = [[record.get(field) for record in block] for field in fields]
+        data = _compress(_dumps(columns), codec)
+        timestamps = [record['timestamp'] for record in block if record.get('timestamp')]
+        blocks.append([
+            offset,
+            len(data),
+            len(block),
+            min(timestamps) if timestamps else None,
+            max(timestamps) if timestamps else None,
+        ])
+        chunks.append(data)
+        offset += len(data)
+    order = _runs(_newest_first([record.get('timestamp') or '' for record in records]))
+    directory = {'fields': fields, 'count': len(records), 'blocks': blocks, 'newest_first': order}
+    directory = _compress(_dumps(directory), codec)
+    chunks.append(directory)
+    chunks.append(FOOTER.pack(len(directory), MAGIC))
+    return b"".join(chunks)
+
+
+class ArchiveReader:
+    """读取归档文件：打开时只读目录，记录按块解压"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            header = f.read(HEADER.size)
+            if len(header) < HEADER.size:
+                raise ArchiveError(f"不是可识别的归档文件: {path}")
+            magic, version, self.codec = HEADER.unpack(header)
+            if magic != MAGIC or version != VERSION:
+                raise ArchiveError(f"不是可识别的归档文件: {path}")
+            size = f.seek(0, os.SEEK_END)
+            if size < HEADER.size + FOOTER.size:
+                raise ArchiveError(f"归档文件不完整: {path}")
+            f.seek(-FOOTER.size, os.SEEK_END)
+            length, magic = FOOTER.unpack(f.read(FOOTER.size))
+            if magic != MAGIC or length > size - HEADER.size - FOOTER.size:
+                raise ArchiveError(f"归档文件不完整: {path}")
+            f.seek(-FOOTER.size - length, os.SEEK_END)
+            directory = json.loads(_decompress(f.read(length), self.codec))
+        self.fields = directory['fields']
+        self.count = directory['count']
+        self.blocks = directory['blocks']
+        # 旧的归档没有保存倒序顺序，需要时从时间戳列计算
+        self._newest_first = directory.get('newest_first')
+        # 每块第一条记录的序号，用于按序号定位
+        self._starts = []
+        total = 0
+        for block in self.blocks:
+            self._starts.append(total)
+            total += block[2]
+
+    def __len__(self):
+        return self.count
+
+    def _columns(self, index, f):
+        offset, length = self.blocks[index][:2]
+        f.seek(offset)
+        return json.loads(_decompress(f.read(length), self.codec))
+
+    def _decode(self, columns):
+        records = []
+        for values in zip(*columns):
+            records.append({field: value for field, value in zip(self.fields, values) if value is not None})
+        return records
+
+    def read_block(self, index, f=None):
+        """解压第 index 块的记录（f 为已打开的归档文件或其内容的 BytesIO）"""
+        if f is None:
+            with open(self.path, 'rb') as f:
+                return self._decode(self._columns(index, f))
+        return self._decode(self._columns(index, f))
+
+    def iter_records(self, start=None, end=None):
+        """逐块产出记录；给出时间范围 [start, end) 时跳过范围外的块（块内不过滤）"""
+        with open(self.path, 'rb') as f:
+            for index, block in enumerate(self.blocks):
+                first, last = block[3], block[4]
+                if start and last is not None and last < start:
+                    continue
+                if end and first is not None and first >= end:
+                    continue
+                yield from self.read_block(index, f)
+
+    def records(self):
+        """全部记录"""
+        return list(self.iter_records())
+
+    def locate(self, index):
+        """第 index 条记录所在的 (块, 块内位置)"""
+        if not 0 <= index < self.count:
+            raise IndexError(index)
+        block = bisect.bisect_right(self._starts, index) - 1
+        return block, index - self._starts[block]
+
+    def record(self, index):
+        """第 index 条记录（只解压它所在的块）"""
+        block, position = self.locate(index)
+        return self.read_block(block)[position]
+
+    def newest_first(self, f=None):
+        """按时间戳倒序的记录下标数组"""
+        if self._newest_first is not None:
+            return _expand(self._newest_first)
+        if f is None:
+            with open(self.path, 'rb') as f:
+                return self.newest_first(f)
+        # 只取时间戳一列，逐块解压，不建立记录
+        timestamps = []
+        column = self.fields.index('timestamp') if 'timestamp' in self.fields else None
+        for index, block in enumerate(self.blocks):
+            if column is None:
+                timestamps.extend([''] * block[2])
+            else:
+                timestamps.extend(value or '' for value in self._columns(index, f)[column])
+        return array('q', _newest_first(timestamps))
+
+
+def open_archive(path, newest_first=False):
+    """打开归档，返回按块解压的记录序列 ArchiveRecords"""
+    reader = ArchiveReader(path)
+    return ArchiveRecords(reader, reader.newest_first() if newest_first else None)
+
+
+class ArchiveRecords(MutableSequence):
+    """归档中记录的序列：访问时才解压所在的块，只缓存最近用到的几块
+
+    与 lazy_records.LazyRecords 一样可以插入、替换和删除条目，改动只作用于
+    内存中的序列。
+    """
+
+    def __init__(self, reader, order=None):
+        self._reader = reader
+        self._data = None  # detach() 之后是归档文件的内容（压缩的）
+        self._closed = False
+        # 每个位置对应的条目：非负数是归档中的记录下标，负数 -k 是 _extra[k - 1]
+        self._slots = array('q', order if order is not None else range(len(reader)))
+        self._extra = []
+        self._blocks = OrderedDict()  # 块 -> 解压后的记录
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._slots)
+
+    def _block(self, index):
+        with self._lock:
+            records = self._blocks.get(index)
+            if records is not None:
+                self._blocks.move_to_end(index)
+                return records
+            if self._closed:
+                raise ValueError("记录文件已关闭")
+            f = io.BytesIO(self._data) if self._data is not None else None
+            records = self._blocks[index] = self._reader.read_block(index, f)
+            if len(self._blocks) > BLOCK_CACHE:
+                self._blocks.popitem(last=False)
+            return records
+
+    def _record(self, slot):
+        if slot < 0:
+            return self._extra[-slot - 1]
+        block, position = self._reader.locate(slot)
+        return self._block(block)[position]
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        return self._record(self._slots[index])
+
+    def __iter__(self):
+        for slot in self._slots[:]:
+            yield self._record(slot)
+
+    def _add_extra(self, record):
+        self._extra.append(record)
+        return -len(self._extra)
+
+    def __setitem__(self, index, record):
+        if isinstance(index, slice):
+            raise TypeError("ArchiveRecords 不支持切片赋值")
+        self._slots[index] = self._add_extra(record)
+
+    def __delitem__(self, index):
+        del self._slots[index]
+
+    def insert(self, index, record):
+        self._slots.insert(index, self._add_extra(record))
+
+    def memory_estimate(self, record_bytes):
+        """估算占用的内存（字节）：下标数组、缓存的块和插入的记录（每条按 record_bytes 计）"""
+        with self._lock:
+            cached = sum(len(records) for records in self._blocks.values())
+        data = len(self._data) if self._data is not None else 0
+        return len(self._slots) * self._slots.itemsize + (cached + len(self._extra)) * record_bytes + data
+
+    def detach(self):
+        """把归档文件的内容读进内存（文件即将被删除或移走时调用），之后不再读文件"""
+        with self._lock:
+            if self._data is None and not self._closed:
+                with open(self._reader.path, 'rb') as f:
+                    self._data = f.read()
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            self._blocks.clear()
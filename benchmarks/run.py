@@ -0,0 +1,231 @@
+"""运行基准测试并把结果写成 JSON，便于比较两次运行、发现性能回退
+
+在仓库根目录执行：
+    python -m benchmarks.run                                   # small 规模，journal 后端
+    python -m benchmarks.run --preset tiny --preset many-records --backend sqlite
+    python -m benchmarks.run --components 500 --records 2000 --suite storage
+    python -m benchmarks.run -o after.json --compare before.json --threshold 0.2
+
+合成数据按参数缓存在 --work-dir 中。界面用例需要显示器，没有 DISPLAY 时
+自动启动 Xvfb，找不到 Xvfb 或 tkinter 时界面用例记为跳过。
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from instrumentation import configure_logging
+from storage import STORAGE_BACKENDS
+from benchmarks.synthetic import PRESETS, dataset_name, ensure_dataset
+from benchmarks.suites import STORAGE_BENCHMARKS, UI_BENCHMARKS, Context
+
+RESULT_VERSION = 1
+XVFB_WAIT = 5.0
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def start_display():
+    """确保有可用的显示器，返回 (Xvfb 进程或 None, 不可用的原因或 None)"""
+    try:
+        import tkinter  # noqa: F401
+    except ImportError:
+        return None, "没有 tkinter"
+    if os.environ.get('DISPLAY'):
+        return None, None
+    if shutil.which('Xvfb') is None:
+        return None, "没有 DISPLAY，也找不到 Xvfb"
+    number = 99
+    while os.path.exists(f"/tmp/.X{number}-lock"):
+        number += 1
+    process = subprocess.Popen(
+        ['Xvfb', f':{number}', '-screen', '0', '1280x1024x24', '-nolisten', 'tcp'],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL
+    )
+    deadline = time.perf_counter() + XVFB_WAIT
+    while not os.path.exists(f"/tmp/.X11-unix/X{number}"):
+        if process.poll() is not None or time.perf_counter() > deadline:
+            process.kill()
+            return None, "Xvfb 启动失败"
+        time.sleep(0.05)
+    os.environ['DISPLAY'] = f':{number}'
+    return process, None
+
+
+def run_case(ctx, name, bench, repeat):
+    """重复执行一个用例，返回结果字典"""
+    times = []
+    for _ in range(repeat):
+        run, cleanup = bench(ctx)
+        try:
+            start = time.perf_counter()
+            run()
+            times.append(time.perf_counter() - start)
+        finally:
+            if cleanup is not None:
+                cleanup()
+            ctx.release()
+    items = getattr(bench, 'items', None)
+    items = items(ctx) if items is not None else None
+    median = statistics.median(times)
+    return {
+        'name': name,
+        'description': (bench.__doc__ or '').strip(),
+        'dataset': dataset_name(ctx.backend, ctx.components, ctx.records, ctx.seed),
+        'backend': ctx.backend,
+        'components': ctx.components,
+        'records': ctx.records,
+        'repeat': repeat,
+        'times_s': [round(t, 6) for t in times],
+        'min_s': round(min(times), 6),
+        'median_s': round(median, 6),
+        'mean_s': round(statistics.mean(times), 6),
+        'items': items,
+        'per_item_ms': round(median * 1000 / items, 4) if items else None,
+    }
+
+
+def compare(results, baseline, threshold):
+    """与基准结果比较中位数，打印对比表，返回变慢超过阈值的用例"""
+    old = {(r['name'], r['dataset']): r for r in baseline.get('results', [])}
+    regressions = []
+    print(f"\n{'用例':<28}{'数据集':<30}{'基准(ms)':>10}{'本次(ms)':>10}{'变化':>9}")
+    for result in results:
+        before = old.get((result['name'], result['dataset']))
+        if before is None:
+            continue
+        change = result['median_s'] / before['median_s'] - 1 if before['median_s'] else 0.0
+        flag = "  变慢" if change > threshold else ""
+        print(f"{result['name']:<28}{result['dataset']:<30}{before['median_s'] * 1000:>10.1f}"
+              f"{result['median_s'] * 1000:>10.1f}{change:>+9.1%}{flag}")
+        if change > threshold:
+            regressions.append(result['name'])
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="存储、统计和界面渲染的基准测试")
+    parser.add_argument("--preset", action="append", choices=sorted(PRESETS),
+                        help="数据规模预设（可重复），默认 small")
+    parser.add_argument("--components", type=int, help="自定义规模：组件数")
+    parser.add_argument("--records", type=int, help="自定义规模：每个组件的记录数")
+    parser.add_argument("--backend", action="append", choices=sorted(STORAGE_BACKENDS),
+                        help="存储后端（可重复），默认 journal")
+    parser.add_argument("--suite", choices=["storage", "ui", "all"], default="all", help="要运行的用例组")
+    parser.add_argument("--filter", help="只运行名称包含该字符串的用例")
+    parser.add_argument("--repeat", type=int, default=5, help="每个用例的重复次数")
+    parser.add_argument("--appends", type=int, default=100, help="追加记录用例中每次追加的条数")
+    parser.add_argument("--seed", type=int, default=0, help="合成数据的随机种子")
+    parser.add_argument("--work-dir", default=os.path.join(tempfile.gettempdir(), "benchmark-data"),
+                        help="合成数据和数据副本所在的目录")
+    parser.add_argument("-o", "--output", help="结果文件，默认 benchmark-<时间>.json")
+    parser.add_argument("--compare", help="与之比较的基准结果文件")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="中位数变慢超过该比例时视为回退（退出码 1）")
+    args = parser.parse_args(argv)
+    if (args.components is None) != (args.records is None):
+        parser.error("--components 和 --records 需要同时指定")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    configure_logging("WARNING")
+    if args.components is not None:
+        sizes = [(args.components, args.records)]
+    else:
+        sizes = [PRESETS[name] for name in (args.preset or ['small'])]
+    backends = args.backend or ['journal']
+
+    cases = []
+    if args.suite in ('storage', 'all'):
+        cases += STORAGE_BENCHMARKS
+    skipped = []
+    display = None
+    if args.suite in ('ui', 'all'):
+        display, reason = start_display()
+        if reason is None:
+            cases += UI_BENCHMARKS
+        else:
+            skipped += [{'name': name, 'reason': reason} for name, _ in UI_BENCHMARKS]
+            print(f"跳过界面用例: {reason}")
+    if args.filter:
+        cases = [(name, bench) for name, bench in cases if args.filter in name]
+
+    os.makedirs(args.work_dir, exist_ok=True)
+    results = []
+    try:
+        for backend in backends:
+            for components, records in sizes:
+                print(f"\n== {dataset_name(backend, components, records, args.seed)} ==")
+                started = time.perf_counter()
+                dataset_dir = ensure_dataset(args.work_dir, components, records, backend, args.seed)
+                print(f"准备数据 {time.perf_counter() - started:.1f} 秒")
+                ctx = Context(dataset_dir, backend, components, records, args.work_dir, args.appends, args.seed)
+                try:
+                    for name, bench in cases:
+                        try:
+                            result = run_case(ctx, name, bench, args.repeat)
+                        except Exception as e:
+                            print(f"{name:<28}出错: {e}")
+                            skipped.append({'name': name, 'dataset': dataset_name(
+                                backend, components, records, args.seed), 'reason': f"出错: {e}"})
+                            continue
+                        results.append(result)
+                        per_item = f"  ({result['per_item_ms']:.3f} ms/次)" if result['per_item_ms'] else ""
+                        print(f"{name:<28}{result['median_s'] * 1000:>10.1f} ms{per_item}")
+                finally:
+                    ctx.cleanup()
+    finally:
+        if display is not None:
+            display.terminate()
+
+    output = args.output or f"benchmark-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    report = {
+        'version': RESULT_VERSION,
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'processor': platform.processor() or platform.machine(),
+            'commit': git_commit(),
+        },
+        'parameters': {
+            'repeat': args.repeat,
+            'appends': args.appends,
+            'seed': args.seed,
+            'suite': args.suite,
+        },
+        'results': results,
+        'skipped': skipped,
+    }
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n结果已写入 {output}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} 个用例变慢超过 {args.threshold:.0%}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
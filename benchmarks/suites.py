@@ -0,0 +1,422 @@
+"""基准测试用例
+
+每个用例是一个函数 bench_xxx(ctx)，在计时之外完成准备工作，返回
+(计时函数, 清理函数)，清理函数在计时函数出错时也会调用。每次重复都在
+干净的数据副本上执行，结果互不影响。
+"""
+import os
+import random
+import shutil
+import tempfile
+import time
+from datetime import datetime
+from data_manager import DataManager
+from benchmarks.synthetic import make_record
+
+SEARCH_QUERIES = ["读书", "注意休息", "code review", "跑步 效果"]
+
+
+class Context:
+    """一次用例运行的环境：数据集、后端以及数据副本的管理"""
+
+    def __init__(self, dataset_dir, backend, components, records, work_dir, appends=100, seed=0):
+        self.dataset_dir = dataset_dir
+        self.backend = backend
+        self.components = components
+        self.records = records
+        self.work_dir = work_dir
+        self.appends = appends
+        self.seed = seed
+        self._warm_dir = None
+        self._copies = []
+
+    def open(self, data_dir):
+        return DataManager(data_dir=data_dir, backend=self.backend, fsync='batch')
+
+    def _copy(self, source):
+        target = tempfile.mkdtemp(prefix='run-', dir=self.work_dir)
+        shutil.copytree(os.path.join(source, 'data'), os.path.join(target, 'data'))
+        return target
+
+    def fresh_copy(self):
+        """原始数据集的副本（统计缓存和索引都还没有建立），返回其中的数据目录"""
+        target = self._copy(self.dataset_dir)
+        self._copies.append(target)
+        return os.path.join(target, 'data')
+
+    def warm_copy(self):
+        """运行过一次之后的数据副本（统计缓存、索引和组件摘要都已写好）"""
+        if self._warm_dir is None:
+            self._warm_dir = self._copy(self.dataset_dir)
+            data_manager = self.open(os.path.join(self._warm_dir, 'data'))
+            for component_id in self.component_ids(data_manager):
+                data_manager.get_component_stats(component_id)
+                data_manager.load_note(component_id)
+            data_manager.get_all_dates()
+            data_manager.search(SEARCH_QUERIES[0])
+            data_manager.close()
+        target = self._copy(self._warm_dir)
+        self._copies.append(target)
+        return os.path.join(target, 'data')
+
+    def component_ids(self, data_manager):
+        return [comp['component_id'] for comp in data_manager.load_components()]
+
+    def new_records(self, count):
+        """生成待追加的记录（每次调用结果相同，与对话框保存的记录一样没有 ID）"""
+        rng = random.Random(self.seed + 1)
+        now = datetime.now()
+        records = []
+        for _ in range(count):
+            record = make_record(rng, now)
+            del record['id']
+            records.append(record)
+        return records
+
+    def release(self):
+        """删除本次重复用过的数据副本"""
+        for path in self._copies:
+            shutil.rmtree(path, ignore_errors=True)
+        self._copies = []
+
+    def cleanup(self):
+        """删除所有数据副本（数据集用完后调用）"""
+        self.release()
+        if self._warm_dir is not None:
+            shutil.rmtree(self._warm_dir, ignore_errors=True)
+            self._warm_dir = None
+
+
+# ---- 存储与统计 ----
+
+def bench_open_cold(ctx):
+    """冷启动：打开 DataManager 并读取组件列表（没有缓存和组件摘要）"""
+    data_dir = ctx.fresh_copy()
+
+    opened = []
+
+    def run():
+        opened.append(ctx.open(data_dir))
+        opened[0].load_components()
+
+    def cleanup():
+        for data_manager in opened:
+            data_manager.close()
+    return run, cleanup
+
+
+def bench_open_warm(ctx):
+    """热启动：同上，缓存、索引和组件摘要都已存在"""
+    data_dir = ctx.warm_copy()
+
+    opened = []
+
+    def run():
+        opened.append(ctx.open(data_dir))
+        opened[0].load_components()
+
+    def cleanup():
+        for data_manager in opened:
+            data_manager.close()
+    return run, cleanup
+
+
+def bench_close(ctx):
+    """关闭：写回统计缓存、索引和组件摘要"""
+    data_manager = ctx.open(ctx.fresh_copy())
+    for component_id in ctx.component_ids(data_manager):
+        data_manager.get_component_stats(component_id)
+
+    return data_manager.close, None
+
+
+def bench_load_records(ctx):
+    """依次读取所有组件的全部记录"""
+    data_manager = ctx.open(ctx.warm_copy())
+    component_ids = ctx.component_ids(data_manager)
+
+    def run():
+        for component_id in component_ids:
+            data_manager.load_component_records(component_id)
+    return run, data_manager.close
+
+
+def bench_open_records(ctx):
+    """按详细视图的方式打开所有组件的记录（时间倒序）并读取首屏 20 条"""
+    data_manager = ctx.open(ctx.warm_copy())
+    component_ids = ctx.component_ids(data_manager)
+
+    def run():
+        for component_id in component_ids:
+            records = data_manager.open_component_records(component_id, newest_first=True)
+            for i in range(min(20, len(records))):
+                records[i]
+    return run, data_manager.close
+
+
+def bench_save_components(ctx):
+    """保存组件列表（新增一个组件后的保存）"""
+    data_manager = ctx.open(ctx.warm_copy())
+    components = data_manager.load_components()
+    now = datetime.now()
+    components.append({
+        'component_id': now.strftime("%Y%m%d%H%M%S"),
+        'date_str': now.strftime("%Y年%m月%d日 %H:%M:%S"),
+        'date': now.strftime("%Y-%m-%d %H:%M:%S"),
+    })
+
+    def run():
+        data_manager.save_components(components)
+        data_manager.flush()
+    return run, data_manager.close
+
+
+def bench_append_records(ctx):
+    """逐条追加记录（与添加记录对话框的保存路径相同），最后等待写入完成"""
+    data_manager = ctx.open(ctx.warm_copy())
+    component_ids = ctx.component_ids(data_manager)
+    records = ctx.new_records(ctx.appends)
+
+    def run():
+        for i, record in enumerate(records):
+            data_manager.append_component_record(component_ids[i % len(component_ids)], dict(record))
+        data_manager.flush()
+    return run, data_manager.close
+
+
+bench_append_records.items = lambda ctx: ctx.appends
+
+
+def bench_stats_cold(ctx):
+    """计算所有组件的统计（没有统计缓存，需要读取记录）"""
+    data_manager = ctx.open(ctx.fresh_copy())
+    component_ids = ctx.component_ids(data_manager)
+
+    def run():
+        for component_id in component_ids:
+            data_manager.get_component_stats(component_id)
+    return run, data_manager.close
+
+
+def bench_stats_warm(ctx):
+    """读取所有组件的统计（统计缓存有效，只校验签名）"""
+    data_manager = ctx.open(ctx.warm_copy())
+    component_ids = ctx.component_ids(data_manager)
+
+    def run():
+        for component_id in component_ids:
+            data_manager.get_component_stats(component_id)
+    return run, data_manager.close
+
+
+def bench_search_cold(ctx):
+    """第一次全文检索（需要建立检索索引）"""
+    data_manager = ctx.open(ctx.fresh_copy())
+    data_manager.load_components()
+
+    def run():
+        data_manager.search(SEARCH_QUERIES[0])
+    return run, data_manager.close
+
+
+def bench_search_warm(ctx):
+    """索引已建立时的全文检索"""
+    data_manager = ctx.open(ctx.warm_copy())
+    data_manager.load_components()
+    data_manager.search(SEARCH_QUERIES[0])
+
+    def run():
+        for query in SEARCH_QUERIES:
+            data_manager.search(query)
+    return run, data_manager.close
+
+
+bench_search_warm.items = lambda ctx: len(SEARCH_QUERIES)
+
+
+def bench_find_records(ctx):
+    """按类别查找记录（二级索引已建立）"""
+    data_manager = ctx.open(ctx.warm_copy())
+    data_manager.get_all_dates()
+
+    def run():
+        data_manager.find_records(category="学习", start="2020-02-01", end="2020-03-01")
+    return run, data_manager.close
+
+
+STORAGE_BENCHMARKS = [
+    ('datamanager.open_cold', bench_open_cold),
+    ('datamanager.open_warm', bench_open_warm),
+    ('datamanager.close', bench_close),
+    ('records.load_all', bench_load_records),
+    ('records.open_all', bench_open_records),
+    ('components.save', bench_save_components),
+    ('records.append', bench_append_records),
+    ('stats.cold', bench_stats_cold),
+    ('stats.warm', bench_stats_warm),
+    ('search.cold', bench_search_cold),
+    ('search.warm', bench_search_warm),
+    ('records.find', bench_find_records),
+]
+
+
+# ---- 界面（需要显示器，无显示器时由 run.py 启动 Xvfb） ----
+
+UI_TIMEOUT = 60.0
+
+
+def pump(root, done, timeout=UI_TIMEOUT):
+    """处理 Tk 事件直到 done() 为真（后台 I/O 的结果在主循环中回调）"""
+    deadline = time.perf_counter() + timeout
+    while not done():
+        if time.perf_counter() > deadline:
+            raise TimeoutError("等待界面更新超时")
+        root.update()
+        time.sleep(0.001)
+
+
+class UIContext:
+    """在数据副本所在目录中创建主界面（MainApplication 使用相对路径 data/）"""
+
+    def __init__(self, ctx, data_dir):
+        import tkinter as tk
+        from interface import MainApplication
+        self.cwd = os.getcwd()
+        os.chdir(os.path.dirname(data_dir))
+        self.root = tk.Tk()
+        self.root.geometry("800x600")
+        self.app_class = MainApplication
+        self.backend = ctx.backend
+        self.app = None
+
+    def start(self):
+        self.app = self.app_class(self.root, backend=self.backend, fsync='batch')
+        self.root.update_idletasks()
+        return self.app
+
+    def idle(self):
+        """等待首屏可见组件的备注和统计都显示出来"""
+        pump(self.root, lambda: all(
+            row['component'].exp_avg_label.cget('text') != "平均体验感: 加载中…"
+            for row in self.app.component_list.visible_rows.values()
+        ))
+
+    def close(self):
+        try:
+            if self.app is not None:
+                self.app.data_manager.close()
+            self.root.destroy()
+        finally:
+            os.chdir(self.cwd)
+
+
+def _largest_component(ui):
+    data_manager = ui.app.data_manager
+    return max(
+        (comp['component_id'] for comp in ui.app.registry.all()),
+        key=lambda c: data_manager.get_component_stats(c)['count']
+    )
+
+
+def _open_detail(ui):
+    """打开记录最多的组件的详细视图，等待记录加载完成"""
+    from interface import DetailView
+    view = DetailView(ui.app, datetime.now(), _largest_component(ui))
+    pump(ui.root, lambda: not view.loading_label.winfo_ismapped() and view.records)
+    return view
+
+
+def bench_ui_startup(ctx):
+    """创建主界面并完成首次布局（组件列表、可见行）"""
+    ui = UIContext(ctx, ctx.warm_copy())
+
+    return ui.start, ui.close
+
+
+def bench_ui_load_saved_components(ctx):
+    """重新加载组件列表并布局"""
+    ui = UIContext(ctx, ctx.warm_copy())
+    app = ui.start()
+    ui.idle()
+
+    def run():
+        app.load_saved_components()
+        app.update_idletasks()
+    return run, ui.close
+
+
+def bench_ui_update_statistics(ctx):
+    """刷新首屏所有组件的统计（统计缓存失效，后台重算后更新标签）"""
+    ui = UIContext(ctx, ctx.warm_copy())
+    app = ui.start()
+    ui.idle()
+    components = [row['component'] for row in app.component_list.visible_rows.values()]
+    for component in components:
+        app.data_manager.stats_cache.forget(component.component_id)
+
+    def run():
+        for component in components:
+            component.update_statistics()
+        ui.idle()
+    return run, ui.close
+
+
+def bench_ui_display_records(ctx):
+    """详细视图显示记录最多的组件的全部记录"""
+    ui = UIContext(ctx, ctx.warm_copy())
+    ui.start()
+    ui.idle()
+    view = _open_detail(ui)
+    records = list(view.records)
+
+    def run():
+        view.display_records(records)
+        view.update_idletasks()
+    return run, ui.close
+
+
+def bench_ui_append_records(ctx):
+    """在详细视图中逐条添加记录（AddRecordDialog.save_record 的调用路径）"""
+    ui = UIContext(ctx, ctx.warm_copy())
+    ui.start()
+    ui.idle()
+    view = _open_detail(ui)
+    records = ctx.new_records(ctx.appends)
+
+    def run():
+        for record in records:
+            data = dict(record)
+            view.data_manager.append_component_record(view.component_id, data)
+            view.insert_record(data)
+            view.update_idletasks()
+        view.data_manager.flush()
+    return run, ui.close
+
+
+bench_ui_append_records.items = lambda ctx: ctx.appends
+
+
+def bench_ui_reopen_detail(ctx):
+    """关闭后重新打开记录最多的组件的详细视图（命中视图缓存，不重建窗口）"""
+    ui = UIContext(ctx, ctx.warm_copy())
+    app = ui.start()
+    ui.idle()
+    component_id = _largest_component(ui)
+    view = app.open_detail_view(datetime.now(), component_id)
+    pump(ui.root, lambda: not view.loading_label.winfo_ismapped() and view.records)
+    view.close()
+
+    def run():
+        app.open_detail_view(datetime.now(), component_id)
+        app.update_idletasks()
+    return run, ui.close
+
+
+UI_BENCHMARKS = [
+    ('ui.startup', bench_ui_startup),
+    ('ui.load_saved_components', bench_ui_load_saved_components),
+    ('ui.update_statistics', bench_ui_update_statistics),
+    ('ui.display_records', bench_ui_display_records),
+    ('ui.append_records', bench_ui_append_records),
+    ('ui.reopen_detail', bench_ui_reopen_detail),
+]
@@ -0,0 +1,116 @@
+"""生成基准测试用的合成数据目录
+
+同样的参数和随机种子总是生成同样的内容（包括记录 ID），生成结果按参数
+缓存在工作目录中，多次运行直接复用。
+"""
+import json
+import os
+import random
+import shutil
+from datetime import datetime, timedelta
+from stats_cache import CATEGORIES
+from storage import FsyncPolicy, create_storage
+
+# 预设规模：(组件数, 每个组件的记录数)
+PRESETS = {
+    'tiny': (10, 10),
+    'small': (100, 100),
+    'medium': (1000, 200),
+    'many-components': (10000, 10),
+    'many-records': (10, 50000),
+}
+
+ACTIVITIES = [
+    "读书", "跑步", "写代码", "看电影", "开会", "做饭", "背单词", "整理房间",
+    "复盘投资", "散步", "练琴", "通勤", "午睡", "写日记", "学习英语", "打扫卫生",
+    "reading", "code review", "gym", "podcast",
+]
+SUGGESTIONS = [
+    "", "", "", "下次早点开始", "注意休息", "可以减少时间", "效果不错，继续保持",
+    "分心了，关掉手机", "需要提前计划", "和朋友一起效率更高",
+]
+NOTES = ["", "加油", "今天状态不错", "少刷手机，多陪家人", "一切终将归零，除了生死，都是小事！"]
+COLORS = ["green", "green", "green", "yellow", "red"]
+
+BASE_DATE = datetime(2020, 1, 1, 8, 0, 0)
+MANIFEST = "dataset.json"
+
+
+def make_record(rng, when):
+    """生成一条与添加记录对话框字段一致的记录"""
+    hour = rng.randrange(24)
+    actual = rng.randrange(5, 240)
+    record = {
+        "活动": rng.choice(ACTIVITIES),
+        "体验感": str(rng.randrange(11)) if rng.random() < 0.9 else "",
+        "时间段": f"{hour:02d}:00-{(hour + 1) % 24:02d}:00",
+        "实际时间": str(actual),
+        "预估时间": str(max(actual + rng.randrange(-30, 31), 0)),
+        "优化建议": rng.choice(SUGGESTIONS),
+        "颜色标记": rng.choice(COLORS),
+        "类别": rng.choice(CATEGORIES),
+        "timestamp": when.strftime("%Y-%m-%d %H:%M:%S"),
+    }
+    record["id"] = f"{rng.getrandbits(128):032x}"
+    return record
+
+
+def make_records(rng, start, count):
+    """生成 count 条时间递增的记录"""
+    when = start
+    records = []
+    for _ in range(count):
+        when += timedelta(seconds=rng.randrange(60, 6 * 3600))
+        records.append(make_record(rng, when))
+    return records
+
+
+def component_entry(index):
+    date = BASE_DATE + timedelta(hours=index)
+    return {
+        "component_id": date.strftime("%Y%m%d%H%M%S"),
+        "date_str": date.strftime("%Y年%m月%d日 %H:%M:%S"),
+        "date": date.strftime("%Y-%m-%d %H:%M:%S"),
+    }
+
+
+def dataset_name(backend, components, records, seed):
+    return f"{backend}-{components}x{records}-s{seed}"
+
+
+def generate(data_dir, components, records, backend="journal", seed=0):
+    """在 data_dir 中生成 components 个组件、每个 records 条记录以及备注"""
+    rng = random.Random(seed)
+    os.makedirs(data_dir, exist_ok=True)
+    storage = create_storage(backend, data_dir, FsyncPolicy('batch', 60.0))
+    try:
+        entries = []
+        for index in range(components):
+            entry = component_entry(index)
+            entries.append(entry)
+            component_id = entry["component_id"]
+            start = datetime.strptime(entry["date"], "%Y-%m-%d %H:%M:%S")
+            storage.append_records(component_id, make_records(rng, start, records))
+            note = rng.choice(NOTES)
+            if note:
+                storage.save_note(component_id, note)
+        storage.save_components(entries)
+    finally:
+        storage.close()
+
+
+def ensure_dataset(work_dir, components, records, backend="journal", seed=0):
+    """返回合成数据集的目录（其中的 data/ 为数据目录），不存在时生成"""
+    root = os.path.join(work_dir, dataset_name(backend, components, records, seed))
+    manifest = os.path.join(root, MANIFEST)
+    params = {"backend": backend, "components": components, "records": records, "seed": seed}
+    if os.path.exists(manifest):
+        with open(manifest, 'r', encoding='utf-8') as f:
+            if json.load(f) == params:
+                return root
+    shutil.rmtree(root, ignore_errors=True)
+    generate(os.path.join(root, "data"), components, records, backend, seed)
+    # 清单最后写入，生成中断时下次会重新生成
+    with open(manifest, 'w', encoding='utf-8') as f:
+        json.dump(params, f)
+    return root
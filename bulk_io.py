@@ -0,0 +1,321 @@
+"""记录的批量导入/导出（命令行，不启动 Tk）
+
+用法示例：
+    python bulk_io.py import history.csv --component 20241217222306
+    python bulk_io.py import export.jsonl
+    python bulk_io.py export --component 20241217222306 -o out.csv
+    python bulk_io.py export --all --start 2024-01-01 --end 2025-01-01 -o 2024.jsonl
+"""
+import argparse
+import csv
+import json
+import re
+import sys
+import time
+from datetime import datetime, timedelta
+from data_manager import DataManager
+from stats_cache import CATEGORIES
+from storage import STORAGE_BACKENDS
+
+# 与添加记录对话框中的表单项一致
+RECORD_FIELDS = ["活动", "体验感", "时间段", "实际时间", "预估时间", "优化建议", "颜色标记", "类别"]
+# 导出包含记录 ID 便于对照；导入时总是分配新的 ID，重复导入不会产生冲突
+EXPORT_FIELDS = ["component_id"] + RECORD_FIELDS + ["timestamp", "id"]
+COLORS = ["green", "yellow", "red"]
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+# 组件 ID 是创建时间 YYYYMMDDHHMMSS；它同时是存储键，不能含路径分隔符或 ..
+COMPONENT_ID_FORMAT = "%Y%m%d%H%M%S"
+COMPONENT_ID_PATTERN = re.compile(r"^\d{14}$")
+TIME_RANGE_PATTERN = re.compile(r"^\d{2}:\d{2}-\d{2}:\d{2}$")
+
+
+class RecordError(ValueError):
+    """导入的记录不合法"""
+
+
+def validate_component_id(component_id):
+    """校验组件 ID 的格式，返回去掉空白的 ID"""
+    component_id = str(component_id or "").strip()
+    if not component_id:
+        raise RecordError("没有 component_id，请在文件中提供或使用 --component")
+    try:
+        if not COMPONENT_ID_PATTERN.match(component_id):
+            raise ValueError
+        datetime.strptime(component_id, COMPONENT_ID_FORMAT)
+    except ValueError:
+        raise RecordError(f"component_id 格式应为 YYYYMMDDHHMMSS: {component_id}")
+    return component_id
+
+
+def validate_record(row):
+    """校验并规范化一条导入的记录，返回只含已知字段的新字典"""
+    record = {}
+    for field in RECORD_FIELDS:
+        value = row.get(field)
+        record[field] = "" if value is None else str(value).strip()
+
+    if not record["活动"]:
+        raise RecordError("活动不能为空")
+
+    if record["体验感"]:
+        try:
+            score = float(record["体验感"])
+        except ValueError:
+            raise RecordError(f"体验感不是数字: {record['体验感']}")
+        if not 0 <= score <= 10:
+            raise RecordError(f"体验感应在 0-10 之间: {record['体验感']}")
+
+    if record["时间段"] and not TIME_RANGE_PATTERN.match(record["时间段"]):
+        raise RecordError(f"时间段格式应为 HH:MM-HH:MM: {record['时间段']}")
+
+    for field in ("实际时间", "预估时间"):
+        if record[field]:
+            if not record[field].isdigit():
+                raise RecordError(f"{field}应为非负整数（分钟）: {record[field]}")
+
+    if record["类别"] and record["类别"] not in CATEGORIES:
+        raise RecordError(f"未知的类别: {record['类别']}")
+
+    if not record["颜色标记"]:
+        record["颜色标记"] = "green"
+    elif record["颜色标记"] not in COLORS:
+        raise RecordError(f"未知的颜色标记: {record['颜色标记']}")
+
+    timestamp = str(row.get("timestamp") or "").strip()
+    if timestamp:
+        try:
+            datetime.strptime(timestamp, TIMESTAMP_FORMAT)
+        except ValueError:
+            raise RecordError(f"timestamp 格式应为 {TIMESTAMP_FORMAT}: {timestamp}")
+    else:
+        timestamp = datetime.now().strftime(TIMESTAMP_FORMAT)
+    record["timestamp"] = timestamp
+    return record
+
+
+def detect_format(path, fmt=None):
+    if fmt:
+        return fmt
+    return "csv" if path.lower().endswith(".csv") else "jsonl"
+
+
+def iter_rows(path, fmt):
+    """逐行读取输入文件，产出 (行号, 行字典)，不把整个文件读进内存
+
+    无法解析或不是对象的行产出 (行号, 异常)。
+    """
+    if fmt == "csv":
+        with open(path, "r", encoding="utf-8-sig", newline="") as f:
+            reader = csv.DictReader(f)
+            for row in reader:
+                yield reader.line_num, row
+    else:
+        with open(path, "r", encoding="utf-8") as f:
+            for line_num, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    row = json.loads(line)
+                except ValueError as e:
+                    yield line_num, e
+                    continue
+                if not isinstance(row, dict):
+                    # 数字、字符串、数组等合法 JSON 也不是记录，与格式错误的行一样报告
+                    row = RecordError(f"应为 JSON 对象，实际为 {type(row).__name__}")
+                yield line_num, row
+
+
+def component_entry(component_id):
+    """为导入时新出现的组件生成组件列表条目"""
+    date = datetime.strptime(component_id, COMPONENT_ID_FORMAT)
+    return {
+        "component_id": component_id,
+        "date_str": date.strftime("%Y年%m月%d日 %H:%M:%S"),
+        "date": date.strftime(TIMESTAMP_FORMAT),
+    }
+
+
+def import_records(data_manager, path, fmt=None, component_id=None, batch_size=1000, strict=False):
+    """把 CSV/JSONL 文件按批导入组件，返回 (导入条数, 跳过条数)"""
+    fmt = detect_format(path, fmt)
+    if component_id is not None:
+        component_id = validate_component_id(component_id)
+    components = data_manager.load_components()
+    existing = len(components)
+    known = {comp["component_id"] for comp in components}
+
+    batches = {}  # component_id -> 待写入的记录
+    in_flight = None
+    written = set()  # 已经写入过批次的组件
+    written_count = 0
+    imported = skipped = 0
+    started = time.perf_counter()
+
+    def write_batch(target, records):
+        nonlocal in_flight, written_count
+        # 最多保留一个批次在后台写入，解析和写入可以重叠
+        if in_flight is not None:
+            in_flight.result()
+        in_flight = data_manager.append_component_records(target, records)
+        written.add(target)
+        written_count += len(records)
+
+    for line_num, row in iter_rows(path, fmt):
+        try:
+            if isinstance(row, Exception):
+                raise RecordError(f"无法解析: {row}")
+            target = validate_component_id(row.get("component_id") or component_id)
+            record = validate_record(row)
+        except RecordError as e:
+            if strict:
+                # 已经写入的批次留在磁盘上，新组件也要登记到组件列表，否则界面中看不到
+                data_manager.save_components(
+                    components[:existing] + [comp for comp in components[existing:] if comp["component_id"] in written]
+                )
+                data_manager.flush()
+                raise RecordError(f"第 {line_num} 行: {e}（中止前已写入 {written_count} 条）")
+            print(f"跳过第 {line_num} 行: {e}", file=sys.stderr)
+            skipped += 1
+            continue
+
+        if target not in known:
+            known.add(target)
+            components.append(component_entry(target))
+        batch = batches.setdefault(target, [])
+        batch.append(record)
+        if len(batch) >= batch_size:
+            write_batch(target, batches.pop(target))
+        imported += 1
+        if imported % (batch_size * 10) == 0:
+            elapsed = time.perf_counter() - started
+            print(f"已导入 {imported} 条 ({imported / elapsed:.0f} 条/秒)")
+
+    for target, records in batches.items():
+        write_batch(target, records)
+    data_manager.save_components(components)
+    data_manager.flush()
+
+    elapsed = max(time.perf_counter() - started, 1e-9)
+    print(f"导入完成: {imported} 条，跳过 {skipped} 条，用时 {elapsed:.2f} 秒 ({imported / elapsed:.0f} 条/秒)")
+    return imported, skipped
+
+
+def parse_bound(value, name):
+    """把 --start/--end 规范成可与记录 timestamp 直接比较的字符串
+
+    只有日期时保持 YYYY-MM-DD；带时间时（如 2024-05-03T12:00）转成
+    TIMESTAMP_FORMAT，否则日期与时间之间的 T 和空格比较会出错。
+    """
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.strip())
+    except ValueError:
+        raise RecordError(f"{name} 应为 YYYY-MM-DD 或 YYYY-MM-DD HH:MM:SS: {value}")
+    if len(value.strip()) == 10:
+        return parsed.strftime("%Y-%m-%d")
+    return parsed.strftime(TIMESTAMP_FORMAT)
+
+
+def export_records(data_manager, path, fmt=None, component_ids=None, start=None, end=None):
+    """导出组件的记录，可按时间戳范围 [start, end) 过滤，返回导出条数"""
+    fmt = detect_format(path, fmt)
+    start = parse_bound(start, "start")
+    end = parse_bound(end, "end")
+    if component_ids is None:
+        component_ids = [comp["component_id"] for comp in data_manager.load_components()]
+
+    exported = 0
+    started = time.perf_counter()
+    newline = "" if fmt == "csv" else None
+    with open(path, "w", encoding="utf-8", newline=newline) as f:
+        writer = None
+        if fmt == "csv":
+            writer = csv.DictWriter(f, fieldnames=EXPORT_FIELDS, extrasaction="ignore")
+            writer.writeheader()
+        if start or end:
+            # 按日期索引只读取范围内有记录的组件；索引按天查找，end 带时间时
+            # 包含 end 所在的那一天，那一天的记录下面按完整时间戳过滤
+            index_end = end
+            if end and len(end) > 10:
+                index_end = (datetime.strptime(end[:10], "%Y-%m-%d") + timedelta(days=1)).strftime("%Y-%m-%d")
+            selected = data_manager.find_records(start=start, end=index_end, component_ids=component_ids).items()
+        else:
+            selected = ((c, data_manager.open_component_records(c)) for c in component_ids)
+        for component_id, records in selected:
+            for record in records:
+                timestamp = record.get("timestamp", "")
+                if start and timestamp < start:
+                    continue
+                if end and timestamp >= end:
+                    continue
+                row = {"component_id": component_id}
+                row.update(record)
+                if writer is not None:
+                    writer.writerow(row)
+                else:
+                    f.write(json.dumps(row, ensure_ascii=False) + "\n")
+                exported += 1
+
+    elapsed = max(time.perf_counter() - started, 1e-9)
+    print(f"导出完成: {exported} 条，用时 {elapsed:.2f} 秒 ({exported / elapsed:.0f} 条/秒)")
+    return exported
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="批量导入/导出记录（CSV 或 JSON Lines）")
+    parser.add_argument("--data-dir", default="data", help="数据目录")
+    parser.add_argument("--backend", choices=sorted(STORAGE_BACKENDS), default="journal", help="数据存储后端")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    import_parser = subparsers.add_parser("import", help="导入记录")
+    import_parser.add_argument("path", help="CSV 或 JSONL 文件")
+    import_parser.add_argument("--format", choices=["csv", "jsonl"], help="默认按扩展名判断")
+    import_parser.add_argument("--component", help="文件中没有 component_id 列时写入的组件")
+    import_parser.add_argument("--batch-size", type=int, default=1000, help="每批写入的记录数")
+    import_parser.add_argument("--strict", action="store_true", help="遇到不合法的记录时中止")
+
+    export_parser = subparsers.add_parser("export", help="导出记录")
+    target = export_parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--component", action="append", help="要导出的组件（可重复）")
+    target.add_argument("--all", action="store_true", help="导出所有组件")
+    export_parser.add_argument("-o", "--output", required=True, help="输出文件")
+    export_parser.add_argument("--format", choices=["csv", "jsonl"], help="默认按扩展名判断")
+    export_parser.add_argument("--start", help="起始日期或时间（含），如 2024-01-01")
+    export_parser.add_argument("--end", help="结束日期或时间（不含），如 2025-01-01 或 2025-01-01T12:00")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    data_manager = DataManager(data_dir=args.data_dir, backend=args.backend, fsync="batch")
+    try:
+        if args.command == "import":
+            import_records(
+                data_manager,
+                args.path,
+                fmt=args.format,
+                component_id=args.component,
+                batch_size=args.batch_size,
+                strict=args.strict
+            )
+        else:
+            export_records(
+                data_manager,
+                args.output,
+                fmt=args.format,
+                component_ids=None if args.all else args.component,
+                start=args.start,
+                end=args.end
+            )
+    except (OSError, RecordError) as e:
+        print(f"错误: {e}", file=sys.stderr)
+        return 1
+    finally:
+        data_manager.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,100 @@
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# 摘要格式或统计口径改变时递增，旧版本的摘要整体丢弃
+SUMMARY_VERSION = 1
+
+
+def _signature(signature):
+    return list(signature) if signature is not None else None
+
+
+class ComponentSummaries:
+    """组件摘要：组件列表中每个组件附带的备注和统计
+
+    摘要随组件列表一起保存（components.json 中每个组件的 summary 字段，
+    SQLite 后端为 components 表的 summary 列），主界面读取组件列表后即可
+    画出所有组件的备注和统计，不必打开记录文件和备注文件。摘要里保存了
+    记录和备注的签名，后台校验签名一致时直接采用，只有上次保存之后数据
+    变化过的组件才需要重新读取。摘要只是副本，不参与任何写入。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}  # 组件 -> {'version', 'signature', 'stats', 'note_signature', 'note'}
+        self.dirty = False
+
+    def load(self, components_data):
+        """从组件信息中取出摘要（组件信息本身不再带 summary 字段）"""
+        loaded = {}
+        for comp in components_data:
+            summary = comp.pop('summary', None)
+            if isinstance(summary, dict) and summary.get('version') == SUMMARY_VERSION:
+                loaded[comp['component_id']] = summary
+        with self._lock:
+            # 本次运行中更新过的摘要比文件中的新
+            loaded.update(self._entries)
+            self._entries = loaded
+
+    def attach(self, components_data):
+        """返回带摘要的组件信息（写入组件列表时调用）"""
+        with self._lock:
+            entries = self._entries
+            return [
+                dict(comp, summary=entries[comp['component_id']]) if comp['component_id'] in entries else comp
+                for comp in components_data
+            ]
+
+    def items(self):
+        with self._lock:
+            return list(self._entries.items())
+
+    def stats(self, component_id):
+        """摘要中的统计，没有时返回 None"""
+        with self._lock:
+            return self._entries.get(component_id, {}).get('stats')
+
+    def note(self, component_id):
+        """摘要中的备注，没有时返回 None"""
+        with self._lock:
+            return self._entries.get(component_id, {}).get('note')
+
+    def current_note(self, component_id, note_signature):
+        """备注的签名与摘要中的一致时返回摘要中的备注，否则返回 None"""
+        with self._lock:
+            summary = self._entries.get(component_id, {})
+            if 'note' in summary and summary.get('note_signature') == _signature(note_signature):
+                return summary['note']
+        return None
+
+    def _set(self, component_id, **fields):
+        # 摘要整体替换而不是原地修改，attach() 返回的内容写入期间不会变化
+        with self._lock:
+            old = self._entries.get(component_id)
+            summary = dict(old or {'version': SUMMARY_VERSION})
+            summary.update(fields)
+            if summary != old:
+                self._entries[component_id] = summary
+                self.dirty = True
+
+    def set_stats(self, component_id, signature, stats):
+        """stats 由摘要持有，调用方之后不能再修改它"""
+        self._set(component_id, signature=_signature(signature), stats=stats)
+
+    def set_note(self, component_id, note, note_signature):
+        self._set(component_id, note=note, note_signature=_signature(note_signature))
+
+    def forget(self, component_id):
+        with self._lock:
+            if self._entries.pop(component_id, None) is not None:
+                self.dirty = True
+
+    def retain(self, component_ids):
+        """只保留仍然存在的组件"""
+        keep = set(component_ids)
+        with self._lock:
+            for component_id in [c for c in self._entries if c not in keep]:
+                del self._entries[component_id]
+                self.dirty = True
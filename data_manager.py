@@ -1,62 +1,503 @@
-import json
+import logging
 import os
+import shutil
 from datetime import datetime
+from instrumentation import metrics
+from storage import RECORD_ID, TRASH_DIR, FsyncPolicy, create_storage, ensure_record_ids
+from stats_cache import StatsCache, copy_stats
+from record_index import RecordIndex
+from search_index import SearchIndex
+from registry import ComponentRegistry
+from io_worker import IOWorker
+from startup_profiler import StartupProfiler
+from component_summaries import ComponentSummaries
+from write_buffer import WriteBuffer
+from prefetch import Prefetcher
+
+logger = logging.getLogger(__name__)
+
+# 平铺目录迁移到分片目录时每批移动的组件数
+LAYOUT_BATCH = 200
 
 class DataManager:
-    def __init__(self):
-        self.data_dir = "data"
+    def __init__(self, data_dir="data", backend="journal", fsync="always", fsync_interval=1.0, profiler=None):
+        profiler = profiler or StartupProfiler()
+        self.data_dir = data_dir
         self.components_file = os.path.join(self.data_dir, "components.json")
         self.ensure_data_directory()
-        
+        with profiler.phase("打开存储后端"):
+            self.storage = create_storage(backend, self.data_dir, FsyncPolicy(fsync, fsync_interval))
+        # 清理上次崩溃留下的半写文件
+        with profiler.phase("恢复未完成的写入"):
+            for filename in self.storage.recover():
+                logger.warning("已恢复未完成的写入: %s", filename)
+        # 后台 I/O：读取在线程池中执行，写入排队按顺序执行
+        self.io = IOWorker()
+        # 备注和组件列表的延迟写入缓冲（合并连续写入，跳过内容未变的写入）
+        self.write_buffer = WriteBuffer(self.io)
+        # 上次运行留下的回收目录（撤销时限已过）在后台清空
+        self.io.submit_write('trash', self.purge_trash_dir)
+        # 旧的平铺目录在后台分批移入分片目录
+        self._closing = False
+        self.io.submit_write('layout', self.migrate_layout)
+        # 组件统计缓存（第一次计算统计时才读取）
+        self.stats_cache = StatsCache(self.data_dir, self.storage)
+        # 按日期、类别、活动名的二级索引（第一次使用或 warm_up() 时才读取）
+        self.record_index = RecordIndex(self.data_dir, self.storage)
+        # 活动、优化建议和备注的全文检索索引（同上）
+        self.search_index = SearchIndex(self.data_dir, self.storage)
+        # 组件摘要（随组件列表保存的备注和统计），主界面先用它显示，后台再按签名校验
+        self.summaries = ComponentSummaries()
+        # 最后一次读取或保存的组件列表，关闭时连同更新过的摘要一起写回
+        self._components = None
+        # 备注缓存，列表滚动时复用的行不必反复读文件
+        self.notes = {}
+        # 本次运行中修改过的备注，关闭时刷新它们在摘要中的签名
+        self._saved_notes = set()
+        # 悬停预取的记录和备注（打开详细视图时直接使用）
+        self.prefetcher = Prefetcher(self)
+        # 组件注册表，记录和备注的变更通过它通知界面
+        self.registry = ComponentRegistry()
+        # 组件数据的版本号，记录或备注每次变化时递增（界面据此判断缓存的视图是否过期）
+        self._versions = {}
+        for event in ('records_changed', 'note_changed', 'component_removed'):
+            self.registry.subscribe(event, self._bump_version)
+
     def ensure_data_directory(self):
         if not os.path.exists(self.data_dir):
             os.makedirs(self.data_dir)
-            
+
     def get_file_path(self, date):
         date_str = date.strftime("%Y%m%d")
-        return os.path.join(self.data_dir, f"{date_str}.json")
-        
+        return self.storage.get_path(date_str)
+
     def save_record(self, date, record_data):
-        file_path = self.get_file_path(date)
-        
-        existing_data = []
-        if os.path.exists(file_path):
-            with open(file_path, 'r', encoding='utf-8') as f:
-                existing_data = json.load(f)
-                
         record_data['timestamp'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        existing_data.append(record_data)
-        
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(existing_data, f, ensure_ascii=False, indent=2)
-            
+        self.storage.append_record(date.strftime("%Y%m%d"), record_data)
+
     def load_records(self, date):
-        file_path = self.get_file_path(date)
-        if os.path.exists(file_path):
-            with open(file_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        return []
-        
+        return self.storage.load_records(date.strftime("%Y%m%d"))
+
     def get_all_dates(self):
-        dates = []
-        for filename in os.listdir(self.data_dir):
-            if filename.endswith('.json'):
-                date_str = filename[:-5]
-                try:
-                    date = datetime.strptime(date_str, "%Y%m%d")
-                    dates.append(date)
-                except ValueError:
-                    continue
-        return sorted(dates)
-        
+        """返回有记录的所有日期（从索引读取，不再逐个解析文件名）"""
+        self.record_index.verify_all(self.open_component_records)
+        return [datetime.strptime(date_str, "%Y-%m-%d") for date_str in self.record_index.dates()]
+
+    def find_records(self, date=None, category=None, activity=None, start=None, end=None, component_ids=None):
+        """按日期/类别/活动名查找记录，返回 {组件: [记录]}，只读取有匹配记录的组件
+
+        start/end 为日期范围 [start, end)，activity 按规范化后的活动名匹配。
+        """
+        with metrics.span('records.find'):
+            self.record_index.verify_all(self.open_component_records)
+            matches = self.record_index.lookup(date, category, activity, start, end)
+            if component_ids is not None:
+                order = [component_id for component_id in component_ids if component_id in matches]
+            else:
+                order = sorted(matches)
+            results = {}
+            for component_id in order:
+                # 按需解码的序列只解码匹配的记录
+                records = self.open_component_records(component_id)
+                results[component_id] = [records[i] for i in matches[component_id] if i < len(records)]
+            return results
+
+    def search(self, query, limit=50, registered=None):
+        """全文检索活动、优化建议和备注，返回按相关度排序的 [(组件, 分数)]
+
+        registered 是注册表中组件 ID 的快照；在后台线程中检索时由主线程取好
+        传入，注册表只在主线程中修改。
+        """
+        if registered is None:
+            registered = frozenset(self.registry)
+        with metrics.span('search'):
+            component_ids = set(self.storage.list_keys()) | registered
+            self.search_index.verify_all(component_ids, self.open_component_records, self.read_current_note)
+            return self.search_index.search(query, limit)
+
+    def search_async(self, query, callback, limit=50):
+        """在后台检索（第一次检索可能需要重建索引），完成后在主线程中调用 callback(hits)"""
+        registered = frozenset(self.registry)
+        return self.io.submit_read('search', self.search, query, limit, registered, callback=callback)
+
+    def rebuild_record_index(self):
+        """丢弃并重建二级索引"""
+        self.flush()
+        self.record_index.rebuild(self.load_component_records)
+
+    def attach(self, widget):
+        """把后台 I/O 的回调接入 Tk 主循环"""
+        self.io.attach(widget)
+
+    def warm_up(self):
+        """在后台提前读取二级索引和检索索引（界面显示之后调用）"""
+        self.io.submit_read('warm_up', self.record_index.ensure_loaded)
+        self.io.submit_read('warm_up', self.search_index.ensure_loaded)
+
     def save_components(self, components_data):
-        """保存组件信息到文件"""
-        with open(self.components_file, 'w', encoding='utf-8') as f:
-            json.dump(components_data, f, ensure_ascii=False, indent=2)
-            
+        """保存组件信息到文件（延迟写入，短时间内的多次保存只写最后一次）"""
+        components_data = list(components_data)
+        self._components = components_data
+        self.write_buffer.put(
+            'components',
+            components_data,
+            metrics.timed('components.save', self._write_components),
+            components_data
+        )
+
+    def _write_components(self, components_data):
+        """写入组件列表，每个组件带上当前的摘要"""
+        self.storage.save_components(self.summaries.attach(components_data))
+
     def load_components(self):
-        """从文件加载组件信息"""
-        if os.path.exists(self.components_file):
-            with open(self.components_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        return []
+        """从文件加载组件信息并登记到注册表"""
+        self.write_buffer.flush('components')
+        self.io.wait_for_writes('components')
+        with metrics.span('components.load'):
+            components_data = self.storage.load_components()
+            self.summaries.load(components_data)
+        for component_id, summary in self.summaries.items():
+            if 'stats' in summary:
+                # 统计缓存缺失时（例如缓存文件被删除）可以用摘要校验后直接采用
+                self.stats_cache.adopt(component_id, summary.get('signature'), summary['stats'])
+        self._components = components_data
+        self.write_buffer.remember('components', components_data)
+        self.registry.clear()
+        self.registry.register_all(components_data)
+        return components_data
+
+    def load_component_records(self, component_id):
+        """加载组件的所有记录（同步，会等待该组件排队中的写入）"""
+        self.io.wait_for_writes(('records', component_id))
+        with metrics.span('records.load'):
+            return self.storage.load_records(component_id)
+
+    def load_component_records_async(self, component_id, callback):
+        """在后台加载组件的所有记录，完成后在主线程中调用 callback(records)"""
+        return self.io.submit_read(
+            ('records', component_id),
+            metrics.timed('records.load', self.storage.load_records),
+            component_id,
+            callback=callback
+        )
+
+    def open_component_records(self, component_id, newest_first=False):
+        """打开组件记录用于遍历或按位置访问：日志后端返回按需解码的序列，内存占用与记录数基本无关"""
+        self.io.wait_for_writes(('records', component_id))
+        with metrics.span('records.open'):
+            return self.storage.open_records(component_id, newest_first)
+
+    def open_component_records_async(self, component_id, callback, newest_first=True, errback=None):
+        """在后台打开组件记录（默认按时间戳倒序），完成后在主线程中调用 callback(records)
+
+        读取出错时在主线程中调用 errback(exception)。悬停时预取过的记录直接
+        使用（预取还没完成时等它完成），此时返回 None。
+        """
+        if newest_first and self.prefetcher.take(component_id, callback, errback):
+            return None
+        return self.io.submit_read(
+            ('records', component_id),
+            metrics.timed('records.open', self.storage.open_records),
+            component_id,
+            newest_first,
+            callback=callback,
+            errback=errback
+        )
+
+    def append_component_record(self, component_id, record):
+        """向组件追加一条记录（没有 ID 时就地分配，调用方持有的记录也会带上 ID）"""
+        ensure_record_ids([record])
+        self.io.submit_write(
+            ('records', component_id),
+            metrics.timed('records.append', self.storage.append_record),
+            component_id,
+            record
+        )
+        self.stats_cache.record_added(component_id, record)
+        self.record_index.records_added(component_id, [record])
+        self.search_index.records_added(component_id, [record])
+        self.registry.publish('records_changed', component_id)
+
+    def append_component_records(self, component_id, records):
+        """向组件批量追加记录，返回写入任务的 Future"""
+        records = list(records)
+        ensure_record_ids(records)
+        future = self.io.submit_write(
+            ('records', component_id),
+            metrics.timed('records.append_batch', self.storage.append_records),
+            component_id,
+            records
+        )
+        for record in records:
+            self.stats_cache.record_added(component_id, record)
+        self.record_index.records_added(component_id, records)
+        self.search_index.records_added(component_id, records)
+        self.registry.publish('records_changed', component_id)
+        return future
+
+    def update_component_record(self, component_id, old_record, record):
+        """修改组件中的一条记录（按原记录的 ID 定位，新记录沿用该 ID）"""
+        record[RECORD_ID] = old_record[RECORD_ID]
+        self.io.submit_write(
+            ('records', component_id),
+            metrics.timed('records.update', self.storage.update_record),
+            component_id,
+            record[RECORD_ID],
+            record
+        )
+        self.stats_cache.record_updated(component_id, old_record, record)
+        self.record_index.record_updated(component_id, old_record, record)
+        self.search_index.record_updated(component_id, old_record, record)
+        self.registry.publish('records_changed', component_id)
+
+    def delete_component_record(self, component_id, record):
+        """删除组件中的一条记录（按 ID 定位）"""
+        self.io.submit_write(
+            ('records', component_id),
+            metrics.timed('records.delete', self.storage.delete_record),
+            component_id,
+            record[RECORD_ID]
+        )
+        self.stats_cache.record_deleted(component_id, record)
+        self.record_index.record_deleted(component_id, record)
+        self.search_index.record_deleted(component_id, record)
+        self.registry.publish('records_changed', component_id)
+
+    def archive_component(self, component_id):
+        """归档组件：记录改存为压缩的只读格式，读取方式不变；之后再写入记录时自动解除归档"""
+        if not self.storage.SUPPORTS_ARCHIVE:
+            raise ValueError("当前存储后端不支持归档")
+        return self.io.submit_write(
+            ('records', component_id),
+            metrics.timed('records.archive', self.storage.archive),
+            component_id
+        )
+
+    def is_archived(self, component_id):
+        self.io.wait_for_writes(('records', component_id))
+        return self.storage.is_archived(component_id)
+
+    def get_component_stats(self, component_id):
+        """获取组件的统计信息（记录数、体验感、各类别时长）"""
+        self.io.wait_for_writes(('records', component_id))
+        with metrics.span('stats.get'):
+            return self.stats_cache.get(component_id)
+
+    def get_component_stats_async(self, component_id, callback):
+        """获取组件统计：已缓存时立即回调，否则先用摘要回调一次，再在后台校验或计算"""
+        stats = self.stats_cache.peek(component_id)
+        if stats is not None:
+            callback(stats)
+            return None
+        stats = self.summaries.stats(component_id)
+        if stats is not None:
+            callback(stats)
+        return self.io.submit_read(
+            ('records', component_id),
+            metrics.timed('stats.get', self.stats_cache.get),
+            component_id,
+            callback=callback
+        )
+
+    def load_note(self, component_id):
+        """加载组件备注"""
+        if component_id not in self.notes:
+            self.io.wait_for_writes(('note', component_id))
+            with metrics.span('note.load'):
+                self.notes[component_id] = self.read_note(component_id)
+            self.write_buffer.remember(('note', component_id), self.notes[component_id])
+        return self.notes[component_id]
+
+    def read_note(self, component_id):
+        """读取备注（不经过备注缓存）：备注的签名与摘要一致时直接采用摘要中的备注"""
+        signature = self.storage.note_signature(component_id)
+        note = self.summaries.current_note(component_id, signature)
+        if note is None:
+            note = self.storage.load_note(component_id)
+            # 签名在读取之前取得，读取期间被修改时下次会因签名不一致而重新读取
+            self.summaries.set_note(component_id, note, signature)
+        return note
+
+    def read_current_note(self, component_id):
+        """读取备注的最新内容，可以在后台线程中调用
+
+        先提交还在延迟写入缓冲中的修改并等它写完，再读取；不写入备注缓存
+        （备注缓存只在主线程中修改）。
+        """
+        key = ('note', component_id)
+        self.write_buffer.flush(key)
+        self.io.wait_for_writes(key)
+        return self.read_note(component_id)
+
+    def load_note_async(self, component_id, callback):
+        """加载组件备注：已缓存时立即回调，否则先用摘要回调一次，再在后台校验或读取"""
+        if component_id in self.notes:
+            callback(self.notes[component_id])
+            return None
+        note = self.summaries.note(component_id)
+        if note is not None:
+            callback(note)
+
+        def done(note):
+            self.remember_note(component_id, note)
+            callback(self.notes[component_id])
+
+        return self.io.submit_read(
+            ('note', component_id),
+            metrics.timed('note.load', self.read_note),
+            component_id,
+            callback=done
+        )
+
+    def remember_note(self, component_id, note):
+        """把后台读到的备注放进备注缓存（已有缓存时以缓存为准，它可能是更新的修改）"""
+        if component_id not in self.notes:
+            self.notes[component_id] = note
+            self.write_buffer.remember(('note', component_id), note)
+
+    def prefetch_component(self, component_id):
+        """在后台预取组件的记录和备注（指针悬停在组件上时调用），返回可取消的任务或 None"""
+        return self.prefetcher.prefetch(component_id)
+
+    def save_note(self, component_id, note):
+        """保存组件备注（延迟写入，内容没有变化时不写）"""
+        self.notes[component_id] = note
+        key = ('note', component_id)
+        if self.write_buffer.put(key, note, metrics.timed('note.save', self.storage.save_note), component_id, note):
+            self._saved_notes.add(component_id)
+            self.search_index.note_changed(component_id, note)
+            self.registry.publish('note_changed', component_id, note)
+
+    def _bump_version(self, component_id, *args):
+        self._versions[component_id] = self._versions.get(component_id, 0) + 1
+
+    def data_version(self, component_id):
+        """组件数据的版本号：本次运行中记录或备注变化过之后不再相同"""
+        return self._versions.get(component_id, 0)
+
+    def _forget_component(self, component_id):
+        """丢弃组件的缓存和索引（数据文件被删除或移走之后）"""
+        self._bump_version(component_id)
+        self.prefetcher.forget(component_id)
+        self.notes.pop(component_id, None)
+        self.stats_cache.forget(component_id)
+        self.record_index.forget(component_id)
+        self.search_index.forget(component_id)
+        self._saved_notes.discard(component_id)
+        self.summaries.forget(component_id)
+
+    def delete_component_records(self, component_id):
+        """删除组件的记录文件"""
+        self.io.submit_write(('records', component_id), self.storage.delete_records, component_id)
+        self._forget_component(component_id)
+        self.registry.unregister(component_id)
+        self.registry.publish('component_removed', component_id)
+
+    def delete_component_data(self, component_id):
+        """删除组件的记录和备注文件"""
+        self.io.submit_write(('records', component_id), self.storage.delete_records, component_id)
+        self.write_buffer.forget(('note', component_id))
+        self.io.submit_write(('note', component_id), self.storage.delete_note, component_id)
+        self._forget_component(component_id)
+        self.registry.unregister(component_id)
+        self.registry.publish('component_removed', component_id)
+
+    def trash_path(self, batch_id):
+        return os.path.join(self.data_dir, TRASH_DIR, batch_id)
+
+    def delete_components(self, component_ids):
+        """批量删除组件：一次后台写入把它们的记录和备注移入回收目录
+
+        返回批次 ID，可传给 restore_components() 撤销，或传给 purge_trash() 彻底删除。
+        组件列表由调用方保存。
+        """
+        component_ids = list(component_ids)
+        batch_id = datetime.now().strftime("%Y%m%d%H%M%S%f")
+        for component_id in component_ids:
+            # 还没写出的备注不再需要写入
+            self.write_buffer.forget(('note', component_id))
+        self.io.submit_batch_write(
+            [(kind, component_id) for component_id in component_ids for kind in ('records', 'note')],
+            metrics.timed('components.trash', self.storage.trash_components),
+            component_ids,
+            self.trash_path(batch_id)
+        )
+        for component_id in component_ids:
+            self._forget_component(component_id)
+            self.registry.unregister(component_id)
+            self.registry.publish('component_removed', component_id)
+        return batch_id
+
+    def restore_components(self, batch_id, components_data, callback=None, errback=None):
+        """撤销批量删除：在后台把回收目录中的文件移回，完成后在主线程中重新登记组件
+
+        登记之后调用 callback()，移回出错时调用 errback(exception)；组件列表
+        由调用方保存。返回写入任务的 Future。
+        """
+        component_ids = [comp['component_id'] for comp in components_data]
+        future = self.io.submit_batch_write(
+            [(kind, component_id) for component_id in component_ids for kind in ('records', 'note')],
+            self.storage.restore_components,
+            component_ids,
+            self.trash_path(batch_id)
+        )
+
+        def restored(result):
+            # 文件移回之后才丢弃缓存，避免此时建立的索引漏掉这些组件
+            for comp_data in components_data:
+                # 删除之后可能又被读取过（得到空数据），恢复后重新读取
+                self._forget_component(comp_data['component_id'])
+                self.registry.register(comp_data)
+            self.io.submit_write(('trash', batch_id), shutil.rmtree, self.trash_path(batch_id), True)
+            if callback is not None:
+                callback()
+
+        self.io.when_done(future, restored, errback)
+        return future
+
+    def purge_trash(self, batch_id):
+        """彻底删除一个批次的回收目录（撤销时限已过）"""
+        self.io.submit_write(('trash', batch_id), shutil.rmtree, self.trash_path(batch_id), True)
+
+    def purge_trash_dir(self):
+        """清空整个回收目录"""
+        shutil.rmtree(os.path.join(self.data_dir, TRASH_DIR), ignore_errors=True)
+
+    def migrate_layout(self):
+        """把一批平铺目录中的组件移入分片目录，还有剩余时重新排队（每批之间其他写入可以插入）"""
+        remaining = self.storage.migrate_layout(LAYOUT_BATCH)
+        if remaining and not self._closing:
+            self.io.submit_write('layout', self.migrate_layout)
+
+    def flush(self):
+        """提交延迟写入并等待所有后台写入完成"""
+        self.write_buffer.flush()
+        self.io.flush()
+
+    def update_summaries(self):
+        """把本次运行中校验过的统计和修改过的备注写入摘要（所有写入完成、统计缓存保存之后调用）"""
+        for component_id, (signature, stats) in self.stats_cache.verified().items():
+            self.summaries.set_stats(component_id, signature, copy_stats(stats))
+        for component_id in self._saved_notes:
+            self.summaries.set_note(
+                component_id, self.notes.get(component_id, ""), self.storage.note_signature(component_id)
+            )
+        self._saved_notes.clear()
+        self.summaries.retain(comp['component_id'] for comp in self._components)
+
+    def close(self):
+        """写完排队的数据，保存统计缓存、索引和组件摘要并关闭存储后端"""
+        self._closing = True
+        self.write_buffer.flush()
+        self.io.shutdown()
+        with metrics.span('close.save_caches'):
+            self.stats_cache.save()
+            self.record_index.save()
+            self.search_index.save()
+            if self._components is not None:
+                # 没有读取过组件列表时不知道完整的列表，摘要留到下次
+                self.update_summaries()
+                if self.summaries.dirty:
+                    self._write_components(self._components)
+                    self.summaries.dirty = False
+        self.storage.close()
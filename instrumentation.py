@@ -0,0 +1,197 @@
+"""日志与性能埋点
+
+日志使用标准库 logging，各模块通过 logging.getLogger(__name__) 获取记录器，
+由 configure_logging() 统一设置级别和格式（文本或每行一个 JSON）。
+
+埋点使用全局的 metrics：
+    with metrics.span("records.load"):   # 计时，结果进入同名直方图
+        ...
+    metrics.count("stats.cache_hit")      # 计数
+未启用时 span() 返回共享的空上下文，count() 直接返回，几乎没有开销。
+"""
+import json
+import logging
+import math
+import threading
+import time
+
+# 直方图的桶上界（毫秒），最后一个桶收纳更大的值
+HISTOGRAM_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, math.inf)
+
+LOG_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+
+
+class JsonFormatter(logging.Formatter):
+    """每条日志输出为一行 JSON，extra 中的字段一并输出"""
+
+    RESERVED = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime'}
+
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in self.RESERVED:
+                entry[key] = value
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def configure_logging(level="WARNING", json_format=False):
+    """设置根记录器的级别和输出格式"""
+    handler = logging.StreamHandler()
+    handler.setFormatter(JsonFormatter() if json_format else logging.Formatter(LOG_FORMAT))
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(level.upper() if isinstance(level, str) else level)
+
+
+class Histogram:
+    """耗时直方图（毫秒）：固定桶计数以及次数、总和、最小、最大值"""
+
+    def __init__(self):
+        self.buckets = [0] * len(HISTOGRAM_BUCKETS)
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    def add(self, value):
+        for i, bound in enumerate(HISTOGRAM_BUCKETS):
+            if value <= bound:
+                self.buckets[i] += 1
+                break
+        self.count += 1
+        self.total += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def percentile(self, fraction):
+        """按桶估算分位数（返回所在桶的上界，超出最大桶时返回最大值）"""
+        if not self.count:
+            return None
+        target = fraction * self.count
+        seen = 0
+        for bound, bucket in zip(HISTOGRAM_BUCKETS, self.buckets):
+            seen += bucket
+            if seen >= target:
+                return min(bound, self.max)
+        return self.max
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'total_ms': round(self.total, 3),
+            'mean_ms': round(self.total / self.count, 3) if self.count else None,
+            'min_ms': round(self.min, 3) if self.count else None,
+            'max_ms': round(self.max, 3),
+            'p50_ms': self.percentile(0.5),
+            'p95_ms': self.percentile(0.95),
+            'buckets': {
+                ('inf' if bound == math.inf else str(bound)): bucket
+                for bound, bucket in zip(HISTOGRAM_BUCKETS, self.buckets) if bucket
+            },
+        }
+
+
+class _NullSpan:
+    """未启用埋点时使用的空上下文"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.observe(self.name, (time.perf_counter() - self.start) * 1000)
+        return False
+
+
+class Metrics:
+    """计数器和耗时直方图的汇总（线程安全，后台 I/O 线程中也可使用）"""
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self.started = time.time()
+
+    def enable(self, enabled=True):
+        self.enabled = enabled
+
+    def reset(self):
+        with self._lock:
+            self.counters = {}
+            self.histograms = {}
+            self.started = time.time()
+
+    def span(self, name):
+        """计时上下文，耗时记入名为 name 的直方图"""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name)
+
+    def timed(self, name, func):
+        """返回带计时的 func（用于提交到后台线程的任务），未启用时原样返回"""
+        if not self.enabled:
+            return func
+
+        def wrapper(*args, **kwargs):
+            with _Span(self, name):
+                return func(*args, **kwargs)
+        return wrapper
+
+    def count(self, name, value=1):
+        """计数器加 value"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe(self, name, milliseconds):
+        """记录一次耗时（毫秒）"""
+        if not self.enabled:
+            return
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.add(milliseconds)
+
+    def snapshot(self):
+        """当前数据的字典形式（用于导出 JSON 或在调试面板中显示）"""
+        with self._lock:
+            return {
+                'started': self.started,
+                'elapsed_s': round(time.time() - self.started, 3),
+                'counters': dict(sorted(self.counters.items())),
+                'histograms': {name: h.to_dict() for name, h in sorted(self.histograms.items())},
+            }
+
+    def dump(self, path):
+        """把当前数据写入 JSON 文件"""
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.snapshot(), f, ensure_ascii=False, indent=2)
+
+
+# 全局埋点对象，默认关闭
+metrics = Metrics()
@@ -1,23 +1,69 @@
+import logging
 import tkinter as tk
+from collections import OrderedDict
 from tkinter import ttk
+from tkinter import filedialog
 from tkinter import messagebox
 from datetime import datetime, timedelta
 from components import DateComponent
+from analytics import Analytics
 from data_manager import DataManager
-import json
-import os
+from instrumentation import metrics
+from record_cards import RecordCards
+from startup_profiler import StartupProfiler
+from stats_cache import CATEGORIES
+from virtual_list import LAZY_SEQUENCES, VirtualList
+
+logger = logging.getLogger(__name__)
 
 class MainApplication(tk.Frame):
-    def __init__(self, master=None):
+    # 快速启动时每批在后台刷新的组件数
+    REFRESH_BATCH = 20
+    # 批量删除后可以撤销的秒数
+    UNDO_SECONDS = 10
+    # 关闭后保留的详细视图个数和它们的记录占用的内存上限（MB）
+    DETAIL_CACHE_SIZE = 5
+    DETAIL_CACHE_MB = 64
+    # 详细视图中记录的显示方式：canvas 在画布上直接绘制卡片，widgets 为每条可见记录创建控件
+    RECORD_VIEWS = ('canvas', 'widgets')
+
+    def __init__(self, master=None, backend="journal", fsync="always", fsync_interval=1.0,
+                 profiler=None, fast_start=False, detail_cache_size=None, detail_cache_mb=None,
+                 record_view='canvas'):
         super().__init__(master)
         self.master = master
-        self.data_manager = DataManager()
+        self.profiler = profiler or StartupProfiler()
+        self.fast_start = fast_start
+        self.record_view = record_view
+        # 关闭的详细视图隐藏后按最近使用的顺序保留，再次打开时直接显示
+        self.detail_views = OrderedDict()
+        self.detail_cache_size = self.DETAIL_CACHE_SIZE if detail_cache_size is None else detail_cache_size
+        if detail_cache_mb is None:
+            detail_cache_mb = self.DETAIL_CACHE_MB
+        self.detail_cache_bytes = int(detail_cache_mb * 1024 * 1024)
+        with self.profiler.phase("DataManager 初始化"):
+            self.data_manager = DataManager(
+                backend=backend,
+                fsync=fsync,
+                fsync_interval=fsync_interval,
+                profiler=self.profiler
+            )
+        self.registry = self.data_manager.registry
+        self.analytics = Analytics(self.data_manager)
+        # 后台 I/O 的结果在主循环中回调，写入失败时提示
+        self.data_manager.attach(self)
+        self.data_manager.io.on_write_error = lambda e: messagebox.showerror("错误", f"保存数据时出错：{str(e)}")
         self.pack(fill=tk.BOTH, expand=True)
-        self.create_widgets()
-        self.load_saved_components()  # 加载保存的组件
+        with self.profiler.phase("创建界面"):
+            self.create_widgets()
+        with self.profiler.phase("加载组件列表"):
+            self.load_saved_components()  # 加载保存的组件
+        self.after_idle(self.on_first_paint)
         
         # 绑定窗口关闭事件
         self.master.protocol("WM_DELETE_WINDOW", self.on_closing)
+        # F12 打开调试面板（查看埋点数据）
+        self.master.bind('<F12>', lambda e: self.open_debug_panel())
         
     def create_widgets(self):
         try:
@@ -32,18 +78,20 @@ class MainApplication(tk.Frame):
             )
             self.title_label.pack()
             
-            # 创建滚动区域
+            # 搜索框：检索活动、优化建议和备注，输入停顿后再检索
+            self.search_frame = ttk.Frame(self.title_frame)
+            self.search_frame.pack(pady=(5, 0))
+            ttk.Label(self.search_frame, text="搜索:").pack(side=tk.LEFT)
+            self.search_var = tk.StringVar()
+            self.search_entry = ttk.Entry(self.search_frame, textvariable=self.search_var, width=40)
+            self.search_entry.pack(side=tk.LEFT, padx=5)
+            self.search_var.trace_add('write', self.on_search_changed)
+            self.search_job = None
+            self.is_searching = False
+            
+            # 创建滚动区域（虚拟列表：只为可见的组件创建行控件）
             self.canvas = tk.Canvas(self, bg='white')
             self.scrollbar = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self.canvas.yview)
-            self.scrollable_frame = ttk.Frame(self.canvas)
-            
-            self.scrollable_frame.bind(
-                "<Configure>",
-                lambda e: self.canvas.configure(scrollregion=self.canvas.bbox("all"))
-            )
-            
-            self.canvas.create_window((0, 0), window=self.scrollable_frame, anchor="nw")
-            self.canvas.configure(yscrollcommand=self.scrollbar.set)
             
             self.canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
             self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
@@ -88,6 +136,27 @@ class MainApplication(tk.Frame):
             )
             self.batch_delete_button.pack(side=tk.RIGHT)
             
+            # 统计分析按钮
+            self.analytics_button = ttk.Button(
+                self.batch_frame,
+                text="统计分析",
+                command=self.open_analytics_view,
+                width=10
+            )
+            self.analytics_button.pack(side=tk.LEFT)
+            
+            # 批量删除后的撤销提示（初始隐藏）
+            self.undo_label = ttk.Label(self.batch_frame, text="")
+            self.undo_button = ttk.Button(
+                self.batch_frame,
+                text="撤销",
+                command=self.undo_batch_delete,
+                width=6
+            )
+            # 等待撤销的批量删除：(批次 ID, 删除前的完整组件列表, 被删除的组件)
+            self.pending_delete = None
+            self.undo_job = None
+            
             # 确认删除按钮（初始隐藏）
             self.confirm_delete_button = ttk.Button(
                 self.batch_frame,
@@ -113,13 +182,53 @@ class MainApplication(tk.Frame):
                 command=self.toggle_all_selections
             )
             
-            # 用于存储组件和其复选框状态的字典
-            self.component_selections = {}
+            # 组件列表（按显示顺序，保存在 component_list.items 中），按 ID 的查找走注册表
+            self.component_list = VirtualList(
+                self.canvas,
+                self.scrollbar,
+                self.create_row,
+                self.bind_row,
+                key=lambda comp: comp['component_id']
+            )
+            # 批量删除时选中的组件 ID
+            self.selected_ids = set()
             self.is_batch_deleting = False
             
+            # 订阅数据变更，刷新对应行的显示
+            self.registry.subscribe('records_changed', self.update_component_statistics)
+            self.registry.subscribe('note_changed', self.update_component_note)
+            self.registry.subscribe('component_removed', self.drop_detail_view)
+            
         except Exception as e:
-            print(f"创建界面时出错: {e}")
-        
+            logger.exception("创建界面时出错: %s", e)
+        
+    def on_first_paint(self):
+        """主界面第一次绘制完成后再做不影响首屏的准备工作"""
+        with self.profiler.phase("首次绘制"):
+            self.update_idletasks()
+        self.profiler.painted()
+        if self.profiler.enabled:
+            self.after(int(self.profiler.REPORT_TIMEOUT * 1000), self.profiler.check_timeout)
+        self.data_manager.warm_up()
+        if self.fast_start:
+            self.refresh_progressively([comp['component_id'] for comp in self.registry.all()])
+
+    def refresh_progressively(self, component_ids, futures=()):
+        """快速启动后分批在后台校验所有组件的备注和统计，刷新组件摘要"""
+        if any(not future.done() for future in futures):
+            self.after(50, self.refresh_progressively, component_ids, futures)
+            return
+        batch = component_ids[:self.REFRESH_BATCH]
+        if not batch:
+            return
+        ignore = lambda value: None
+        futures = []
+        for component_id in batch:
+            futures.append(self.data_manager.get_component_stats_async(component_id, ignore))
+            futures.append(self.data_manager.load_note_async(component_id, ignore))
+        futures = [future for future in futures if future is not None]
+        self.after(10, self.refresh_progressively, component_ids[self.REFRESH_BATCH:], futures)
+
     def show_tooltip(self, event):
         """显示提示文本"""
         button_x = self.add_button.winfo_x()
@@ -134,6 +243,10 @@ class MainApplication(tk.Frame):
     
     def add_component(self):
         """添加新组件"""
+        if self.search_var.get():
+            # 新组件加在完整列表末尾，先退出搜索
+            self.search_var.set("")
+            self.show_all_components()
         current_datetime = datetime.now()
         date_str = current_datetime.strftime("%Y年%m月%d日 %H:%M:%S")
         component_id = current_datetime.strftime("%Y%m%d%H%M%S")
@@ -145,64 +258,123 @@ class MainApplication(tk.Frame):
         """创建组件"""
         try:
             # 检查组件ID是否已存在
-            if component_id in self.component_selections:
+            if component_id in self.registry:
                 return None
             
-            # 创建组件框架
-            component_frame = ttk.Frame(self.scrollable_frame)
-            component_frame.pack(fill=tk.X, padx=10, pady=5)
-            
-            # 创建内容框架
-            content_frame = ttk.Frame(component_frame)
-            content_frame.pack(side=tk.LEFT, fill=tk.X, expand=True)
-            
-            # 添加复选框（初始隐藏）
-            select_var = tk.BooleanVar()
-            checkbox = ttk.Checkbutton(
-                component_frame,
-                variable=select_var,
-                command=self.update_select_all_state
-            )
-            
-            # 创建日期组件，直接传递 data_manager
-            component = DateComponent(
-                content_frame,
-                date=date,
-                command=lambda d: self.open_detail_view(d, component_id),
-                datetime_str=date_str,
-                component_id=component_id,
-                on_delete=self.delete_component,
-                data_manager=self.data_manager  # 添加这一行
-            )
-            component.pack(fill=tk.X, expand=True)
-            
-            # 保存组件和复选框状态的引用
-            self.component_selections[component_id] = {
-                'component': component,
-                'frame': component_frame,
-                'checkbox': select_var,
-                'checkbox_widget': checkbox
+            comp_data = {
+                'component_id': component_id,
+                'date_str': date_str,
+                'date': date.strftime("%Y-%m-%d %H:%M:%S")
             }
+            self.registry.register(comp_data)
+            self.component_list.append(comp_data)
             
-            return component
+            return comp_data
             
         except Exception as e:
-            print(f"创建组件时出错: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("创建组件时出错: %s", e)
             return None
         
+    def create_row(self):
+        """创建一个可复用的行控件"""
+        # 创建组件框架
+        component_frame = ttk.Frame(self.canvas)
+        
+        # 创建内容框架
+        content_frame = ttk.Frame(component_frame)
+        content_frame.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        
+        # 添加复选框（初始隐藏）
+        select_var = tk.BooleanVar()
+        checkbox = ttk.Checkbutton(component_frame, variable=select_var)
+        
+        # 创建日期组件，内容在 bind_row 时填充
+        component = DateComponent(
+            content_frame,
+            date=None,
+            command=None,
+            datetime_str="",
+            component_id=None,
+            on_delete=self.delete_component,
+            data_manager=self.data_manager,
+            profiler=self.profiler
+        )
+        component.pack(fill=tk.X, expand=True)
+        component.command = lambda d: self.open_detail_view(d, component.component_id)
+        
+        row = {
+            'component': component,
+            'frame': component_frame,
+            'checkbox': select_var,
+            'checkbox_widget': checkbox
+        }
+        checkbox.configure(command=lambda: self.on_row_checked(row))
+        if self.is_batch_deleting:
+            checkbox.pack(side=tk.LEFT, padx=5)
+        return row
+        
+    def bind_row(self, row, comp_data):
+        """把行控件绑定到指定组件，按需加载备注和统计信息"""
+        component_id = comp_data['component_id']
+        date = datetime.strptime(comp_data['date'], "%Y-%m-%d %H:%M:%S")
+        row['component'].set_component(component_id, comp_data['date_str'], date)
+        row['checkbox'].set(component_id in self.selected_ids)
+        
+    def remove_components(self, component_ids):
+        """从列表中移除组件并回收它们的行"""
+        for component_id in component_ids:
+            self.registry.unregister(component_id)
+            self.selected_ids.discard(component_id)
+        self.component_list.remove(component_ids)
+        
+    def find_component(self, component_id):
+        """查找当前显示的组件控件，不在可见范围时返回 None"""
+        row = self.component_list.find_row(component_id)
+        return row['component'] if row else None
+        
     def open_detail_view(self, date, component_id):
-        """打开详细视图并隐藏主窗口"""
+        """打开详细视图并隐藏主窗口（最近关闭过的视图直接重新显示）"""
         self.master.withdraw()
-        detail_window = DetailView(self, date, component_id)
-        detail_window.protocol("WM_DELETE_WINDOW", lambda: self.on_detail_close(detail_window))
+        view = self.detail_views.pop(component_id, None)
+        if view is not None and view.winfo_exists():
+            metrics.count('detail_cache.hit')
+            view.reopen(date)
+        else:
+            metrics.count('detail_cache.miss')
+            view = DetailView(self, date, component_id)
+        return view
+
+    def open_analytics_view(self):
+        """打开跨组件统计分析窗口"""
+        AnalyticsView(self)
+
+    def open_debug_panel(self):
+        """打开调试面板（已打开时切到前台）"""
+        panel = getattr(self, 'debug_panel', None)
+        if panel is not None and panel.winfo_exists():
+            panel.lift()
+            return
+        self.debug_panel = DebugPanel(self)
 
     def on_detail_close(self, detail_window):
-        """处理详细视图关闭事件"""
-        detail_window.destroy()
+        """处理详细视图关闭事件：隐藏视图放入缓存，超出个数或内存上限时销毁最久未用的"""
+        detail_window.withdraw()
+        self.detail_views[detail_window.component_id] = detail_window
+        total = sum(view.memory_estimate() for view in self.detail_views.values())
+        while self.detail_views and (
+            len(self.detail_views) > self.detail_cache_size or total > self.detail_cache_bytes
+        ):
+            _, view = self.detail_views.popitem(last=False)
+            total -= view.memory_estimate()
+            view.destroy()
         self.master.deiconify()  # 重显示主窗口
 
+    def drop_detail_view(self, component_id):
+        """组件被删除后销毁它缓存的详细视图"""
+        view = self.detail_views.pop(component_id, None)
+        if view is not None:
+            view.destroy()
+
     def delete_component(self, component):
         """删除组件"""
         try:
@@ -216,104 +388,72 @@ class MainApplication(tk.Frame):
             if result != 'yes':
                 return
             
-            # 删除数据文件
-            file_path = os.path.join(
-                self.data_manager.data_dir,
-                f"{component.component_id}.json"
-            )
-            if os.path.exists(file_path):
-                os.remove(file_path)
-            
-            # 删除备注文件
-            note_file = os.path.join(
-                self.data_manager.data_dir,
-                f"{component.component_id}_note.txt"
-            )
-            if os.path.exists(note_file):
-                os.remove(note_file)
-            
-            # 从选择字典中移除
-            if component.component_id in self.component_selections:
-                self.component_selections.pop(component.component_id)
+            # 删除数据文件和备注文件
+            self.data_manager.delete_component_data(component.component_id)
             
-            # 销毁组件
-            component.destroy()
+            # 从列表中移除（行控件回收复用）
+            self.remove_components([component.component_id])
             
         except Exception as e:
-            print(f"删除组件时出错: {e}")
+            logger.exception("删除组件时出错: %s", e)
             messagebox.showerror("错误", f"删除组件时出错：{str(e)}")
 
     def save_components(self):
         """保存所有组件信息"""
         try:
-            components_data = []
-            children = self.scrollable_frame.winfo_children()
-            
-            for frame in children:
-                if isinstance(frame, ttk.Frame):  # 检查是否是组件框架
-                    # 在框架中查找 DateComponent
-                    for child in frame.winfo_children():
-                        if isinstance(child, ttk.Frame):  # 内容框架
-                            for subchild in child.winfo_children():
-                                if isinstance(subchild, DateComponent):
-                                    component = subchild
-                                    components_data.append({
-                                        'component_id': component.component_id,
-                                        'date_str': component.datetime_str,
-                                        'date': component.date.strftime("%Y-%m-%d %H:%M:%S")
-                                    })
-                                    break
-            
-            self.data_manager.save_components(components_data)
+            # 搜索时列表只显示部分组件，完整的顺序以注册表为准
+            self.data_manager.save_components(self.registry.all())
             
         except Exception as e:
-            print(f"保存组件时出错: {e}")
+            logger.exception("保存组件时出错: %s", e)
         
     def load_saved_components(self):
-        """��载保存的组件"""
+        """加载保存的组件（只读取组件列表，行控件在滚动到可见时才创建）"""
         try:
-            # 空现有组件和选择状态
-            for widget in self.scrollable_frame.winfo_children():
-                widget.destroy()
-            self.component_selections.clear()
-            
-            # 加载组件数据
+            # 加载组件列表（同时登记到注册表）
             components_data = self.data_manager.load_components()
-            for comp_data in components_data:
-                date = datetime.strptime(comp_data['date'], "%Y-%m-%d %H:%M:%S")
-                self.create_component(
-                    comp_data['component_id'],
-                    comp_data['date_str'],
-                    date
-                )
+            self.selected_ids.clear()
+            self.component_list.set_items(components_data)
                 
         except Exception as e:
-            print(f"加载组件时出错: {e}")
+            logger.exception("加载组件时出错: %s", e)
         
     def on_closing(self):
         """窗口关闭时的处理"""
+        self.commit_batch_delete()  # 关闭后不能再撤销
         self.save_components()  # 保存组件信息
+        self.data_manager.close()  # 写出延迟缓冲中的数据
         self.master.destroy()
 
     def toggle_all_selections(self):
         """切换全选状态"""
         is_selected = self.select_all_var.get()
-        for data in self.component_selections.values():
-            data['checkbox'].set(is_selected)
-            
+        if is_selected:
+            self.selected_ids = {comp['component_id'] for comp in self.component_list.items}
+        else:
+            self.selected_ids.clear()
+        for row in self.component_list.visible_rows.values():
+            row['checkbox'].set(is_selected)
+            
+    def on_row_checked(self, row):
+        """行复选框被点击"""
+        component_id = row['component'].component_id
+        if row['checkbox'].get():
+            self.selected_ids.add(component_id)
+        else:
+            self.selected_ids.discard(component_id)
+        self.update_select_all_state()
+        
     def update_select_all_state(self):
         """更新全选复选框状态"""
-        all_selected = all(
-            data['checkbox'].get() 
-            for data in self.component_selections.values()
-        )
+        all_selected = len(self.selected_ids) == len(self.registry)
         self.select_all_var.set(all_selected)
         
     def confirm_batch_delete(self):
         """确认批量删除"""
         selected_components = [
-            comp_id for comp_id, data in self.component_selections.items()
-            if data['checkbox'].get()
+            comp['component_id'] for comp in self.component_list.items
+            if comp['component_id'] in self.selected_ids
         ]
         
         if not selected_components:
@@ -322,7 +462,7 @@ class MainApplication(tk.Frame):
             
         result = messagebox.askquestion(
             "确认删除",
-            f"确定要删除选中的 {len(selected_components)} 个组件吗？\n此操作不可撤销。",
+            f"确定要删除选中的 {len(selected_components)} 个组件吗？\n删除后 {self.UNDO_SECONDS} 秒内可以撤销。",
             icon='warning'
         )
         
@@ -330,30 +470,82 @@ class MainApplication(tk.Frame):
             self.batch_delete_components(selected_components)
             
     def batch_delete_components(self, component_ids):
-        """执行批量删除"""
+        """执行批量删除：数据文件在后台一次移入回收目录，列表只重新布局一次，组件列表只保存一次"""
         try:
-            for comp_id in component_ids:
-                if comp_id in self.component_selections:
-                    # 删除数据文件
-                    file_path = os.path.join(
-                        self.data_manager.data_dir,
-                        f"{comp_id}.json"
-                    )
-                    if os.path.exists(file_path):
-                        os.remove(file_path)
-                    
-                    # 从界面除组件
-                    self.component_selections[comp_id]['frame'].destroy()
-                    # 从选择字典中移除
-                    del self.component_selections[comp_id]
+            # 上一次批量删除不再可以撤销
+            self.commit_batch_delete()
+            before = self.registry.all()
+            removed = [self.registry.get(comp_id) for comp_id in component_ids if comp_id in self.registry]
+            batch_id = self.data_manager.delete_components([comp['component_id'] for comp in removed])
+            
+            # 从界面移除组件
+            self.remove_components(component_ids)
             
             # 保存更新后的组件信息
             self.save_components()
-            messagebox.showinfo("成功", "已删除选中的组件")
+            
+            self.pending_delete = (batch_id, before, removed)
+            self.undo_label.configure(text=f"已删除 {len(removed)} 个组件")
+            self.undo_label.pack(side=tk.LEFT, padx=(10, 5))
+            self.undo_button.pack(side=tk.LEFT)
+            self.undo_job = self.after(self.UNDO_SECONDS * 1000, self.commit_batch_delete)
             
         except Exception as e:
+            logger.exception("批量删除组件时出错: %s", e)
             messagebox.showerror("错误", f"批量删除组件时出错：{str(e)}")
 
+    def hide_undo(self):
+        if self.undo_job is not None:
+            self.after_cancel(self.undo_job)
+            self.undo_job = None
+        self.undo_label.pack_forget()
+        self.undo_button.pack_forget()
+
+    def commit_batch_delete(self):
+        """撤销时限已过：彻底删除回收目录中的文件"""
+        if self.pending_delete is None:
+            return
+        batch_id = self.pending_delete[0]
+        self.pending_delete = None
+        self.undo_job = None
+        self.hide_undo()
+        self.data_manager.purge_trash(batch_id)
+
+    def undo_batch_delete(self):
+        """撤销最近一次批量删除，组件回到原来的位置"""
+        if self.pending_delete is None:
+            return
+        batch_id, before, removed = self.pending_delete
+        self.pending_delete = None
+        self.hide_undo()
+        # 文件在后台移回（可能排在其他写入之后），完成后再恢复列表，界面不等待
+        self.data_manager.restore_components(
+            batch_id,
+            removed,
+            callback=lambda: self.on_components_restored(before),
+            # 写入出错已由 on_write_error 提示
+            errback=lambda e: logger.error("撤销删除时出错: %s", e)
+        )
+
+    def on_components_restored(self, before):
+        """撤销的组件已移回：按删除前的顺序重新登记，删除之后新建的组件排在最后"""
+        try:
+            order = {comp['component_id']: i for i, comp in enumerate(before)}
+            components = sorted(
+                self.registry.all(),
+                key=lambda comp: order.get(comp['component_id'], len(order))
+            )
+            self.registry.clear()
+            self.registry.register_all(components)
+            if self.is_searching:
+                self.run_search()
+            else:
+                self.component_list.set_items(components)
+            self.save_components()
+        except Exception as e:
+            logger.exception("撤销删除时出错: %s", e)
+            messagebox.showerror("错误", f"撤销删除时出错：{str(e)}")
+
     def start_batch_delete(self):
         """开始批量删除模式"""
         try:
@@ -365,15 +557,14 @@ class MainApplication(tk.Frame):
             self.cancel_delete_button.pack(side=tk.RIGHT, padx=5)
             self.select_all_checkbox.pack(side=tk.RIGHT, padx=10)
             
-            # 显示所有复选框
-            for comp_id, data in self.component_selections.items():
+            # 显示所有行的复选框（包括空闲行）
+            for data in self.component_list.all_rows():
                 checkbox = data['checkbox_widget']
-                if checkbox.winfo_exists():
-                    checkbox.pack(side=tk.LEFT, padx=5)
-                    checkbox.lift()
+                checkbox.pack(side=tk.LEFT, padx=5)
+                checkbox.lift()
                 
         except Exception as e:
-            print(f"动量���除模式时出错: {e}")
+            logger.exception("进入批量删除模式时出错: %s", e)
 
     def cancel_batch_delete(self):
         """取消批量删除模式"""
@@ -386,33 +577,73 @@ class MainApplication(tk.Frame):
         self.batch_delete_button.pack(side=tk.RIGHT)
         
         # 隐藏所有复选框并重置选择状态
-        for data in self.component_selections.values():
+        self.selected_ids.clear()
+        for data in self.component_list.all_rows():
             data['checkbox_widget'].pack_forget()
             data['checkbox'].set(False)
         self.select_all_var.set(False)
 
+    def on_search_changed(self, *args):
+        """搜索框内容变化，停顿 200 毫秒后检索"""
+        if self.search_job is not None:
+            self.after_cancel(self.search_job)
+        self.search_job = self.after(200, self.run_search)
+
+    def run_search(self):
+        """在后台检索，结果按相关度显示；搜索框清空时恢复完整列表"""
+        self.search_job = None
+        query = self.search_var.get().strip()
+        if not query:
+            self.show_all_components()
+            return
+        self.data_manager.search_async(
+            query,
+            lambda hits: self.show_search_results(query, hits),
+            limit=200
+        )
+
+    def show_search_results(self, query, hits):
+        """显示检索结果（输入已经变化时丢弃）"""
+        if query != self.search_var.get().strip():
+            return
+        items = [self.registry.get(component_id) for component_id, score in hits if component_id in self.registry]
+        self.is_searching = True
+        self.component_list.set_items(items)
+
+    def show_all_components(self):
+        """退出搜索，恢复完整的组件列表"""
+        if self.is_searching:
+            self.is_searching = False
+            self.component_list.set_items(self.registry.all())
+
     def update_component_statistics(self, component_id):
-        """更新指定组件的统计信息"""
-        for widget in self.scrollable_frame.winfo_children():
-            for child in widget.winfo_children():
-                if isinstance(child, ttk.Frame):  # 内容框架
-                    for subchild in child.winfo_children():
-                        if isinstance(subchild, DateComponent):
-                            if subchild.component_id == component_id:
-                                subchild.update_statistics()
-                                return
+        """更新指定组件的统计信息（不在可见范围的组件在显示时再读取）"""
+        component = self.find_component(component_id)
+        if component is not None:
+            component.update_statistics()
+
+    def update_component_note(self, component_id, note):
+        """更新指定组件的备注显示"""
+        component = self.find_component(component_id)
+        if component is not None:
+            component.update_note(note)
 
 class DetailView(tk.Toplevel):
+    # 估算内存时每条已解码的记录按 1 KB 计
+    RECORD_BYTES = 1024
+
     def __init__(self, master, date, component_id):
         super().__init__(master)
         self.master = master
         self.date = date
         self.component_id = component_id
         self.data_manager = master.data_manager
-        self.records = []
+        # 显示的数据对应的版本号，重新打开时版本变化过才重新读取
+        self.version = self.data_manager.data_version(component_id)
         self.setup_window()
         self.create_widgets()
         self.load_records()
+        self.protocol("WM_DELETE_WINDOW", self.close)
 
     def setup_window(self):
         """设置窗口属性"""
@@ -441,7 +672,7 @@ class DetailView(tk.Toplevel):
             self.top_frame,
             text="←",
             width=3,
-            command=self.destroy
+            command=self.close
         )
         self.back_button.pack(side=tk.LEFT, padx=10)
         
@@ -514,177 +745,218 @@ class DetailView(tk.Toplevel):
             command=self.canvas.yview
         )
         
-        self.scrollable_frame = ttk.Frame(self.canvas, style='DetailView.TFrame')
-        self.scrollable_frame.bind(
-            "<Configure>",
-            lambda e: self.canvas.configure(scrollregion=self.canvas.bbox("all"))
+        # 虚拟列表：只为可见的记录创建行（画布上绘制的卡片或一组控件），行高随内容变化
+        if self.master.record_view == 'canvas':
+            self.cards = RecordCards(self.canvas, self.edit_record, self.confirm_delete)
+            create_row, bind_row = self.cards.create_row, self.cards.bind_row
+        else:
+            create_row, bind_row = self.create_record_row, self.bind_record_row
+        self.record_list = VirtualList(
+            self.canvas,
+            self.scrollbar,
+            create_row,
+            bind_row,
+            key=lambda record: record['id'],
+            uniform=False,
+            drawn=self.master.record_view == 'canvas'
         )
         
-        self.canvas.create_window((0, 0), window=self.scrollable_frame, anchor="nw")
-        self.canvas.configure(yscrollcommand=self.scrollbar.set)
-        
         self.canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
         
+        # 记录读取完成前显示的提示
+        self.loading_label = ttk.Label(
+            self.content_frame,
+            text="加载中…",
+            font=('微软雅黑', 10),
+            foreground='gray'
+        )
+        
     def show_add_dialog(self):
         """显示添加记录对话框"""
         dialog = AddRecordDialog(self)
         dialog.wait_window()
-        # 对话框关闭后，更新主界面的组件统计
-        main_app = self.master
-        if isinstance(main_app, MainApplication):
-            for frame in main_app.scrollable_frame.winfo_children():
-                if isinstance(frame, ttk.Frame):
-                    for child in frame.winfo_children():
-                        if isinstance(child, ttk.Frame):
-                            for subchild in child.winfo_children():
-                                if isinstance(subchild, DateComponent):
-                                    if subchild.component_id == self.component_id:
-                                        subchild.update_statistics()
-                                        break
+        # 主界面的组件统计由 records_changed 事件更新
 
     def destroy(self):
         """写destroy方法"""
         self.master.master.deiconify()  # 显示主窗
         super().destroy()
+
+    def close(self):
+        """关闭视图：隐藏后交给主界面缓存，而不是销毁"""
+        self.save_note()
+        # 显示期间的修改都来自这个视图，界面上已经是最新的
+        self.version = self.data_manager.data_version(self.component_id)
+        self.master.on_detail_close(self)
+
+    def reopen(self, date):
+        """重新显示缓存的视图，数据在隐藏期间变化过时重新读取备注和记录"""
+        self.date = date
+        self.date_label.configure(text=date.strftime("%Y年%m月%d日"))
+        self.deiconify()
+        self.lift()
+        version = self.data_manager.data_version(self.component_id)
+        if version != self.version:
+            self.version = version
+            self.note_entry.delete(0, tk.END)
+            self.load_note()
+            self.load_records()
+
+    def memory_estimate(self):
+        """估算视图持有的记录占用的内存（字节），主界面据此限制缓存的总大小"""
+        records = self.record_list.items
+        if isinstance(records, LAZY_SEQUENCES):
+            return records.memory_estimate(self.RECORD_BYTES)
+        return len(records) * self.RECORD_BYTES
         
     def get_file_path(self):
         """获当前组件的数据件路径"""
-        return os.path.join(
-            self.data_manager.data_dir,
-            f"{self.component_id}.json"
-        )
+        return self.data_manager.storage.get_path(self.component_id)
+
+    @property
+    def records(self):
+        """当前显示的记录（按时间戳倒序）"""
+        return self.record_list.items
 
     def load_records(self):
-        """加载记录"""
-        try:
-            file_path = self.get_file_path()
-            if os.path.exists(file_path):
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    self.records = json.load(f)
-                # 确保记录按时间戳排序
-                self.records.sort(key=lambda x: x.get('timestamp', ''), reverse=True)
-            else:
-                self.records = []
-            self.display_records()
-        except Exception as e:
-            print(f"Error loading records: {e}")
-            messagebox.showerror("错误", f"加载记录时出错：{str(e)}")
-            self.records = []
-            self.display_records()
-
-    def display_records(self):
-        """显示所有记录"""
-        # 清空现有显示
-        for widget in self.scrollable_frame.winfo_children():
-            widget.destroy()
-        
-        # 显示每条记录
-        for record in self.records:
-            self.create_record_widget(record)
-        
-    def create_record_widget(self, record):
-        """创建单条记录的显示组件"""
+        """加载记录（后台读取；第一次读取完成前显示加载提示，重新读取时保留旧的记录）"""
+        if not self.record_list.items:
+            self.loading_label.place(relx=0.5, rely=0.3, anchor="center")
         try:
-            # 创建录架
-            record_frame = ttk.Frame(self.scrollable_frame, style='Record.TFrame')
-            record_frame.pack(fill=tk.X, padx=10, pady=5)
-            
-            # 主内容框架
-            main_frame = ttk.Frame(record_frame)
-            main_frame.pack(fill=tk.X, padx=10, pady=5)
-            
-            # 创建两列布局
-            left_frame = ttk.Frame(main_frame)
-            left_frame.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=(0, 10))
-            
-            button_frame = ttk.Frame(main_frame)
-            button_frame.pack(side=tk.RIGHT, anchor='ne')
-            
-            # 编辑和删除按钮
-            edit_button = ttk.Button(
-                button_frame,
-                text="编辑",
-                width=6,
-                command=lambda: self.edit_record(record, record_frame)
+            self.data_manager.open_component_records_async(
+                self.component_id, self.on_records_loaded, errback=self.on_records_failed
             )
-            edit_button.pack(side=tk.TOP, pady=2)
-            
-            delete_button = ttk.Button(
-                button_frame,
-                text="删除",
-                width=6,
-                command=lambda: self.confirm_delete(record, record_frame)
-            )
-            delete_button.pack(side=tk.TOP, pady=2)
-            
-            # 内容部分（在左框架中）
-            # 第一行：标题行
-            title_frame = ttk.Frame(left_frame)
-            title_frame.pack(fill=tk.X, pady=(0, 5))
-            
-            # 颜色标
-            color_frame = ttk.Frame(title_frame, width=20, height=20)
-            color_frame.pack(side=tk.LEFT, padx=(0, 10))
-            color_value = record.get('颜色标记', 'gray')
-            color_canvas = tk.Canvas(color_frame, width=20, height=20, bg=color_value)
-            color_canvas.pack()
-            
-            # 活动名称
-            ttk.Label(
-                title_frame,
-                text=record.get('活动', '未命名活动'),
-                style='RecordTitle.TLabel'
-            ).pack(side=tk.LEFT)
-            
-            # 第二行：时间信息
-            time_frame = ttk.Frame(left_frame)
-            time_frame.pack(fill=tk.X, pady=2)
-            
-            actual_time = record.get('实际时间', '0')
-            estimated_time = record.get('预估时间', '0')
-            time_info = f"时间段: {record.get('时间段', '未设置')} | 实际时间: {actual_time}分钟 | 预估时间: {estimated_time}分钟"
-            ttk.Label(
-                time_frame,
-                text=time_info,
-                style='RecordContent.TLabel'
-            ).pack(anchor=tk.W)
-            
-            # 第三行：体验感和类别
-            info_frame = ttk.Frame(left_frame)
-            info_frame.pack(fill=tk.X, pady=2)
-            
-            ttk.Label(
-                info_frame,
-                text=f"体验感: {record.get('体验感', '0')} | 类别: {record.get('类别', '未分类')}",
-                style='RecordContent.TLabel'
-            ).pack(anchor=tk.W)
-            
-            # 第四行：优化建议（添加动换行）
-            suggestion = record.get('优化建议', '').strip()
-            if suggestion:
-                suggestion_frame = ttk.Frame(left_frame)
-                suggestion_frame.pack(fill=tk.X, pady=2)
-                ttk.Label(
-                    suggestion_frame,
-                    text=f"优化建议: {suggestion}",
-                    style='RecordContent.TLabel',
-                    wraplength=600  # 自动换行，但保留较大宽度
-                ).pack(anchor=tk.W, fill=tk.X)
-            
-            # 时间戳
-            if 'timestamp' in record:
-                timestamp_frame = ttk.Frame(left_frame)
-                timestamp_frame.pack(fill=tk.X, pady=(5, 0))
-                ttk.Label(
-                    timestamp_frame,
-                    text=f"记录时间: {record['timestamp']}",
-                    style='RecordContent.TLabel',
-                    foreground='gray'
-                ).pack(side=tk.RIGHT)
-                
         except Exception as e:
-            print(f"Error displaying record: {e}")
+            self.on_records_failed(e)
+
+    def on_records_failed(self, error):
+        """记录读取失败：提示错误，去掉加载提示（重新读取时保留旧的记录）"""
+        logger.error("加载记录时出错: %s", error)
+        if not self.winfo_exists():
+            return
+        self.loading_label.place_forget()
+        messagebox.showerror("错误", f"加载记录时出错：{str(error)}", parent=self)
+
+    def on_records_loaded(self, records):
+        """记录读取完成后显示（已按时间戳倒序；日志后端的记录在滚动到可见时才解码）"""
+        if not self.winfo_exists():
+            return
+        self.loading_label.place_forget()
+        self.display_records(records)
+
+    def display_records(self, records):
+        """显示所有记录（只为可见的记录创建行控件）"""
+        with metrics.span('ui.display_records'):
+            self.record_list.set_items(records)
+        
+    def insert_record(self, record):
+        """在列表顶部插入一条新记录，不重建其他行"""
+        self.record_list.insert(0, record)
+        
+    def create_record_row(self):
+        """创建一个可复用的记录行控件"""
+        row = {}
+        
+        # 创建录架
+        record_frame = ttk.Frame(self.canvas, style='Record.TFrame')
+        row['frame'] = record_frame
+        
+        # 主内容框架
+        main_frame = ttk.Frame(record_frame)
+        main_frame.pack(fill=tk.X, padx=10, pady=5)
+        
+        # 创建两列布局
+        left_frame = ttk.Frame(main_frame)
+        left_frame.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=(0, 10))
+        
+        button_frame = ttk.Frame(main_frame)
+        button_frame.pack(side=tk.RIGHT, anchor='ne')
+        
+        # 编辑和删除按钮（操作当前绑定的记录）
+        ttk.Button(
+            button_frame,
+            text="编辑",
+            width=6,
+            command=lambda: self.edit_record(row['record'], row)
+        ).pack(side=tk.TOP, pady=2)
+        
+        ttk.Button(
+            button_frame,
+            text="删除",
+            width=6,
+            command=lambda: self.confirm_delete(row['record'], row)
+        ).pack(side=tk.TOP, pady=2)
+        
+        # 内容部分（在左框架中）
+        # 第一行：标题行
+        title_frame = ttk.Frame(left_frame)
+        title_frame.pack(fill=tk.X, pady=(0, 5))
+        
+        # 颜色标记（普通 Frame 即可，不需要 Canvas）
+        row['color'] = tk.Frame(title_frame, width=20, height=20, relief='solid', borderwidth=1)
+        row['color'].pack(side=tk.LEFT, padx=(0, 10))
+        
+        # 活动名称
+        row['title'] = ttk.Label(title_frame, style='RecordTitle.TLabel')
+        row['title'].pack(side=tk.LEFT)
+        
+        # 第二行：时间信息
+        row['time'] = ttk.Label(left_frame, style='RecordContent.TLabel')
+        row['time'].pack(anchor=tk.W, pady=2)
+        
+        # 第三行：体验感和类别
+        row['info'] = ttk.Label(left_frame, style='RecordContent.TLabel')
+        row['info'].pack(anchor=tk.W, pady=2)
+        
+        # 第四行：优化建议（自动换行，没有内容时隐藏）
+        row['suggestion'] = ttk.Label(
+            left_frame,
+            style='RecordContent.TLabel',
+            wraplength=600  # 自动换行，但保留较大宽度
+        )
+        
+        # 时间戳（没有时隐藏）
+        row['timestamp_frame'] = ttk.Frame(left_frame)
+        row['timestamp'] = ttk.Label(
+            row['timestamp_frame'],
+            style='RecordContent.TLabel',
+            foreground='gray'
+        )
+        row['timestamp'].pack(side=tk.RIGHT)
+        return row
+        
+    def bind_record_row(self, row, record):
+        """把行控件填充为指定记录"""
+        row['record'] = record
+        try:
+            row['color'].configure(bg=record.get('颜色标记', 'gray'))
+        except tk.TclError:
+            row['color'].configure(bg='gray')
+        
+        row['title'].configure(text=record.get('活动', '未命名活动'))
+        
+        actual_time = record.get('实际时间', '0')
+        estimated_time = record.get('预估时间', '0')
+        row['time'].configure(
+            text=f"时间段: {record.get('时间段', '未设置')} | 实际时间: {actual_time}分钟 | 预估时间: {estimated_time}分钟"
+        )
+        row['info'].configure(
+            text=f"体验感: {record.get('体验感', '0')} | 类别: {record.get('类别', '未分类')}"
+        )
+        
+        suggestion = record.get('优化建议', '').strip()
+        if suggestion:
+            row['suggestion'].configure(text=f"优化建议: {suggestion}")
+            row['suggestion'].pack(anchor=tk.W, fill=tk.X, pady=2, after=row['info'])
+        else:
+            row['suggestion'].pack_forget()
+        
+        if 'timestamp' in record:
+            row['timestamp'].configure(text=f"记录时间: {record['timestamp']}")
+            row['timestamp_frame'].pack(fill=tk.X, pady=(5, 0))
+        else:
+            row['timestamp_frame'].pack_forget()
         
     def confirm_delete(self, record, record_frame):
         """确认删除对话框"""
@@ -701,15 +973,10 @@ class DetailView(tk.Toplevel):
         """删除记录"""
         try:
             # 从数据文件中删除记录
-            self.records = [r for r in self.records if r.get('timestamp') != record.get('timestamp')]
+            self.data_manager.delete_component_record(self.component_id, record)
             
-            # 保存新后的记录
-            file_path = self.get_file_path()
-            with open(file_path, 'w', encoding='utf-8') as f:
-                json.dump(self.records, f, ensure_ascii=False, indent=2)
-            
-            # 从界面移除记录组件
-            record_frame.destroy()
+            # 从界面移除记录（只回收对应的行，其余行不重建）
+            self.record_list.remove([record['id']])
             
         except Exception as e:
             messagebox.showerror("错误", f"删除记录时出错：{str(e)}")
@@ -719,9 +986,11 @@ class DetailView(tk.Toplevel):
         dialog = EditRecordDialog(self, record)
         dialog.wait_window()
         
-        # 如果记录被更新，刷新显示
+        # 如果记录被更新，只刷新这一行
         if hasattr(dialog, 'updated') and dialog.updated:
-            self.load_records()
+            index = self.record_list.index_of(record['id'])
+            if index >= 0:
+                self.record_list.update(index, dialog.updated_record)
         
     def save_record(self):
         """保存记录"""
@@ -738,40 +1007,17 @@ class DetailView(tk.Toplevel):
             # 添加时间戳
             data['timestamp'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
             
-            # 加载现有记录
-            file_path = self.get_file_path()
-            records = []
-            if os.path.exists(file_path):
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    records = json.load(f)
-            
-            # 添加新记录
-            records.append(data)
+            # 追加新记录
+            self.data_manager.append_component_record(self.component_id, data)
             
-            # 保存记录
-            with open(file_path, 'w', encoding='utf-8') as f:
-                json.dump(records, f, ensure_ascii=False, indent=2)
-            
-            # 更新主界面组件的统计信息
-            for widget in self.master.scrollable_frame.winfo_children():
-                for child in widget.winfo_children():
-                    if isinstance(child, ttk.Frame):  # 内容框架
-                        for subchild in child.winfo_children():
-                            if isinstance(subchild, DateComponent):
-                                if subchild.component_id == self.component_id:
-                                    subchild.update_statistics()
-                                    break
-            
-            # 立即刷新当前视图的记录显示
-            self.load_records()
+            # 立即在当前视图中显示新记录
+            self.insert_record(data)
             
             # 清空输入框
             self.clear_inputs()
             
         except Exception as e:
-            print(f"保存记录时出错: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("保存记录时出错: %s", e)
 
     def clear_inputs(self):
         """清空所有输入框"""
@@ -796,42 +1042,35 @@ class DetailView(tk.Toplevel):
         self.tooltip.place_forget()
 
     def save_note(self, event=None):
-        """保存备注"""
+        """保存备注（备注加载完成之前不保存，否则空白的输入框会覆盖已有的备注）"""
+        if self.loaded_note is None:
+            return
         new_note = self.note_entry.get().strip()
-        note_file = os.path.join(
-            self.data_manager.data_dir,
-            f"{self.component_id}_note.txt"
-        )
-        with open(note_file, 'w', encoding='utf-8') as f:
-            f.write(new_note)
-            
-        # 更新主界面显示的备注
-        main_app = self.master
-        if isinstance(main_app, MainApplication):
-            for frame in main_app.scrollable_frame.winfo_children():
-                if isinstance(frame, ttk.Frame):
-                    for child in frame.winfo_children():
-                        if isinstance(child, ttk.Frame):
-                            for subchild in child.winfo_children():
-                                if isinstance(subchild, DateComponent):
-                                    if subchild.component_id == self.component_id:
-                                        subchild.update_note(new_note)
-                                        break
+        if new_note == self.loaded_note:
+            return
+        self.loaded_note = new_note
+        # 主界面显示的备注由 note_changed 事件更新
+        self.data_manager.save_note(self.component_id, new_note)
 
     def load_note(self):
-        """加载备注"""
+        """加载备注（后台读取；用户已经修改过输入框时不覆盖）"""
+        # 已加载的备注，None 表示还在加载
+        self.loaded_note = None
+
+        def show(note):
+            if not self.winfo_exists():
+                return
+            # 可能先用摘要中的备注回调一次，校验后再回调一次
+            current = self.note_entry.get().strip()
+            if not current or current == self.loaded_note:
+                self.note_entry.delete(0, tk.END)
+                self.note_entry.insert(0, note)
+            self.loaded_note = note
+        
         try:
-            note_file = os.path.join(
-                self.data_manager.data_dir,
-                f"{self.component_id}_note.txt"
-            )
-            if os.path.exists(note_file):
-                with open(note_file, 'r', encoding='utf-8') as f:
-                    note = f.read().strip()
-                    self.note_entry.delete(0, tk.END)
-                    self.note_entry.insert(0, note)
+            self.data_manager.load_note_async(self.component_id, show)
         except Exception as e:
-            print(f"加载备注时出错: {e}")
+            logger.exception("加载备注时出错: %s", e)
 
 class AddRecordDialog(tk.Toplevel):
     def __init__(self, master):
@@ -932,19 +1171,10 @@ class AddRecordDialog(tk.Toplevel):
             
             # 2. 保存记录
             data['timestamp'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            file_path = self.master.get_file_path()
+            self.master.data_manager.append_component_record(self.master.component_id, data)
             
-            records = []
-            if os.path.exists(file_path):
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    records = json.load(f)
-            
-            records.append(data)
-            with open(file_path, 'w', encoding='utf-8') as f:
-                json.dump(records, f, ensure_ascii=False, indent=2)
-            
-            # 3. 刷新当前视图
-            self.master.load_records()
+            # 3. 在当前视图中显示新记录
+            self.master.insert_record(data)
             
             # 4. 关闭对话框
             self.destroy()
@@ -1084,48 +1314,212 @@ class EditRecordDialog(tk.Toplevel):
                 else:
                     data[label] = widget.get()
             
-            # 保存原有时间戳
+            # 保存原有时间戳和记录 ID
             data['timestamp'] = self.record.get('timestamp', '')
-            
-            # 更新记录
-            file_path = self.master.get_file_path()
-            
-            # 从文件中读取所有记录
-            with open(file_path, 'r', encoding='utf-8') as f:
-                records = json.load(f)
+            data['id'] = self.record['id']
             
             # 更新对应的记录
-            for i, r in enumerate(records):
-                if r.get('timestamp') == data['timestamp']:
-                    records[i] = data
-                    break
-            
-            # 保存更新后的记录
-            with open(file_path, 'w', encoding='utf-8') as f:
-                json.dump(records, f, ensure_ascii=False, indent=2)
-            
-            # 更新主界面的统计信息
-            for widget in self.master.master.scrollable_frame.winfo_children():
-                for child in widget.winfo_children():
-                    if isinstance(child, ttk.Frame):  # 内容框架
-                        for subchild in child.winfo_children():
-                            if isinstance(subchild, DateComponent):
-                                if subchild.component_id == self.master.component_id:
-                                    subchild.update_statistics()
-                                    break
+            self.master.data_manager.update_component_record(
+                self.master.component_id,
+                self.record,
+                data
+            )
             
             self.updated = True
-            # 刷新主界面显示
-            self.master.load_records()
+            self.updated_record = data
             self.destroy()
             
         except Exception as e:
             messagebox.showerror("错误", f"保存记录时出错：{str(e)}")
-            print(f"Error saving record: {e}")
+            logger.exception("保存记录时出错: %s", e)
+
+class AnalyticsView(tk.Toplevel):
+    """跨组件统计：预设的几种分组查询，数据在后台扫描"""
+
+    # (名称, 查询函数)，查询函数接收 Analytics，返回 (列标题, 行列表)
+    QUERIES = [
+        ("近一年每周各类别时长", lambda a: (
+            ["周", "类别", "实际时间(分钟)"],
+            [(week, category, total) for (week, category), total in a.group_by(
+                ['week', 'category'], 'actual', 'sum',
+                start=(datetime.now() - timedelta(days=365)).strftime("%Y-%m-%d")
+            ).items()]
+        )),
+        ("各时间段平均体验感", lambda a: (
+            ["时间段", "平均体验感"],
+            [(period, f"{score:.1f}") for period, score in a.group_by('period', 'score', 'mean').items()]
+        )),
+        ("每月各类别时长", lambda a: (
+            ["月份", "类别", "实际时间(分钟)"],
+            [(month, category, total) for (month, category), total in a.group_by(
+                ['month', 'category'], 'actual', 'sum'
+            ).items()]
+        )),
+        ("近 90 天 7 日滚动时长", lambda a: (
+            ["日期", "7 日实际时间(分钟)"],
+            a.rolling(7, 'actual', 'sum', start=(datetime.now() - timedelta(days=90)).strftime("%Y-%m-%d"))
+        )),
+    ]
+
+    def __init__(self, master):
+        super().__init__(master)
+        self.master = master
+        self.analytics = master.analytics
+        self.title("统计分析")
+        self.geometry("600x500")
+        self.create_widgets()
+        self.run_query()
+
+    def create_widgets(self):
+        """创建界面控件"""
+        top_frame = ttk.Frame(self)
+        top_frame.pack(fill=tk.X, padx=10, pady=10)
+
+        self.query_var = tk.StringVar(value=self.QUERIES[0][0])
+        query_combo = ttk.Combobox(
+            top_frame,
+            textvariable=self.query_var,
+            values=[name for name, _ in self.QUERIES],
+            state='readonly',
+            width=30
+        )
+        query_combo.pack(side=tk.LEFT)
+        query_combo.bind('<<ComboboxSelected>>', lambda e: self.run_query())
+
+        self.status_label = ttk.Label(top_frame, text="")
+        self.status_label.pack(side=tk.LEFT, padx=10)
+
+        table_frame = ttk.Frame(self)
+        table_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=(0, 10))
+        self.tree = ttk.Treeview(table_frame, show='headings')
+        scrollbar = ttk.Scrollbar(table_frame, orient=tk.VERTICAL, command=self.tree.yview)
+        self.tree.configure(yscrollcommand=scrollbar.set)
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+
+    def run_query(self):
+        """在后台执行选中的查询（首次会扫描所有组件）"""
+        name = self.query_var.get()
+        query = dict(self.QUERIES)[name]
+        self.status_label.config(text="计算中...")
+        self.master.data_manager.io.submit_read(
+            ('analytics', name),
+            query,
+            self.analytics,
+            callback=lambda result: self.show_result(name, result),
+            errback=lambda error: self.show_error(name, error)
+        )
+
+    def show_error(self, name, error):
+        """查询出错时显示在状态栏"""
+        if not self.winfo_exists() or name != self.query_var.get():
+            return
+        self.status_label.config(text=f"查询出错：{error}")
+
+    def show_result(self, name, result):
+        """显示查询结果（查询已切换或窗口已关闭时忽略）"""
+        if not self.winfo_exists() or name != self.query_var.get():
+            return
+        columns, rows = result
+        self.tree.delete(*self.tree.get_children())
+        self.tree['columns'] = columns
+        for column in columns:
+            self.tree.heading(column, text=column)
+            self.tree.column(column, width=150, anchor='center')
+        for row in rows:
+            self.tree.insert('', tk.END, values=["" if value is None else value for value in row])
+        self.status_label.config(text=f"共 {len(rows)} 行")
+
+class DebugPanel(tk.Toplevel):
+    """调试面板：定时刷新显示埋点的耗时直方图和计数器"""
+
+    REFRESH_INTERVAL = 1000  # 毫秒
+    COLUMNS = ["名称", "次数", "平均(ms)", "P50(ms)", "P95(ms)", "最大(ms)"]
+
+    def __init__(self, master):
+        super().__init__(master)
+        self.title("调试面板")
+        self.geometry("640x480")
+        self.create_widgets()
+        self.refresh()
+
+    def create_widgets(self):
+        """创建界面控件"""
+        top_frame = ttk.Frame(self)
+        top_frame.pack(fill=tk.X, padx=10, pady=10)
+
+        self.enabled_var = tk.BooleanVar(value=metrics.enabled)
+        ttk.Checkbutton(
+            top_frame,
+            text="启用埋点",
+            variable=self.enabled_var,
+            command=lambda: metrics.enable(self.enabled_var.get())
+        ).pack(side=tk.LEFT)
+        ttk.Button(top_frame, text="清零", command=self.reset, width=8).pack(side=tk.LEFT, padx=5)
+        ttk.Button(top_frame, text="导出 JSON", command=self.export, width=10).pack(side=tk.LEFT)
+
+        self.status_label = ttk.Label(top_frame, text="")
+        self.status_label.pack(side=tk.LEFT, padx=10)
+
+        table_frame = ttk.Frame(self)
+        table_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=(0, 10))
+        self.tree = ttk.Treeview(table_frame, columns=self.COLUMNS, show='headings')
+        for column in self.COLUMNS:
+            self.tree.heading(column, text=column)
+            self.tree.column(column, width=180 if column == "名称" else 80, anchor='w' if column == "名称" else 'e')
+        scrollbar = ttk.Scrollbar(table_frame, orient=tk.VERTICAL, command=self.tree.yview)
+        self.tree.configure(yscrollcommand=scrollbar.set)
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+
+    def refresh(self):
+        """重新读取埋点数据并更新表格"""
+        if not self.winfo_exists():
+            return
+        snapshot = metrics.snapshot()
+        self.tree.delete(*self.tree.get_children())
+        for name, histogram in snapshot['histograms'].items():
+            self.tree.insert('', tk.END, values=[
+                name,
+                histogram['count'],
+                histogram['mean_ms'],
+                histogram['p50_ms'],
+                histogram['p95_ms'],
+                histogram['max_ms'],
+            ])
+        for name, value in snapshot['counters'].items():
+            self.tree.insert('', tk.END, values=[name, value, "", "", "", ""])
+        state = "已启用" if metrics.enabled else "未启用（勾选后开始记录）"
+        self.status_label.config(text=f"{state}，已运行 {snapshot['elapsed_s']:.0f} 秒")
+        self.after(self.REFRESH_INTERVAL, self.refresh)
+
+    def reset(self):
+        metrics.reset()
+        self.tree.delete(*self.tree.get_children())
+
+    def export(self):
+        """把埋点数据导出为 JSON 文件"""
+        path = filedialog.asksaveasfilename(
+            parent=self,
+            defaultextension=".json",
+            filetypes=[("JSON", "*.json")],
+            initialfile="metrics.json"
+        )
+        if not path:
+            return
+        try:
+            metrics.dump(path)
+        except OSError as e:
+            logger.exception("导出埋点数据时出错: %s", e)
+            messagebox.showerror("错误", f"导出埋点数据时出错：{str(e)}", parent=self)
 
 class DateComponent(ttk.Frame):
-    def __init__(self, master, date, command, datetime_str, component_id, on_delete, data_manager):
+    # 指针在日期按钮上停留这么久（毫秒）才开始预取，快速划过的行不预取
+    PREFETCH_DELAY = 120
+
+    def __init__(self, master, date, command, datetime_str, component_id, on_delete, data_manager, profiler=None):
         super().__init__(master)
+        self.profiler = profiler or StartupProfiler()
         self.date = date
         self.datetime_str = datetime_str
         self.component_id = component_id
@@ -1133,9 +1527,24 @@ class DateComponent(ttk.Frame):
         self.on_delete = on_delete
         self.data_manager = data_manager
         self.note = ""  # 添加备注属性
+        # 悬停预取：等待开始的 after 任务和进行中的预取
+        self._prefetch_job = None
+        self._prefetch = None
         
         self.create_widgets()
-        self.load_note()  # 加载备注
+        if self.component_id is not None:
+            self.load_note()  # 加载备注
+            self.update_statistics()
+
+    def set_component(self, component_id, datetime_str, date):
+        """复用控件显示另一个组件"""
+        self.cancel_prefetch()
+        self.component_id = component_id
+        self.datetime_str = datetime_str
+        self.date = date
+        self.date_button.configure(text=datetime_str)
+        self.note_label.configure(text="")
+        self.load_note()
         self.update_statistics()
 
     def create_widgets(self):
@@ -1151,9 +1560,12 @@ class DateComponent(ttk.Frame):
         self.date_button = ttk.Button(
             top_frame,
             text=self.datetime_str,
-            command=lambda: self.command(self.date)
+            command=self.open
         )
         self.date_button.pack(side=tk.LEFT)
+        # 悬停在日期按钮上时预取记录和备注，离开时取消
+        self.date_button.bind('<Enter>', self.on_hover)
+        self.date_button.bind('<Leave>', lambda e: self.cancel_prefetch())
         
         # 备注标签
         self.note_label = ttk.Label(
@@ -1173,8 +1585,14 @@ class DateComponent(ttk.Frame):
         )
         delete_button.pack(side=tk.RIGHT)
         
-        # 加载备注
-        self.load_note()
+        # 归档按钮
+        archive_button = ttk.Button(
+            top_frame,
+            text="归档",
+            width=5,
+            command=self.archive
+        )
+        archive_button.pack(side=tk.RIGHT)
         
         # 统计信息框架
         stats_frame = ttk.Frame(main_frame)
@@ -1216,85 +1634,110 @@ class DateComponent(ttk.Frame):
             )
             self.time_labels[category].pack(side=tk.LEFT, padx=5)
 
+    def archive(self):
+        """归档组件：记录改存为压缩格式，再次添加或修改记录时自动解除归档"""
+        if self.data_manager.is_archived(self.component_id):
+            messagebox.showinfo("归档", "该组件已经归档")
+            return
+        if not messagebox.askyesno(
+            "归档",
+            "归档后记录以压缩格式保存，适合不再编辑的组件。\n再次添加或修改记录时会自动解除归档。\n确定要归档吗？"
+        ):
+            return
+        try:
+            self.data_manager.archive_component(self.component_id)
+        except ValueError as e:
+            messagebox.showerror("错误", str(e))
+
+    def open(self):
+        """打开详细视图（预取的结果交给视图，不再取消）"""
+        if self._prefetch_job is not None:
+            self.after_cancel(self._prefetch_job)
+            self._prefetch_job = None
+        self._prefetch = None
+        self.command(self.date)
+
+    def on_hover(self, event=None):
+        """指针进入日期按钮，稍等片刻后开始预取"""
+        self.cancel_prefetch()
+        self._prefetch_job = self.after(self.PREFETCH_DELAY, self.start_prefetch)
+
+    def start_prefetch(self):
+        self._prefetch_job = None
+        if self.component_id is not None:
+            self._prefetch = self.data_manager.prefetch_component(self.component_id)
+
+    def cancel_prefetch(self):
+        """取消还没开始或还没完成的预取（已完成的结果留在缓存中）"""
+        if self._prefetch_job is not None:
+            self.after_cancel(self._prefetch_job)
+            self._prefetch_job = None
+        if self._prefetch is not None:
+            if self._prefetch.future is not None and not self._prefetch.future.done():
+                self._prefetch.cancel()
+            self._prefetch = None
+
     def update_note(self, note):
         """更新备注显示"""
         self.note_label.configure(text=note)
 
     def load_note(self):
-        """加载备注"""
+        """加载备注（后台读取，行控件被复用后到达的结果会被丢弃）"""
+        component_id = self.component_id
+        done = self.profiler.begin_component(component_id, "备注")
+        
+        def show(note):
+            nonlocal done
+            if done is not None:
+                done()
+                done = None
+            if self.component_id == component_id and note:
+                self.note_label.configure(text=note)
+        
         try:
-            note_file = os.path.join(
-                self.data_manager.data_dir,
-                f"{self.component_id}_note.txt"
-            )
-            if os.path.exists(note_file):
-                with open(note_file, 'r', encoding='utf-8') as f:
-                    note = f.read().strip()
-                    self.note_label.configure(text=note)
+            self.data_manager.load_note_async(component_id, show)
         except Exception as e:
-            print(f"加载备注时出错: {e}")
+            logger.exception("加载备注时出错: %s", e)
 
     def update_statistics(self):
-        """更新统计信息"""
+        """更新统计信息（已缓存时立即显示，否则先显示加载状态）"""
+        component_id = self.component_id
+        self.exp_avg_label.configure(text="平均体验感: 加载中…")
+        done = self.profiler.begin_component(component_id, "统计")
+        
+        def show(stats):
+            nonlocal done
+            if done is not None:
+                done()
+                done = None
+            if self.component_id == component_id:
+                self.show_statistics(stats)
+        
+        self.data_manager.get_component_stats_async(component_id, show)
+
+    def show_statistics(self, stats):
+        """显示统计信息"""
         try:
-            print(f"\n=== 开始更新组件统计信息 ===")
-            print(f"组件ID: {self.component_id}")
-            
-            # 1. 读取数据
-            file_path = os.path.join(
-                self.data_manager.data_dir,
-                f"{self.component_id}.json"
-            )
-            print(f"1. 数据文件路径: {file_path}")
-            print(f"   文件是否存在: {os.path.exists(file_path)}")
-            
-            if not os.path.exists(file_path):
-                print("   文件不存在，退出更新")
-                return
-                
-            with open(file_path, 'r', encoding='utf-8') as f:
-                records = json.load(f)
-            print(f"2. 读取到 {len(records)} 条记录")
-            
-            # 2. 更新标签
-            print("3. 开始更新显示")
-            print("   3.1 更新体验感")
-            exp_values = []
-            for r in records:
-                exp_str = r.get('体验感', '').strip()
-                if exp_str:
-                    try:
-                        exp_values.append(float(exp_str))
-                    except ValueError:
-                        continue
-            
-            if exp_values:
-                avg_exp = sum(exp_values) / len(exp_values)
-                print(f"   平均体验感: {avg_exp:.2f}")
-                self.exp_avg_label.configure(text=f"平均体验感: {avg_exp:.2f}")
-                self.exp_avg_label.pack(side=tk.TOP, anchor=tk.W, padx=5)
-            
-            print("   3.2 更新时长统计")
-            for category in ["学习", "健康", "投资", "娱乐", "出勤", "生活"]:
-                total_time = sum(
-                    int(r.get('实际时间', 0))
-                    for r in records
-                    if r.get('类别') == category and r.get('实际时间', '').strip()
-                )
-                
-                if total_time > 0:
-                    print(f"   {category}: {total_time}分钟")
-                    time_text = (
-                        f"{total_time // 60}小时{total_time % 60}分钟"
-                        if total_time >= 60
-                        else f"{total_time}分钟"
-                    )
-                    self.time_labels[category].configure(text=f"{category}: {time_text}")
-                    self.time_labels[category].pack(side=tk.LEFT, padx=5)
-            
-            print("=== 统计信息更新完成 ===\n")
-            
+            with metrics.span('ui.show_statistics'):
+                logger.debug("组件 %s 共 %d 条记录", self.component_id, stats['count'])
+                if stats['score_count']:
+                    avg_exp = stats['score_sum'] / stats['score_count']
+                    self.exp_avg_label.configure(text=f"平均体验感: {avg_exp:.2f}")
+                else:
+                    self.exp_avg_label.configure(text="平均体验感: --")
+
+                for category in CATEGORIES:
+                    total_time = stats['minutes'].get(category, 0)
+
+                    if total_time > 0:
+                        time_text = (
+                            f"{total_time // 60}小时{total_time % 60}分钟"
+                            if total_time >= 60
+                            else f"{total_time}分钟"
+                        )
+                        self.time_labels[category].configure(text=f"{category}: {time_text}")
+                    else:
+                        self.time_labels[category].configure(text=f"{category}: --")
+
         except Exception as e:
-            print(f"更新统计信息时出错: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("更新统计信息时出错: %s", e)
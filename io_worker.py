@@ -0,0 +1,156 @@
+import logging
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+class IOWorker:
+    """后台 I/O：读取在线程池中执行并返回 Future，写入在单独的线程中按顺序执行
+
+    Tk 只能在主线程中操作，所以回调不会在工作线程里直接调用，而是放进
+    结果队列，由 attach() 之后的 after() 轮询在主线程中执行。
+    同一个键的读取会先等待该键之前提交的写入完成；带 coalesce 的写入
+    如果还在排队，后提交的会直接替换前一个。
+    """
+
+    POLL_INTERVAL = 30  # 毫秒
+
+    def __init__(self, max_workers=4):
+        self.read_executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="io-read")
+        # 单线程执行写入，保证写入顺序
+        self.write_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="io-write")
+        self.results = queue.Queue()
+        self.on_write_error = None
+        self._lock = threading.Lock()
+        self._last_write = {}  # 键 -> 最后一次提交的写入 Future
+        self._coalesced = {}  # 键 -> 还在排队的 (func, args)
+        self._widget = None
+        self._closed = False
+
+    def attach(self, widget):
+        """开始在 Tk 主循环中轮询回调"""
+        self._widget = widget
+        self._poll()
+
+    def _poll(self):
+        self.run_callbacks()
+        if self._widget is not None and not self._closed:
+            self._widget.after(self.POLL_INTERVAL, self._poll)
+
+    def run_callbacks(self):
+        """在当前线程执行已完成任务的回调"""
+        while True:
+            try:
+                callback, args = self.results.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                callback(*args)
+            except Exception as e:
+                logger.exception("执行 I/O 回调时出错: %s", e)
+
+    def _deliver(self, callback, *args):
+        if self._widget is None:
+            # 没有主循环（命令行脚本）时直接调用
+            callback(*args)
+        else:
+            self.results.put((callback, args))
+
+    def wait_for_writes(self, key):
+        """等待某个键已提交的写入完成"""
+        with self._lock:
+            future = self._last_write.get(key)
+        if future is not None:
+            try:
+                future.result()
+            except Exception:
+                pass
+
+    def submit_read(self, key, func, *args, callback=None, errback=None):
+        """提交读取任务，完成后在主线程中以结果调用 callback，出错时以异常调用 errback"""
+        def task():
+            self.wait_for_writes(key)
+            return func(*args)
+
+        future = self.read_executor.submit(task)
+        if callback is not None or errback is not None:
+            def done(f):
+                if f.cancelled():
+                    # 开始执行之前被取消（例如预取），不需要回调
+                    return
+                try:
+                    result = f.result()
+                except Exception as e:
+                    logger.error("后台读取出错: %s", e, exc_info=e)
+                    if errback is not None:
+                        self._deliver(errback, e)
+                    return
+                if callback is not None:
+                    self._deliver(callback, result)
+            future.add_done_callback(done)
+        return future
+
+    def submit_write(self, key, func, *args, coalesce=False):
+        """提交写入任务；coalesce=True 时同一键排队中的写入只保留最后一次"""
+        with self._lock:
+            if coalesce:
+                pending = key in self._coalesced
+                self._coalesced[key] = (func, args)
+                if pending:
+                    return self._last_write[key]
+                future = self.write_executor.submit(self._run_coalesced, key)
+            else:
+                future = self.write_executor.submit(func, *args)
+            self._last_write[key] = future
+        future.add_done_callback(lambda f: self._write_done([key], f))
+        return future
+
+    def when_done(self, future, callback, errback=None):
+        """future 完成后在主线程中调用 callback(result)，出错时调用 errback(exception)"""
+        def done(f):
+            try:
+                result = f.result()
+            except Exception as e:
+                if errback is not None:
+                    self._deliver(errback, e)
+                return
+            self._deliver(callback, result)
+        future.add_done_callback(done)
+
+    def submit_batch_write(self, keys, func, *args):
+        """提交一次涉及多个键的写入，这些键之后的读取都会等待它完成"""
+        keys = list(keys)
+        with self._lock:
+            future = self.write_executor.submit(func, *args)
+            for key in keys:
+                self._last_write[key] = future
+        future.add_done_callback(lambda f: self._write_done(keys, f))
+        return future
+
+    def _run_coalesced(self, key):
+        with self._lock:
+            func, args = self._coalesced.pop(key)
+        return func(*args)
+
+    def _write_done(self, keys, future):
+        with self._lock:
+            for key in keys:
+                if self._last_write.get(key) is future:
+                    del self._last_write[key]
+        error = future.exception()
+        if error is not None:
+            logger.error("后台写入出错: %s", error, exc_info=error)
+            if self.on_write_error is not None:
+                self._deliver(self.on_write_error, error)
+
+    def flush(self):
+        """等待所有已提交的写入完成"""
+        self.write_executor.submit(lambda: None).result()
+
+    def shutdown(self):
+        """写完所有数据后停止线程"""
+        self._closed = True
+        self.write_executor.shutdown(wait=True)
+        self.read_executor.shutdown(wait=True)
@@ -0,0 +1,245 @@
+"""按需解码的日志记录序列
+
+open_journal() 用 mmap 映射日志文件，扫描一遍建立偏移索引（每条有效记录
+所在行的位置和长度），之后只在访问某条记录时才解码那一行。扫描时不解析
+普通记录行，只用正则取出 ID（回放修改和删除操作时需要）和时间戳（按时间
+排序时需要），这两项在扫描结束后即丢弃；常驻内存的只有两个整数数组和
+少量最近解码的记录，与历史记录的长短基本无关。
+
+序列可以插入、替换和删除条目（详细视图中新增、修改、删除记录），这些
+改动只作用于内存中的序列，不影响文件，写入仍由存储后端负责。
+"""
+import json
+import logging
+import mmap
+import re
+import threading
+from array import array
+from collections import OrderedDict
+from collections.abc import MutableSequence
+
+logger = logging.getLogger(__name__)
+
+# 一条完整的记录行或操作行（以 { 开头、以 } 结尾且含有 ID，不跨行），第 1 组非空表示操作行
+RECORD_LINE = re.compile(rb'(?m)^(?:(\{"_op": )|\{).*"id": "([^"\\\n]*)".*\}\r?$')
+TIMESTAMP_PATTERN = re.compile(rb'"timestamp": "([^"\\]*)"')
+# 最近解码的记录数；同一条记录在缓存中时总是返回同一个对象
+CACHE_SIZE = 256
+# 顺序遍历时每次加锁读取的条目数
+ITER_CHUNK = 256
+
+
+def _has_record_without_id(gap):
+    """两条匹配行之间的内容中是否有完整但没有 ID 的行（旧格式）；空行和残缺的行忽略"""
+    for line in gap.split(b"\n"):
+        line = line.strip()
+        if line.startswith(b"{") and line.endswith(b"}"):
+            return True
+    return False
+
+
+def scan_journal(buffer, newest_first=False):
+    """扫描日志内容，返回有效记录的 (偏移数组, 长度数组)
+
+    每行只做一次正则匹配，普通记录行不解码。长度为负表示该条目是修改
+    操作行，记录在其中的 "record" 字段里。newest_first 为真时按时间戳倒序
+    排列（与 list.sort(reverse=True) 一致）。含有没有 ID 的记录或操作行
+    （旧格式）时返回 None，需要完整回放。
+    """
+    offsets = array('q')
+    lengths = array('q')
+    timestamps = [] if newest_first else None
+    positions = {}  # 记录 ID -> 条目下标
+    previous = 0
+    for match in RECORD_LINE.finditer(buffer):
+        pos, stop = match.span()
+        if pos - previous > 1 and _has_record_without_id(buffer[previous:pos]):
+            return None
+        previous = stop
+        if match.group(1) is None:
+            # 记录行中出现第二个 { 时是嵌套对象，或者是接在残缺行后面写入的记录；
+            # 只有这种行在扫描时解码，无法解码的与 read_journal() 一样跳过
+            if buffer.find(b"{", pos + 1, stop) >= 0:
+                try:
+                    json.loads(buffer[pos:stop])
+                except ValueError:
+                    continue
+            positions[match.group(2)] = len(offsets)
+            offsets.append(pos)
+            lengths.append(stop - pos)
+            if timestamps is not None:
+                found = TIMESTAMP_PATTERN.search(buffer, pos, stop)
+                timestamps.append(found.group(1).decode('utf-8') if found else '')
+            continue
+        try:
+            entry = json.loads(buffer[pos:stop])
+        except ValueError:
+            continue
+        if not entry.get('id'):
+            return None
+        key = entry['id'].encode('utf-8')
+        i = positions.get(key)
+        if i is None:
+            continue
+        if entry['_op'] == 'update':
+            offsets[i] = pos
+            lengths[i] = -(stop - pos)
+            if timestamps is not None:
+                timestamps[i] = entry['record'].get('timestamp', '')
+        elif entry['_op'] == 'delete':
+            offsets[i] = -1
+            del positions[key]
+    if len(buffer) - previous > 1 and _has_record_without_id(buffer[previous:]):
+        return None
+
+    live = [i for i in range(len(offsets)) if offsets[i] >= 0]
+    if timestamps is not None:
+        live.sort(key=timestamps.__getitem__, reverse=True)
+    return array('q', (offsets[i] for i in live)), array('q', (lengths[i] for i in live))
+
+
+def open_journal(path, newest_first=False):
+    """映射日志文件并建立偏移索引，返回 LazyRecords；旧格式文件返回 None"""
+    with open(path, 'rb') as f:
+        # 空文件不能映射；映射在文件关闭后仍然有效
+        try:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            buffer = b""
+    index = scan_journal(buffer, newest_first)
+    if index is None:
+        if isinstance(buffer, mmap.mmap):
+            buffer.close()
+        return None
+    return LazyRecords(buffer, *index)
+
+
+class LazyRecords(MutableSequence):
+    """日志文件中有效记录的序列，访问时才解码对应的行"""
+
+    def __init__(self, buffer, offsets, lengths):
+        self._buffer = buffer
+        self._offsets = offsets
+        self._lengths = lengths
+        # 每个位置对应的条目：非负数是文件中的条目下标，负数 -k 是 _extra[k - 1]
+        self._slots = array('q', range(len(offsets)))
+        self._extra = []  # 插入或替换进来的记录
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._slots)
+
+    def _line(self, entry):
+        if self._buffer is None:
+            raise ValueError("记录文件已关闭")
+        offset = self._offsets[entry]
+        return self._buffer[offset:offset + abs(self._lengths[entry])]
+
+    def _parse(self, entry, data):
+        """解码一行，无法解码时返回 None（扫描时已排除，这里只是保险）"""
+        try:
+            record = json.loads(data.decode('utf-8'))
+        except ValueError as e:
+            logger.warning("跳过无法解码的日志行: %s", e)
+            return None
+        if self._lengths[entry] < 0:
+            op = record
+            record = op['record']
+            record['id'] = op['id']
+        return record
+
+    def _read(self, entry):
+        with self._lock:
+            data = self._line(entry)
+        record = self._parse(entry, data)
+        if record is None:
+            # 按位置访问时不能跳过，用只有 ID 的空记录占位
+            match = RECORD_LINE.match(data)
+            record = {'id': match.group(2).decode('utf-8') if match else ''}
+        return record
+
+    def _decode(self, entry):
+        record = self._cache.get(entry)
+        if record is not None:
+            self._cache.move_to_end(entry)
+            return record
+        record = self._read(entry)
+        self._cache[entry] = record
+        if len(self._cache) > CACHE_SIZE:
+            self._cache.popitem(last=False)
+        return record
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        slot = self._slots[index]
+        if slot < 0:
+            return self._extra[-slot - 1]
+        return self._decode(slot)
+
+    def __iter__(self):
+        # 顺序遍历（统计、建立索引）不经过缓存，也不会挤掉正在显示的记录；
+        # 按块加锁取出原始行，减少加锁次数
+        slots = self._slots[:]
+        offsets = self._offsets
+        lengths = self._lengths
+        for start in range(0, len(slots), ITER_CHUNK):
+            chunk = slots[start:start + ITER_CHUNK]
+            with self._lock:
+                buffer = self._buffer
+                if buffer is None:
+                    raise ValueError("记录文件已关闭")
+                lines = [
+                    buffer[offsets[slot]:offsets[slot] + abs(lengths[slot])] if slot >= 0 else None
+                    for slot in chunk
+                ]
+            for slot, data in zip(chunk, lines):
+                if slot < 0:
+                    yield self._extra[-slot - 1]
+                    continue
+                if lengths[slot] < 0:
+                    record = self._parse(slot, data)
+                else:
+                    try:
+                        record = json.loads(data.decode('utf-8'))
+                    except ValueError as e:
+                        logger.warning("跳过无法解码的日志行: %s", e)
+                        record = None
+                if record is not None:
+                    yield record
+
+    def _add_extra(self, record):
+        self._extra.append(record)
+        return -len(self._extra)
+
+    def __setitem__(self, index, record):
+        if isinstance(index, slice):
+            raise TypeError("LazyRecords 不支持切片赋值")
+        self._slots[index] = self._add_extra(record)
+
+    def __delitem__(self, index):
+        del self._slots[index]
+
+    def insert(self, index, record):
+        self._slots.insert(index, self._add_extra(record))
+
+    def memory_estimate(self, record_bytes):
+        """估算占用的内存（字节）：索引数组加上已解码的记录（每条按 record_bytes 计），映射的文件不计"""
+        arrays = (len(self._offsets) + len(self._lengths) + len(self._slots)) * self._slots.itemsize
+        return arrays + (len(self._cache) + len(self._extra)) * record_bytes
+
+    def detach(self):
+        """把映射的内容复制到内存并释放文件（文件即将被改写或移走时调用）"""
+        with self._lock:
+            if isinstance(self._buffer, mmap.mmap):
+                buffer = self._buffer
+                self._buffer = buffer[:]
+                buffer.close()
+
+    def close(self):
+        """释放映射，之后不能再读取文件中的记录"""
+        with self._lock:
+            if isinstance(self._buffer, mmap.mmap):
+                self._buffer.close()
+            self._buffer = None
@@ -1,28 +1,111 @@
+import argparse
+import logging
 import tkinter as tk
 from interface import MainApplication
 from datetime import datetime
 from tkinter import ttk
+from instrumentation import configure_logging, metrics
+from startup_profiler import StartupProfiler
+from storage import STORAGE_BACKENDS
+
+logger = logging.getLogger(__name__)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="时间开销 · 体验生命")
+    parser.add_argument(
+        '--backend',
+        choices=sorted(STORAGE_BACKENDS),
+        default='journal',
+        help="数据存储后端（sqlite 第一次启用时会导入现有的 data/ 目录）"
+    )
+    parser.add_argument(
+        '--fsync',
+        choices=['always', 'batch'],
+        default='always',
+        help="always: 每次写入都落盘；batch: 每隔 --fsync-interval 秒批量落盘"
+    )
+    parser.add_argument(
+        '--fsync-interval',
+        type=float,
+        default=1.0,
+        help="batch 策略下的落盘间隔（秒）"
+    )
+    parser.add_argument(
+        '--profile-startup',
+        action='store_true',
+        help="打印启动各阶段以及每个组件备注、统计的加载耗时"
+    )
+    parser.add_argument(
+        '--fast-start',
+        action='store_true',
+        help="显示窗口后在后台逐步校验所有组件（不只是可见的组件）的备注和统计，刷新组件摘要"
+    )
+    parser.add_argument(
+        '--detail-cache',
+        type=int,
+        default=MainApplication.DETAIL_CACHE_SIZE,
+        help="关闭后保留在内存中的详细视图个数，再次打开时直接显示（0 表示不保留）"
+    )
+    parser.add_argument(
+        '--detail-cache-mb',
+        type=float,
+        default=MainApplication.DETAIL_CACHE_MB,
+        help="保留的详细视图持有的记录的内存上限（MB，按估算）"
+    )
+    parser.add_argument(
+        '--record-view',
+        choices=MainApplication.RECORD_VIEWS,
+        default='canvas',
+        help="详细视图中记录的显示方式：canvas 在一块画布上绘制记录卡片，widgets 为每条可见记录创建控件"
+    )
+    parser.add_argument(
+        '--log-level',
+        choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'],
+        default='WARNING',
+        type=str.upper,
+        help="日志级别"
+    )
+    parser.add_argument(
+        '--log-json',
+        action='store_true',
+        help="日志以每行一个 JSON 的格式输出"
+    )
+    parser.add_argument(
+        '--metrics',
+        action='store_true',
+        help="启用耗时埋点（也可以在调试面板 F12 中开启）"
+    )
+    parser.add_argument(
+        '--metrics-file',
+        help="退出时把埋点数据写入该 JSON 文件（隐含 --metrics）"
+    )
+    return parser.parse_args()
 
 def main():
-    root = tk.Tk()
+    args = parse_args()
+    configure_logging(args.log_level, json_format=args.log_json)
+    metrics.enable(args.metrics or bool(args.metrics_file))
+    profiler = StartupProfiler(args.profile_startup)
+    with profiler.phase("创建 Tk 根窗口"):
+        root = tk.Tk()
     
     try:
-        print("开始创建全局样式...")
         # 创建全局样式
-        style = ttk.Style()
-        style.configure(
-            'Tooltip.TLabel',
-            background='#FFFFCC',  # 淡黄色背景
-            foreground='#333333',  # 深灰色文字
-            font=('微软雅黑', 10),  # 稍微大一点的字体
-            relief='solid',
-            borderwidth=1,
-            padding=(10, 5)  # 增加内边距
-        )
-        print("全局样式创建完成")
+        with profiler.phase("创建全局样式"):
+            style = ttk.Style()
+            style.configure(
+                'Tooltip.TLabel',
+                background='#FFFFCC',  # 淡黄色背景
+                foreground='#333333',  # 深灰色文字
+                font=('微软雅黑', 10),  # 稍微大一点的字体
+                relief='solid',
+                borderwidth=1,
+                padding=(10, 5)  # 增加内边距
+            )
+        logger.debug("全局样式创建完成")
         
     except Exception as e:
-        print(f"创建全局样式时出错: {e}")
+        logger.exception("创建全局样式时出错: %s", e)
     
     # 设置窗口透明度（可选）
     root.attributes('-alpha', 0.95)
@@ -41,8 +124,23 @@ def main():
         
     root.protocol("WM_DELETE_WINDOW", on_closing)  # 绑定关闭事件
     
-    app = MainApplication(root)
+    app = MainApplication(
+        root,
+        backend=args.backend,
+        fsync=args.fsync,
+        fsync_interval=args.fsync_interval,
+        profiler=profiler,
+        fast_start=args.fast_start,
+        detail_cache_size=args.detail_cache,
+        detail_cache_mb=args.detail_cache_mb,
+        record_view=args.record_view
+    )
     root.mainloop()
+    if args.metrics_file:
+        try:
+            metrics.dump(args.metrics_file)
+        except OSError as e:
+            logger.error("写入埋点数据时出错: %s", e)
 
 if __name__ == "__main__":
     main()
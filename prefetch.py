@@ -0,0 +1,148 @@
+import logging
+import threading
+from collections import OrderedDict
+from instrumentation import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class PrefetchTask:
+    """一次预取，cancel() 可以在它完成之前取消"""
+
+    def __init__(self, prefetcher, component_id, version):
+        self.prefetcher = prefetcher
+        self.component_id = component_id
+        self.version = version
+        self.future = None
+        self.cancelled = False
+        self.waiters = []  # 预取完成前就来取结果的 (callback, errback)
+
+    def cancel(self):
+        self.prefetcher.cancel(self)
+
+
+class Prefetcher:
+    """悬停预取：在后台提前打开组件的记录（时间倒序）并读取备注
+
+    指针停在组件上时开始预取，打开详细视图时直接使用预取的结果；预取
+    还没完成时，打开的视图等它完成而不是再读一遍。结果放在按组件的 LRU
+    缓存中，每个结果只能取用一次（详细视图会修改拿到的记录序列），取数
+    之后数据版本变化过的结果作废。备注直接放进数据管理器的备注缓存。
+    """
+
+    CACHE_SIZE = 8
+
+    def __init__(self, data_manager, cache_size=None):
+        self.data_manager = data_manager
+        self.cache_size = self.CACHE_SIZE if cache_size is None else cache_size
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()  # 组件 -> (版本, 记录)
+        self._pending = {}  # 组件 -> 进行中的 PrefetchTask
+
+    def prefetch(self, component_id):
+        """开始预取组件的记录和备注，返回 PrefetchTask；已有可用的结果时返回 None"""
+        version = self.data_manager.data_version(component_id)
+        with self._lock:
+            cached = self._cache.get(component_id)
+            if cached is not None and cached[0] == version:
+                self._cache.move_to_end(component_id)
+                return None
+            task = self._pending.get(component_id)
+            if task is not None and not task.cancelled and task.version == version:
+                return task
+            task = PrefetchTask(self, component_id, version)
+            self._pending[component_id] = task
+        metrics.count('prefetch.started')
+        task.future = self.data_manager.io.submit_read(
+            ('records', component_id),
+            self._load,
+            task,
+            callback=lambda result: self._done(task, result)
+        )
+        return task
+
+    def _load(self, task):
+        """后台读取；每一步之前检查是否已取消"""
+        component_id = task.component_id
+        if task.cancelled:
+            return None
+        try:
+            with metrics.span('prefetch.load'):
+                records = self.data_manager.storage.open_records(component_id, True)
+                note = None
+                if not task.cancelled and component_id not in self.data_manager.notes:
+                    # 先提交延迟写入缓冲中的修改，刚改过的备注不会被读成旧内容
+                    note = self.data_manager.read_current_note(component_id)
+        except Exception as e:
+            # 预取失败不提示，打开详细视图时会重新读取并报告错误
+            logger.warning("预取组件 %s 时出错: %s", component_id, e)
+            return None
+        return records, note
+
+    def _done(self, task, result):
+        """在主线程中保存预取结果，或交给正在等待的详细视图"""
+        component_id = task.component_id
+        with self._lock:
+            if self._pending.get(component_id) is task:
+                del self._pending[component_id]
+            waiters, task.waiters = task.waiters, []
+        if result is None:
+            for callback, errback in waiters:
+                self.data_manager.open_component_records_async(component_id, callback, errback=errback)
+            return
+        records, note = result
+        if note is not None:
+            self.data_manager.remember_note(component_id, note)
+        if waiters:
+            for callback, errback in waiters:
+                callback(records)
+            return
+        if task.cancelled or task.version != self.data_manager.data_version(component_id):
+            metrics.count('prefetch.discarded')
+            return
+        with self._lock:
+            self._cache[component_id] = (task.version, records)
+            self._cache.move_to_end(component_id)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def cancel(self, task):
+        """取消预取（指针很快离开时）；已经有视图在等待结果的不取消"""
+        with self._lock:
+            if task.waiters or task.cancelled:
+                return
+            task.cancelled = True
+            if self._pending.get(task.component_id) is task:
+                del self._pending[task.component_id]
+        if task.future is not None and task.future.cancel():
+            metrics.count('prefetch.cancelled')
+
+    def take(self, component_id, callback, errback=None):
+        """取用预取的记录：有可用的结果时调用 callback(records) 并返回 True
+
+        预取还在进行时 callback 在它完成后调用（预取失败时重新读取，再出错
+        时调用 errback）；没有预取过时返回 False。
+        """
+        version = self.data_manager.data_version(component_id)
+        with self._lock:
+            cached = self._cache.pop(component_id, None)
+            if cached is None:
+                task = self._pending.get(component_id)
+                if task is None or task.version != version:
+                    return False
+                task.waiters.append((callback, errback))
+                metrics.count('prefetch.joined')
+                return True
+        if cached[0] != version:
+            return False
+        metrics.count('prefetch.hit')
+        callback(cached[1])
+        return True
+
+    def forget(self, component_id):
+        """丢弃组件的预取结果并取消进行中的预取（数据被删除或移走时）"""
+        with self._lock:
+            self._cache.pop(component_id, None)
+            task = self._pending.get(component_id)
+        if task is not None:
+            task.cancel()
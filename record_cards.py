@@ -0,0 +1,207 @@
+"""在画布上直接绘制的记录卡片
+
+每张卡片是画布上的一组图元（背景、颜色标记、几行文字和两个按钮），
+共用一个标签，没有任何子控件。与 VirtualList(drawn=True) 配合使用时
+只有可见的卡片有图元，离开视野的卡片回收后绑定到新的记录上，记录再多
+画布上的图元数也只与可见卡片数有关。
+
+编辑、删除按钮是矩形和文字图元，点击由画布按图元标签分发。优化建议
+按固定宽度自己换行，字符宽度和换行结果都有缓存，卡片高度不需要等 Tk
+布局后再测量。
+"""
+import tkinter as tk
+from collections import OrderedDict
+from tkinter import font as tkfont
+
+# 换行结果缓存的条数
+WRAP_CACHE_SIZE = 1024
+
+
+class TextMeasure:
+    """按字体测量和折行文字，字符宽度和折行结果都缓存"""
+
+    def __init__(self, font):
+        self.font = font
+        self._widths = {}  # 字符 -> 宽度
+        self._wrapped = OrderedDict()  # (文字, 宽度) -> 折行后的各行
+
+    def char_width(self, char):
+        width = self._widths.get(char)
+        if width is None:
+            width = self._widths[char] = self.font.measure(char)
+        return width
+
+    def width(self, text):
+        return sum(self.char_width(char) for char in text)
+
+    def wrap(self, text, width):
+        """按宽度折行：优先在空格处断开（英文单词不拆开），否则在字符之间断开"""
+        key = (text, width)
+        lines = self._wrapped.get(key)
+        if lines is not None:
+            self._wrapped.move_to_end(key)
+            return lines
+        lines = []
+        for paragraph in text.split('\n'):
+            line = ''
+            line_width = 0
+            for char in paragraph:
+                char_width = self.char_width(char)
+                if line and line_width + char_width > width:
+                    space = line.rfind(' ')
+                    if space > 0 and char != ' ':
+                        lines.append(line[:space])
+                        line = line[space + 1:]
+                    else:
+                        lines.append(line)
+                        line = ''
+                    line_width = self.width(line)
+                if not line and char == ' ':
+                    continue
+                line += char
+                line_width += char_width
+            lines.append(line)
+        self._wrapped[key] = lines
+        if len(self._wrapped) > WRAP_CACHE_SIZE:
+            self._wrapped.popitem(last=False)
+        return lines
+
+
+class RecordCards:
+    """记录卡片的绘制：create_row() 创建一张卡片的图元，bind_row() 把它绘制为指定记录"""
+
+    PADDING = 10
+    LINE_GAP = 4
+    COLOR_SIZE = 20
+    BUTTON_WIDTH = 56
+    BUTTON_HEIGHT = 24
+    # 优化建议折行的最大宽度（与控件模式的 wraplength 一致）
+    WRAP_WIDTH = 600
+
+    BACKGROUND = 'white'
+    BORDER = '#dddddd'
+    BUTTON_FILL = '#f0f0f0'
+    BUTTON_HOVER = '#dcdcdc'
+    BUTTON_OUTLINE = '#adadad'
+    TEXT = 'black'
+    MUTED = 'gray'
+
+    def __init__(self, canvas, on_edit, on_delete):
+        self.canvas = canvas
+        self.on_edit = on_edit
+        self.on_delete = on_delete
+        self.font = tkfont.nametofont('TkDefaultFont')
+        self.title_font = self.font.copy()
+        self.title_font.configure(weight='bold')
+        self.line_height = self.font.metrics('linespace')
+        self.measure = TextMeasure(self.font)
+        self._count = 0
+
+    def create_row(self):
+        """创建一张卡片的图元（隐藏），返回行字典"""
+        self._count += 1
+        tag = f"card{self._count}"
+        canvas = self.canvas
+        row = {'tag': tag, 'record': None}
+
+        def item(kind, *args, **kwargs):
+            return getattr(canvas, kind)(0, 0, *args, tags=(tag,), state='hidden', **kwargs)
+
+        row['background'] = item('create_rectangle', 0, 0, fill=self.BACKGROUND, outline=self.BORDER)
+        row['color'] = item('create_rectangle', 0, 0, outline='black')
+        row['title'] = item('create_text', anchor='w', font=self.title_font, fill=self.TEXT)
+        row['time'] = item('create_text', anchor='nw', font=self.font, fill=self.TEXT)
+        row['info'] = item('create_text', anchor='nw', font=self.font, fill=self.TEXT)
+        row['suggestion'] = item('create_text', anchor='nw', font=self.font, fill=self.TEXT)
+        row['timestamp'] = item('create_text', anchor='ne', font=self.font, fill=self.MUTED)
+        for name, text, action in (('edit', "编辑", self.on_edit), ('delete', "删除", self.on_delete)):
+            button_tag = f"{tag}-{name}"
+            row[name] = (
+                canvas.create_rectangle(0, 0, 0, 0, tags=(tag, button_tag), state='hidden',
+                                        fill=self.BUTTON_FILL, outline=self.BUTTON_OUTLINE),
+                canvas.create_text(0, 0, text=text, tags=(tag, button_tag), state='hidden',
+                                   font=self.font, fill=self.TEXT),
+            )
+            self._bind_button(row, name, button_tag, action)
+        # 没有绑定记录时的高度，作为默认行高
+        row['height'] = 2 * self.PADDING + self.COLOR_SIZE + 2 * (self.line_height + self.LINE_GAP)
+        return row
+
+    def _bind_button(self, row, name, button_tag, action):
+        canvas = self.canvas
+        rect = row[name][0]
+
+        def enter(event):
+            canvas.itemconfigure(rect, fill=self.BUTTON_HOVER)
+            canvas.configure(cursor='hand2')
+
+        def leave(event):
+            canvas.itemconfigure(rect, fill=self.BUTTON_FILL)
+            canvas.configure(cursor='')
+
+        canvas.tag_bind(button_tag, '<Enter>', enter)
+        canvas.tag_bind(button_tag, '<Leave>', leave)
+        canvas.tag_bind(button_tag, '<ButtonRelease-1>', lambda e: action(row['record'], row))
+
+    def bind_row(self, row, record):
+        """以 (0, 0) 为原点把卡片绘制为指定记录，宽度取 row['width']，高度写入 row['height']"""
+        canvas = self.canvas
+        row['record'] = record
+        pad = self.PADDING
+        width = max(row.get('width') or 0, 2 * pad + self.BUTTON_WIDTH + 100)
+        right = width - pad
+        text_right = right - self.BUTTON_WIDTH - pad
+
+        canvas.coords(row['color'], pad, pad, pad + self.COLOR_SIZE, pad + self.COLOR_SIZE)
+        try:
+            canvas.itemconfigure(row['color'], fill=record.get('颜色标记', 'gray'))
+        except tk.TclError:
+            canvas.itemconfigure(row['color'], fill='gray')
+
+        canvas.coords(row['title'], pad + self.COLOR_SIZE + pad, pad + self.COLOR_SIZE // 2)
+        canvas.itemconfigure(row['title'], text=record.get('活动', '未命名活动'))
+        y = pad + self.COLOR_SIZE + self.LINE_GAP
+
+        actual_time = record.get('实际时间', '0')
+        estimated_time = record.get('预估时间', '0')
+        canvas.coords(row['time'], pad, y)
+        canvas.itemconfigure(
+            row['time'],
+            text=f"时间段: {record.get('时间段', '未设置')} | 实际时间: {actual_time}分钟 | 预估时间: {estimated_time}分钟"
+        )
+        y += self.line_height + self.LINE_GAP
+
+        canvas.coords(row['info'], pad, y)
+        canvas.itemconfigure(
+            row['info'],
+            text=f"体验感: {record.get('体验感', '0')} | 类别: {record.get('类别', '未分类')}"
+        )
+        y += self.line_height + self.LINE_GAP
+
+        # 没有内容的行用空文字代替隐藏，列表显示卡片时整组图元一起设为可见
+        suggestion = record.get('优化建议', '').strip()
+        canvas.coords(row['suggestion'], pad, y)
+        if suggestion:
+            lines = self.measure.wrap(f"优化建议: {suggestion}", min(self.WRAP_WIDTH, text_right - pad))
+            canvas.itemconfigure(row['suggestion'], text='\n'.join(lines))
+            y += len(lines) * self.line_height + self.LINE_GAP
+        else:
+            canvas.itemconfigure(row['suggestion'], text='')
+
+        canvas.coords(row['timestamp'], text_right, y + self.LINE_GAP)
+        if 'timestamp' in record:
+            canvas.itemconfigure(row['timestamp'], text=f"记录时间: {record['timestamp']}")
+            y += self.LINE_GAP + self.line_height
+        else:
+            canvas.itemconfigure(row['timestamp'], text='')
+
+        button_y = pad
+        for name in ('edit', 'delete'):
+            rect, label = row[name]
+            canvas.coords(rect, right - self.BUTTON_WIDTH, button_y, right, button_y + self.BUTTON_HEIGHT)
+            canvas.coords(label, right - self.BUTTON_WIDTH // 2, button_y + self.BUTTON_HEIGHT // 2)
+            button_y += self.BUTTON_HEIGHT + self.LINE_GAP
+
+        height = max(y, button_y) + pad
+        canvas.coords(row['background'], 0, 0, width, height)
+        row['height'] = height
@@ -0,0 +1,318 @@
+import bisect
+import json
+import logging
+import os
+import threading
+import unicodedata
+from instrumentation import metrics
+from storage import RECORD_ID, atomic_write
+
+logger = logging.getLogger(__name__)
+
+INDEX_FIELDS = ('date', 'category', 'activity')
+
+
+def normalize_activity(name):
+    """规范化活动名：全半角统一、忽略大小写、合并空白"""
+    text = unicodedata.normalize('NFKC', str(name or ''))
+    return " ".join(text.split()).casefold()
+
+
+def index_row(record):
+    """提取记录的索引字段 [时间戳, 类别, 规范化活动名, 记录 ID]"""
+    return [
+        str(record.get('timestamp') or ''),
+        record.get('类别') or '',
+        normalize_activity(record.get('活动')),
+        record.get(RECORD_ID),
+    ]
+
+
+def row_values(row):
+    """索引行对应的 (日期, 类别, 活动)"""
+    return row[0][:10], row[1], row[2]
+
+
+class RecordIndex:
+    """记录的二级索引：日期 / 类别 / 规范化活动名 -> {组件: {记录位置}}
+
+    记录位置是记录在 load_records() 结果中的下标。磁盘上保存每个组件的
+    索引行（时间戳、类别、活动）和记录文件签名，第一次使用时一次遍历建出倒排表。
+    增删改时按差值更新；签名不一致的组件在第一次查询时重建。
+    """
+
+    FILE_NAME = "record_index.json"
+    # 索引行格式变化时递增，旧版本的索引文件直接丢弃重建
+    VERSION = 2
+
+    def __init__(self, data_dir, storage):
+        self.storage = storage
+        self.index_file = os.path.join(data_dir, self.FILE_NAME)
+        self._lock = threading.RLock()
+        self._entries = {}  # 组件 -> {'signature': ..., 'rows': [[时间戳, 类别, 活动], ...]}
+        self._postings = {field: {} for field in INDEX_FIELDS}
+        self._sorted_dates = None
+        self._verified = set()
+        self._touched = set()
+        self._all_verified = False
+        # 每次丢弃索引时递增，防止过期的后台重建覆盖新数据
+        self._generations = {}
+        self._dirty = False
+        self._loaded = False
+
+    def load(self):
+        """读取持久化的索引并建立倒排表"""
+        try:
+            if os.path.exists(self.index_file):
+                with open(self.index_file, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                if data.get('version') == self.VERSION:
+                    self._entries = data.get('components', {})
+        except (OSError, ValueError, AttributeError) as e:
+            logger.warning("读取记录索引时出错，将重建: %s", e)
+            self._entries = {}
+        for component_id, entry in self._entries.items():
+            self._add_postings(component_id, entry['rows'])
+
+    def ensure_loaded(self):
+        """第一次使用时读取索引文件（启动后可以提前在后台调用）"""
+        with self._lock:
+            if not self._loaded:
+                self._loaded = True
+                with metrics.span('record_index.load'):
+                    self.load()
+
+    def save(self):
+        """写回索引文件（没有变化时跳过），应在所有写入完成后调用"""
+        with self._lock:
+            if not self._loaded:
+                return
+            for component_id in self._touched:
+                entry = self._entries.get(component_id)
+                if entry is not None:
+                    entry['signature'] = self._signature(component_id)
+            self._touched.clear()
+            if not self._dirty:
+                return
+            atomic_write(self.index_file, json.dumps({'version': self.VERSION, 'components': self._entries}, ensure_ascii=False))
+            self._dirty = False
+
+    def _signature(self, component_id):
+        signature = self.storage.signature(component_id)
+        return list(signature) if signature is not None else None
+
+    def _add_posting(self, component_id, position, row):
+        for field, value in zip(INDEX_FIELDS, row_values(row)):
+            postings = self._postings[field]
+            if field == 'date' and value not in postings:
+                self._sorted_dates = None
+            postings.setdefault(value, {}).setdefault(component_id, set()).add(position)
+
+    def _remove_posting(self, component_id, position, row):
+        for field, value in zip(INDEX_FIELDS, row_values(row)):
+            postings = self._postings[field]
+            components = postings.get(value)
+            if components is None:
+                continue
+            positions = components.get(component_id)
+            if positions is not None:
+                positions.discard(position)
+                if not positions:
+                    del components[component_id]
+            if not components:
+                del postings[value]
+                if field == 'date':
+                    self._sorted_dates = None
+
+    def _add_postings_from(self, component_id, rows, start):
+        for position in range(start, len(rows)):
+            self._add_posting(component_id, position, rows[position])
+
+    def _remove_postings_from(self, component_id, rows, start):
+        for position in range(start, len(rows)):
+            self._remove_posting(component_id, position, rows[position])
+
+    def _add_postings(self, component_id, rows):
+        self._add_postings_from(component_id, rows, 0)
+
+    def _remove_postings(self, component_id, rows):
+        self._remove_postings_from(component_id, rows, 0)
+
+    def set_records(self, component_id, records, signature=None, generation=None):
+        """用完整记录列表重建一个组件的索引"""
+        self.ensure_loaded()
+        with self._lock:
+            if generation is not None and self._generations.get(component_id, 0) != generation:
+                # 读取期间索引被丢弃过，记录可能已经过期
+                return
+            entry = self._entries.get(component_id)
+            if entry is not None:
+                self._remove_postings(component_id, entry['rows'])
+            rows = [index_row(record) for record in records]
+            self._entries[component_id] = {'signature': signature, 'rows': rows}
+            self._add_postings(component_id, rows)
+            self._verified.add(component_id)
+            self._touched.discard(component_id)
+            self._dirty = True
+
+    def forget(self, component_id):
+        """丢弃组件的索引"""
+        self.ensure_loaded()
+        with self._lock:
+            entry = self._entries.pop(component_id, None)
+            if entry is not None:
+                self._remove_postings(component_id, entry['rows'])
+                self._dirty = True
+            self._verified.discard(component_id)
+            self._touched.discard(component_id)
+            self._generations[component_id] = self._generations.get(component_id, 0) + 1
+            # 组件的文件之后可能重新出现（撤销删除），下次查询时需要重新校验
+            self._all_verified = False
+
+    def _editable_rows(self, component_id):
+        """返回可按差值更新的索引行；索引不可信时丢弃，留待查询时重建"""
+        if component_id not in self._verified:
+            self.forget(component_id)
+            return None
+        self._touched.add(component_id)
+        self._dirty = True
+        return self._entries[component_id]['rows']
+
+    def records_added(self, component_id, records):
+        self.ensure_loaded()
+        with self._lock:
+            rows = self._editable_rows(component_id)
+            if rows is None:
+                return
+            for record in records:
+                row = index_row(record)
+                rows.append(row)
+                self._add_posting(component_id, len(rows) - 1, row)
+
+    def record_updated(self, component_id, old_record, record):
+        """按记录 ID 替换索引行"""
+        self.ensure_loaded()
+        with self._lock:
+            rows = self._editable_rows(component_id)
+            if rows is None:
+                return
+            record_id = old_record.get(RECORD_ID)
+            for position, row in enumerate(rows):
+                if row[3] == record_id:
+                    self._remove_posting(component_id, position, row)
+                    rows[position] = index_row(record)
+                    self._add_posting(component_id, position, rows[position])
+                    break
+
+    def record_deleted(self, component_id, record):
+        """按记录 ID 删除索引行，之后的位置前移"""
+        self.ensure_loaded()
+        with self._lock:
+            rows = self._editable_rows(component_id)
+            if rows is None:
+                return
+            record_id = record.get(RECORD_ID)
+            for position, row in enumerate(rows):
+                if row[3] == record_id:
+                    break
+            else:
+                return
+            # 只有被删除记录之后的位置需要前移
+            self._remove_postings_from(component_id, rows, position)
+            del rows[position]
+            self._add_postings_from(component_id, rows, position)
+
+    def verify(self, component_id, load_records):
+        """校验组件索引是否与记录文件一致，不一致时用 load_records() 重建"""
+        self.ensure_loaded()
+        with self._lock:
+            if component_id in self._verified:
+                return
+            entry = self._entries.get(component_id)
+            generation = self._generations.get(component_id, 0)
+        signature = self._signature(component_id)
+        if entry is not None and entry.get('signature') == signature:
+            with self._lock:
+                if self._generations.get(component_id, 0) == generation:
+                    self._verified.add(component_id)
+            return
+        metrics.count('record_index.rebuilt')
+        self.set_records(component_id, load_records(component_id), signature, generation)
+
+    def verify_all(self, load_records):
+        """校验所有组件（每次运行只做一次），并清理已不存在的组件"""
+        self.ensure_loaded()
+        if self._all_verified:
+            return
+        keys = set(self.storage.list_keys())
+        for component_id in keys:
+            self.verify(component_id, load_records)
+        with self._lock:
+            for component_id in [c for c in self._entries if c not in keys]:
+                self.forget(component_id)
+            self._all_verified = all(c in self._verified for c in keys)
+
+    def rebuild(self, load_records):
+        """丢弃全部索引，按记录文件重新建立"""
+        with self._lock:
+            self._loaded = True
+            self._entries = {}
+            self._postings = {field: {} for field in INDEX_FIELDS}
+            self._sorted_dates = None
+            self._verified.clear()
+            self._touched.clear()
+            self._all_verified = False
+            self._dirty = True
+        self.verify_all(load_records)
+
+    def dates(self):
+        """有记录的所有日期（"YYYY-MM-DD"，升序）"""
+        self.ensure_loaded()
+        with self._lock:
+            if self._sorted_dates is None:
+                self._sorted_dates = sorted(d for d in self._postings['date'] if d)
+            return list(self._sorted_dates)
+
+    def lookup(self, date=None, category=None, activity=None, start=None, end=None):
+        """按条件查找记录，返回 {组件: [记录位置（升序）]}
+
+        date 精确匹配某天；start/end 按日期范围 [start, end) 过滤；
+        activity 会先规范化。多个条件取交集。
+        """
+        self.ensure_loaded()
+        with self._lock:
+            candidates = []
+            if date is not None:
+                candidates.append(self._postings['date'].get(date[:10], {}))
+            if start is not None or end is not None:
+                dates = self.dates()
+                lo = 0 if start is None else bisect.bisect_left(dates, start[:10])
+                hi = len(dates) if end is None else bisect.bisect_left(dates, end[:10])
+                merged = {}
+                for day in dates[lo:hi]:
+                    for component_id, positions in self._postings['date'][day].items():
+                        merged.setdefault(component_id, set()).update(positions)
+                candidates.append(merged)
+            if category is not None:
+                candidates.append(self._postings['category'].get(category, {}))
+            if activity is not None:
+                candidates.append(self._postings['activity'].get(normalize_activity(activity), {}))
+
+            if not candidates:
+                return {
+                    component_id: list(range(len(entry['rows'])))
+                    for component_id, entry in self._entries.items() if entry['rows']
+                }
+
+            # 从最小的候选集合开始求交集
+            candidates.sort(key=len)
+            result = {}
+            for component_id, positions in candidates[0].items():
+                matched = set(positions)
+                for other in candidates[1:]:
+                    matched &= other.get(component_id, set())
+                    if not matched:
+                        break
+                if matched:
+                    result[component_id] = sorted(matched)
+            return result
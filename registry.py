@@ -0,0 +1,64 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class ComponentRegistry:
+    """组件注册表：按 ID 查找组件信息，并向订阅者分发组件相关的事件
+
+    事件：
+        records_changed(component_id)   记录被新增、修改或删除
+        note_changed(component_id, note) 备注被修改
+        component_removed(component_id)  组件数据被删除
+    """
+
+    def __init__(self):
+        self.components = {}  # component_id -> 组件信息
+        self.subscribers = {}  # 事件名 -> 回调列表
+
+    def register(self, comp_data):
+        self.components[comp_data['component_id']] = comp_data
+
+    def register_all(self, components_data):
+        for comp_data in components_data:
+            self.register(comp_data)
+
+    def unregister(self, component_id):
+        return self.components.pop(component_id, None)
+
+    def get(self, component_id):
+        return self.components.get(component_id)
+
+    def all(self):
+        """按登记顺序（即列表显示顺序）返回所有组件信息"""
+        return list(self.components.values())
+
+    def clear(self):
+        self.components.clear()
+
+    def __contains__(self, component_id):
+        return component_id in self.components
+
+    def __len__(self):
+        return len(self.components)
+
+    def __iter__(self):
+        return iter(self.components)
+
+    def subscribe(self, event, callback):
+        """订阅事件"""
+        self.subscribers.setdefault(event, []).append(callback)
+
+    def unsubscribe(self, event, callback):
+        """取消订阅"""
+        callbacks = self.subscribers.get(event, [])
+        if callback in callbacks:
+            callbacks.remove(callback)
+
+    def publish(self, event, component_id, *args):
+        """通知所有订阅者，单个订阅者出错不影响其他订阅者"""
+        for callback in list(self.subscribers.get(event, [])):
+            try:
+                callback(component_id, *args)
+            except Exception as e:
+                logger.exception("处理事件 %s 时出错: %s", event, e)
@@ -0,0 +1,321 @@
+import json
+import logging
+import math
+import os
+import re
+import threading
+import unicodedata
+from collections import Counter
+from instrumentation import metrics
+from storage import atomic_write
+
+logger = logging.getLogger(__name__)
+
+# 参与检索的记录字段
+SEARCH_FIELDS = ('活动', '优化建议')
+
+# 中日韩文字按字切分，其余按字母数字连续串切分
+CJK_PATTERN = re.compile(r'[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\u3040-\u30ff\uac00-\ud7af]+')
+WORD_PATTERN = re.compile(r'\w+')
+
+
+def _normalize(text):
+    return unicodedata.normalize('NFKC', str(text or '')).casefold()
+
+
+def tokenize(text):
+    """索引用切词：中文等产出单字和相邻两字，其他文字产出整词"""
+    text = _normalize(text)
+    tokens = []
+    position = 0
+    for match in CJK_PATTERN.finditer(text):
+        tokens.extend(WORD_PATTERN.findall(text[position:match.start()]))
+        run = match.group()
+        tokens.extend(run)
+        tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+        position = match.end()
+    tokens.extend(WORD_PATTERN.findall(text[position:]))
+    return tokens
+
+
+def query_terms(query):
+    """查询用切词：中文只取相邻两字（单个字时取单字），结果去重"""
+    text = _normalize(query)
+    terms = []
+    position = 0
+    for match in CJK_PATTERN.finditer(text):
+        terms.extend(WORD_PATTERN.findall(text[position:match.start()]))
+        run = match.group()
+        if len(run) == 1:
+            terms.append(run)
+        else:
+            terms.extend(run[i:i + 2] for i in range(len(run) - 1))
+        position = match.end()
+    terms.extend(WORD_PATTERN.findall(text[position:]))
+    return list(dict.fromkeys(terms))
+
+
+def record_terms(record):
+    """一条记录的词频"""
+    return Counter(token for field in SEARCH_FIELDS for token in tokenize(record.get(field)))
+
+
+class SearchIndex:
+    """全文检索的倒排索引：词 -> {组件: 词频}
+
+    每个组件是一篇文档，内容为所有记录的活动、优化建议以及组件备注。
+    磁盘上保存每个组件的词频和记录/备注签名，第一次使用时建出倒排表；
+    保存记录和备注时按差值更新，签名不一致的组件在第一次检索时重建。
+    检索结果按 BM25 打分排序。
+    """
+
+    FILE_NAME = "search_index.json"
+    K1 = 1.2
+    B = 0.75
+
+    def __init__(self, data_dir, storage):
+        self.storage = storage
+        self.index_file = os.path.join(data_dir, self.FILE_NAME)
+        self._lock = threading.RLock()
+        # 组件 -> {'signature', 'note_signature', 'records': {词: 词频}, 'note': {词: 词频}}
+        self._entries = {}
+        self._postings = {}
+        self._lengths = {}  # 组件 -> 文档长度（词数）
+        self._total_length = 0
+        self._verified = set()
+        self._touched = set()
+        self._all_verified = False
+        # 每次丢弃索引时递增，防止过期的后台重建覆盖新数据
+        self._generations = {}
+        self._dirty = False
+        self._loaded = False
+
+    def load(self):
+        """读取持久化的索引并建立倒排表"""
+        try:
+            if os.path.exists(self.index_file):
+                with open(self.index_file, 'r', encoding='utf-8') as f:
+                    entries = json.load(f).get('components', {})
+                self._entries = {
+                    component_id: dict(entry, records=Counter(entry['records']), note=Counter(entry['note']))
+                    for component_id, entry in entries.items()
+                }
+        except (OSError, ValueError, AttributeError, KeyError) as e:
+            logger.warning("读取检索索引时出错，将重建: %s", e)
+            self._entries = {}
+        for component_id, entry in self._entries.items():
+            self._add_terms(component_id, entry['records'])
+            self._add_terms(component_id, entry['note'])
+
+    def ensure_loaded(self):
+        """第一次使用时读取索引文件（启动后可以提前在后台调用）"""
+        with self._lock:
+            if not self._loaded:
+                self._loaded = True
+                with metrics.span('search_index.load'):
+                    self.load()
+
+    def save(self):
+        """写回索引文件（没有变化时跳过），应在所有写入完成后调用"""
+        with self._lock:
+            if not self._loaded:
+                return
+            for component_id in self._touched:
+                entry = self._entries.get(component_id)
+                if entry is not None:
+                    entry['signature'] = self._signature(component_id)
+                    entry['note_signature'] = self._note_signature(component_id)
+            self._touched.clear()
+            if not self._dirty:
+                return
+            atomic_write(self.index_file, json.dumps({'components': self._entries}, ensure_ascii=False))
+            self._dirty = False
+
+    def _signature(self, component_id):
+        signature = self.storage.signature(component_id)
+        return list(signature) if signature is not None else None
+
+    def _note_signature(self, component_id):
+        signature = self.storage.note_signature(component_id)
+        return list(signature) if signature is not None else None
+
+    def _add_terms(self, component_id, terms, sign=1):
+        for term, count in terms.items():
+            components = self._postings.setdefault(term, {})
+            tf = components.get(component_id, 0) + sign * count
+            if tf > 0:
+                components[component_id] = tf
+            else:
+                components.pop(component_id, None)
+                if not components:
+                    del self._postings[term]
+        delta = sign * sum(terms.values())
+        length = self._lengths.get(component_id, 0) + delta
+        if length > 0:
+            self._lengths[component_id] = length
+        else:
+            self._lengths.pop(component_id, None)
+        self._total_length += delta
+
+    def _remove_entry(self, component_id):
+        entry = self._entries.pop(component_id, None)
+        if entry is not None:
+            self._add_terms(component_id, entry['records'], -1)
+            self._add_terms(component_id, entry['note'], -1)
+            self._dirty = True
+
+    def set_document(self, component_id, records, note, signature=None, note_signature=None, generation=None):
+        """用完整的记录和备注重建一个组件的索引"""
+        self.ensure_loaded()
+        with self._lock:
+            if generation is not None and self._generations.get(component_id, 0) != generation:
+                # 读取期间索引被丢弃过，内容可能已经过期
+                return
+            self._remove_entry(component_id)
+            terms = Counter()
+            for record in records:
+                terms.update(record_terms(record))
+            entry = {
+                'signature': signature,
+                'note_signature': note_signature,
+                'records': terms,
+                'note': Counter(tokenize(note)),
+            }
+            self._entries[component_id] = entry
+            self._add_terms(component_id, entry['records'])
+            self._add_terms(component_id, entry['note'])
+            self._verified.add(component_id)
+            self._touched.discard(component_id)
+            self._dirty = True
+
+    def forget(self, component_id):
+        """丢弃组件的索引"""
+        self.ensure_loaded()
+        with self._lock:
+            self._remove_entry(component_id)
+            self._verified.discard(component_id)
+            self._touched.discard(component_id)
+            self._generations[component_id] = self._generations.get(component_id, 0) + 1
+            # 组件的文件之后可能重新出现（撤销删除），下次查询时需要重新校验
+            self._all_verified = False
+
+    def _editable_entry(self, component_id):
+        """返回可按差值更新的索引条目；索引不可信时丢弃，留待检索时重建"""
+        if (component_id not in self._verified and component_id not in self._entries
+                and self._signature(component_id) is None and self._note_signature(component_id) is None):
+            # 新组件：磁盘上还没有记录和备注，从空文档开始
+            self._entries[component_id] = {
+                'signature': None,
+                'note_signature': None,
+                'records': Counter(),
+                'note': Counter(),
+            }
+            self._verified.add(component_id)
+        if component_id not in self._verified:
+            self.forget(component_id)
+            return None
+        self._touched.add(component_id)
+        self._dirty = True
+        return self._entries[component_id]
+
+    def _replace_terms(self, component_id, field, removed, added):
+        entry = self._editable_entry(component_id)
+        if entry is None:
+            return
+        self._add_terms(component_id, removed, -1)
+        self._add_terms(component_id, added)
+        entry[field].subtract(removed)
+        entry[field].update(added)
+        entry[field] = +entry[field]
+
+    def records_added(self, component_id, records):
+        self.ensure_loaded()
+        with self._lock:
+            added = Counter()
+            for record in records:
+                added.update(record_terms(record))
+            self._replace_terms(component_id, 'records', Counter(), added)
+
+    def record_updated(self, component_id, old_record, record):
+        self.ensure_loaded()
+        with self._lock:
+            self._replace_terms(component_id, 'records', record_terms(old_record), record_terms(record))
+
+    def record_deleted(self, component_id, record):
+        self.ensure_loaded()
+        with self._lock:
+            self._replace_terms(component_id, 'records', record_terms(record), Counter())
+
+    def note_changed(self, component_id, note):
+        self.ensure_loaded()
+        with self._lock:
+            entry = self._entries.get(component_id) if component_id in self._verified else None
+            old = Counter(entry['note']) if entry is not None else Counter()
+            self._replace_terms(component_id, 'note', old, Counter(tokenize(note)))
+
+    def verify(self, component_id, load_records, load_note):
+        """校验组件索引是否与记录和备注一致，不一致时重建"""
+        self.ensure_loaded()
+        with self._lock:
+            if component_id in self._verified:
+                return
+            entry = self._entries.get(component_id)
+            generation = self._generations.get(component_id, 0)
+        signature = self._signature(component_id)
+        note_signature = self._note_signature(component_id)
+        if (entry is not None and entry.get('signature') == signature
+                and entry.get('note_signature') == note_signature):
+            with self._lock:
+                if self._generations.get(component_id, 0) == generation:
+                    self._verified.add(component_id)
+            return
+        metrics.count('search_index.rebuilt')
+        self.set_document(
+            component_id,
+            load_records(component_id),
+            load_note(component_id),
+            signature,
+            note_signature,
+            generation
+        )
+
+    def verify_all(self, component_ids, load_records, load_note):
+        """校验所有组件（每次运行只做一次），并清理已不存在的组件"""
+        self.ensure_loaded()
+        if self._all_verified:
+            return
+        keys = set(component_ids)
+        for component_id in keys:
+            self.verify(component_id, load_records, load_note)
+        with self._lock:
+            for component_id in [c for c in self._entries if c not in keys]:
+                self.forget(component_id)
+            self._all_verified = all(c in self._verified for c in keys)
+
+    def search(self, query, limit=50):
+        """检索，返回按相关度降序的 [(组件, 分数)]；所有查询词都要出现"""
+        self.ensure_loaded()
+        metrics.count('search_index.queries')
+        terms = query_terms(query)
+        if not terms:
+            return []
+        with self._lock:
+            postings = [self._postings.get(term) for term in terms]
+            if not all(postings):
+                return []
+            postings.sort(key=len)
+            candidates = [c for c in postings[0] if all(c in p for p in postings[1:])]
+            if not candidates:
+                return []
+
+            documents = max(len(self._lengths), 1)
+            average_length = max(self._total_length / documents, 1)
+            scores = {}
+            for components in postings:
+                idf = math.log(1 + (documents - len(components) + 0.5) / (len(components) + 0.5))
+                for component_id in candidates:
+                    tf = components[component_id]
+                    norm = 1 - self.B + self.B * self._lengths.get(component_id, 0) / average_length
+                    scores[component_id] = scores.get(component_id, 0) + idf * tf * (self.K1 + 1) / (tf + self.K1 * norm)
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        return ranked[:limit] if limit else ranked
@@ -0,0 +1,98 @@
+import time
+from contextlib import contextmanager
+
+
+class StartupProfiler:
+    """启动耗时统计：记录各阶段以及每个组件备注、统计的加载耗时
+
+    首次绘制完成且可见组件的数据都到达后打印一次报告。未启用时
+    所有方法直接返回，不做计时。
+    """
+
+    TOP_COMPONENTS = 10
+    # 首次绘制后最多等待的秒数，超时则带着未完成的项目直接出报告
+    REPORT_TIMEOUT = 10.0
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.started = time.perf_counter()
+        self.phases = []  # [(阶段名, 秒)]
+        self.components = {}  # 组件 -> {项目: 秒}
+        self._pending = set()
+        self._painted_at = None
+        self._reported = False
+
+    @contextmanager
+    def phase(self, name):
+        """统计一个启动阶段的耗时"""
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter() - start))
+
+    def begin_component(self, component_id, item):
+        """开始为组件的某一项计时，返回完成时调用的函数（未启用或已出报告时返回 None）"""
+        if not self.enabled or self._reported:
+            return None
+        key = (component_id, item)
+        start = time.perf_counter()
+        self._pending.add(key)
+
+        def done():
+            if key not in self._pending:
+                # 同一项会先后收到组件摘要和真实数据，只计第一次
+                return
+            elapsed = time.perf_counter() - start
+            items = self.components.setdefault(component_id, {})
+            items[item] = items.get(item, 0.0) + elapsed
+            self._pending.discard(key)
+            self._maybe_report()
+
+        return done
+
+    def painted(self):
+        """首次绘制完成"""
+        if not self.enabled or self._painted_at is not None:
+            return
+        self._painted_at = time.perf_counter()
+        self._maybe_report()
+
+    def check_timeout(self):
+        """首次绘制后超时仍有未完成的项目时直接出报告"""
+        if (self.enabled and not self._reported and self._painted_at is not None
+                and time.perf_counter() - self._painted_at >= self.REPORT_TIMEOUT):
+            self._reported = True
+            self.report()
+
+    def _maybe_report(self):
+        if self._painted_at is not None and not self._pending and not self._reported:
+            self._reported = True
+            self.report()
+
+    def report(self):
+        """打印启动耗时报告"""
+        now = time.perf_counter()
+        print("\n=== 启动耗时 ===")
+        for name, seconds in self.phases:
+            print(f"{name:<24}{seconds * 1000:9.1f} ms")
+        if self._painted_at is not None:
+            print(f"{'首次绘制完成':<24}{(self._painted_at - self.started) * 1000:9.1f} ms（自启动起）")
+        print(f"{'可见组件数据就绪':<24}{(now - self.started) * 1000:9.1f} ms（自启动起）")
+        if self._pending:
+            print(f"仍未完成: {len(self._pending)} 项")
+
+        if self.components:
+            totals = sorted(
+                self.components.items(),
+                key=lambda item: sum(item[1].values()),
+                reverse=True
+            )
+            print(f"\n共 {len(totals)} 个组件，最慢的 {min(len(totals), self.TOP_COMPONENTS)} 个：")
+            for component_id, items in totals[:self.TOP_COMPONENTS]:
+                detail = "  ".join(f"{item} {seconds * 1000:.1f} ms" for item, seconds in items.items())
+                print(f"  {component_id}: {detail}")
+        print("================\n")
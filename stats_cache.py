@@ -0,0 +1,227 @@
+import json
+import logging
+import os
+import threading
+from instrumentation import metrics
+from storage import atomic_write
+
+logger = logging.getLogger(__name__)
+
+CATEGORIES = ["学习", "健康", "投资", "娱乐", "出勤", "生活"]
+
+
+def empty_stats():
+    return {
+        'count': 0,
+        'score_sum': 0.0,
+        'score_count': 0,
+        'minutes': {category: 0 for category in CATEGORIES},
+    }
+
+
+def copy_stats(stats):
+    """复制统计（比 copy.deepcopy 快得多，组件很多时逐个复制也不明显）"""
+    return dict(stats, minutes=dict(stats['minutes']))
+
+
+def record_score(record):
+    """解析体验感，无效时返回 None"""
+    exp_str = str(record.get('体验感', '')).strip()
+    if not exp_str:
+        return None
+    try:
+        return float(exp_str)
+    except ValueError:
+        return None
+
+
+def record_minutes(record):
+    """解析实际时间（分钟），无效时返回 0"""
+    time_str = str(record.get('实际时间', '')).strip()
+    if not time_str:
+        return 0
+    try:
+        return int(time_str)
+    except ValueError:
+        return 0
+
+
+def apply_record(stats, record, sign=1):
+    """把一条记录计入（sign=1）或移出（sign=-1）统计"""
+    stats['count'] += sign
+    score = record_score(record)
+    if score is not None:
+        stats['score_sum'] += sign * score
+        stats['score_count'] += sign
+    category = record.get('类别')
+    if category in stats['minutes']:
+        stats['minutes'][category] += sign * record_minutes(record)
+
+
+def compute_stats(records):
+    """从完整记录列表计算统计（单次遍历）"""
+    stats = empty_stats()
+    for record in records:
+        apply_record(stats, record)
+    return stats
+
+
+class StatsCache:
+    """组件统计缓存：保存每个组件的记录数、体验感总和与各类别时长
+
+    增删改记录时按差值更新，缓存持久化在数据目录中，并用记录文件的
+    签名（修改时间和大小）校验是否过期。每个组件每次运行只校验一次，
+    之后的读取完全在内存中完成。get() 可能在后台线程中调用。
+
+    缓存文件在第一次计算统计时才读取：主界面先显示组件摘要，启动时
+    不必解析它。
+    """
+
+    FILE_NAME = "stats_cache.json"
+
+    def __init__(self, data_dir, storage):
+        self.storage = storage
+        self.cache_file = os.path.join(data_dir, self.FILE_NAME)
+        self._lock = threading.RLock()
+        self._entries = {}
+        self._verified = set()
+        # 本次运行中按差值更新过的组件，保存时再刷新它们的签名
+        self._touched = set()
+        # 每次丢弃缓存时递增，防止过期的后台重建覆盖新数据
+        self._generations = {}
+        self._dirty = False
+        # 读取缓存文件之前采用的组件摘要，读取后补进缺失的条目
+        self._adopted = {}
+        self._loaded = False
+
+    def load(self):
+        """读取持久化的缓存"""
+        try:
+            if os.path.exists(self.cache_file):
+                with open(self.cache_file, 'r', encoding='utf-8') as f:
+                    self._entries = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning("读取统计缓存时出错，将重建: %s", e)
+            self._entries = {}
+
+    def ensure_loaded(self):
+        """第一次使用时读取缓存文件"""
+        with self._lock:
+            if not self._loaded:
+                self._loaded = True
+                with metrics.span('stats_cache.load'):
+                    self.load()
+                for component_id in self._generations:
+                    # 读取之前已经丢弃过的组件，文件中的条目已经过期
+                    self._entries.pop(component_id, None)
+                for component_id, entry in self._adopted.items():
+                    self._entries.setdefault(component_id, entry)
+                self._adopted = {}
+
+    def save(self):
+        """写回缓存文件（没有变化时跳过），应在所有写入完成后调用"""
+        with self._lock:
+            if not self._loaded:
+                return
+            for component_id in self._touched:
+                entry = self._entries.get(component_id)
+                if entry is not None:
+                    entry['signature'] = self._signature(component_id)
+            self._touched.clear()
+            if not self._dirty:
+                return
+            atomic_write(self.cache_file, json.dumps(self._entries, ensure_ascii=False))
+            self._dirty = False
+
+    def _signature(self, component_id):
+        signature = self.storage.signature(component_id)
+        return list(signature) if signature is not None else None
+
+    def peek(self, component_id):
+        """已校验过的缓存直接返回，否则返回 None（不访问磁盘）"""
+        with self._lock:
+            if component_id in self._verified:
+                return self._entries[component_id]['stats']
+        return None
+
+    def get(self, component_id):
+        """获取组件统计，缓存缺失或过期时重新计算"""
+        stats = self.peek(component_id)
+        if stats is not None:
+            metrics.count('stats_cache.hit')
+            return stats
+
+        self.ensure_loaded()
+        with self._lock:
+            entry = self._entries.get(component_id)
+            generation = self._generations.get(component_id, 0)
+        if entry is not None:
+            if entry.get('signature') == self._signature(component_id):
+                # 磁盘上的缓存仍然有效，只需确认签名
+                metrics.count('stats_cache.revalidated')
+            else:
+                entry = None
+        if entry is None:
+            metrics.count('stats_cache.miss')
+            records = self.storage.open_records(component_id)
+            entry = {
+                'signature': self._signature(component_id),
+                'stats': compute_stats(records),
+            }
+        with self._lock:
+            if self._generations.get(component_id, 0) != generation:
+                # 计算期间缓存被丢弃过，结果可能已经过期，只返回不保存
+                return entry['stats']
+            if self._entries.get(component_id) is not entry:
+                self._entries[component_id] = entry
+                self._dirty = True
+            self._verified.add(component_id)
+        return entry['stats']
+
+    def adopt(self, component_id, signature, stats):
+        """没有缓存条目时采用别处保存的统计（组件摘要），读取时同样按签名校验"""
+        with self._lock:
+            entries = self._entries if self._loaded else self._adopted
+            if component_id not in entries:
+                entries[component_id] = {'signature': signature, 'stats': copy_stats(stats)}
+
+    def verified(self):
+        """本次运行中校验过的组件的 {组件: (签名, 统计)}（save() 之后签名是最新的）"""
+        with self._lock:
+            return {
+                component_id: (self._entries[component_id].get('signature'), self._entries[component_id]['stats'])
+                for component_id in self._verified
+            }
+
+    def _apply_delta(self, component_id, removed=None, added=None):
+        with self._lock:
+            if component_id not in self._verified:
+                # 没有可信的缓存，下次读取时重建
+                self.forget(component_id)
+                return
+            stats = self._entries[component_id]['stats']
+            if removed is not None:
+                apply_record(stats, removed, -1)
+            if added is not None:
+                apply_record(stats, added, 1)
+            self._touched.add(component_id)
+            self._dirty = True
+
+    def record_added(self, component_id, record):
+        self._apply_delta(component_id, added=record)
+
+    def record_updated(self, component_id, old_record, record):
+        self._apply_delta(component_id, removed=old_record, added=record)
+
+    def record_deleted(self, component_id, record):
+        self._apply_delta(component_id, removed=record)
+
+    def forget(self, component_id):
+        """丢弃组件的缓存"""
+        with self._lock:
+            self._adopted.pop(component_id, None)
+            if self._entries.pop(component_id, None) is not None:
+                self._dirty = True
+            self._verified.discard(component_id)
+            self._touched.discard(component_id)
+            self._generations[component_id] = self._generations.get(component_id, 0) + 1
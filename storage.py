@@ -0,0 +1,1363 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import uuid
+import weakref
+import zlib
+from datetime import datetime
+from archive import ArchiveReader, encode_archive, open_archive
+from lazy_records import open_journal
+
+logger = logging.getLogger(__name__)
+
+# 数据目录中不是记录文件的 .json 文件
+RESERVED_FILES = {"components.json", "stats_cache.json", "record_index.json", "search_index.json",
+                  "startup_snapshot.json", "manifest.json"}
+
+# 原子写入使用的临时文件后缀
+TMP_SUFFIX = ".tmp"
+
+# 记录的唯一 ID 字段
+RECORD_ID = "id"
+
+# 数据目录中的回收目录：批量删除的组件先移到这里，撤销时移回
+TRASH_DIR = ".trash"
+
+# 文件后端的会话标记：打开时创建、正常关闭时删除，启动时仍存在说明上次异常退出
+SESSION_FILE = ".session"
+
+# 组件文件的后缀（日志、JSON 数组、归档、备注），按后缀从文件名识别组件
+COMPONENT_SUFFIXES = (".jsonl", ".json", ".archive", "_note.txt")
+
+
+def component_key(filename):
+    """从组件文件名取出组件键，不是组件文件时返回 None"""
+    if filename in RESERVED_FILES:
+        return None
+    for suffix in COMPONENT_SUFFIXES:
+        if filename.endswith(suffix) and len(filename) > len(suffix):
+            return filename[:-len(suffix)]
+    return None
+
+
+def shard_parts(key):
+    """组件在数据目录中的分片位置：以日期开头的键放在 年/月/键/，其余放在 misc/键/"""
+    if len(key) >= 6 and key[:6].isdigit():
+        return (key[:4], key[4:6], key)
+    return ("misc", key)
+
+
+def created_from_key(key):
+    """组件的创建时间：组件 ID 和日期文件的键就是创建时间，其余按第一次写入的时间"""
+    for fmt, length in (("%Y%m%d%H%M%S", 14), ("%Y%m%d", 8)):
+        try:
+            return datetime.strptime(key[:length], fmt).strftime("%Y-%m-%d %H:%M:%S")
+        except ValueError:
+            continue
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+def new_record_id():
+    """生成新的记录 ID"""
+    return uuid.uuid4().hex
+
+
+def ensure_record_ids(records):
+    """为没有 ID 的记录分配 ID（原地修改），返回是否有记录被分配了 ID"""
+    changed = False
+    for record in records:
+        if not record.get(RECORD_ID):
+            record[RECORD_ID] = new_record_id()
+            changed = True
+    return changed
+
+
+def sort_newest_first(records):
+    """按时间戳倒序排列记录（原地），返回 records"""
+    records.sort(key=lambda record: record.get('timestamp', ''), reverse=True)
+    return records
+
+
+def _fsync_path(path):
+    """按路径 fsync 文件或目录（不支持目录 fsync 的系统上忽略）"""
+    flags = os.O_RDONLY if os.path.isdir(path) else os.O_RDWR
+    try:
+        fd = os.open(path, flags)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class FsyncPolicy:
+    """fsync 策略
+
+    always: 每次写入后立即 fsync 文件和所在目录，最安全。
+    batch:  追加写入和目录的 fsync 合并，每隔 interval 秒执行一次，
+            吞吐量更高，崩溃时最多丢失最后 interval 秒内的追加。
+    两种策略下原子替换的临时文件都会在改名前 fsync，保证不会出现半个文件。
+    """
+
+    MODES = ('always', 'batch')
+
+    def __init__(self, mode='always', interval=1.0):
+        if mode not in self.MODES:
+            raise ValueError(f"未知的 fsync 策略: {mode}")
+        self.mode = mode
+        self.interval = interval
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._timer = None
+
+    def sync_file(self, f, path):
+        """写入完成后同步一个已打开的文件"""
+        f.flush()
+        if self.mode == 'always':
+            os.fsync(f.fileno())
+        else:
+            self._defer(path)
+
+    def sync_dir(self, dir_path):
+        """同步目录项（改名、新建文件之后）"""
+        if self.mode == 'always':
+            _fsync_path(dir_path)
+        else:
+            self._defer(dir_path)
+
+    def _defer(self, path):
+        with self._lock:
+            self._pending.add(path)
+            if self._timer is None:
+                self._timer = threading.Timer(self.interval, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self):
+        """执行所有被推迟的 fsync"""
+        with self._lock:
+            pending = self._pending
+            self._pending = set()
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        for path in pending:
+            if os.path.exists(path):
+                _fsync_path(path)
+
+
+def atomic_write(path, text, policy=None):
+    """先写临时文件并落盘，再原子地改名覆盖目标文件（text 为 bytes 时按二进制写入）"""
+    tmp_path = path + TMP_SUFFIX
+    if isinstance(text, bytes):
+        f = open(tmp_path, 'wb')
+    else:
+        f = open(tmp_path, 'w', encoding='utf-8')
+    with f:
+        f.write(text)
+        f.flush()
+        # 改名前必须落盘，否则崩溃后可能得到一个空的目标文件
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    dir_path = os.path.dirname(path) or "."
+    if policy is not None:
+        policy.sync_dir(dir_path)
+    else:
+        _fsync_path(dir_path)
+
+
+def _ends_with_newline(f):
+    """以二进制方式打开的文件是否为空或以换行符结尾"""
+    size = f.seek(0, os.SEEK_END)
+    if size == 0:
+        return True
+    f.seek(size - 1)
+    return f.read(1) == b"\n"
+
+
+def repair_journal_tail(path):
+    """修复写入中途崩溃留下的残缺末行，返回是否做了修改"""
+    with open(path, 'rb+') as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        if size == 0:
+            return False
+        f.seek(size - 1)
+        if f.read(1) == b"\n":
+            return False
+
+        # 向前找到最后一个换行符
+        pos = size
+        while pos > 0:
+            step = min(4096, pos)
+            pos -= step
+            f.seek(pos)
+            chunk = f.read(step)
+            index = chunk.rfind(b"\n")
+            if index >= 0:
+                pos += index + 1
+                break
+
+        f.seek(pos)
+        tail = f.read()
+        try:
+            json.loads(tail.decode('utf-8'))
+            # 末行完整，只是缺少换行符
+            f.seek(0, os.SEEK_END)
+            f.write(b"\n")
+        except ValueError:
+            f.truncate(pos)
+    return True
+
+
+def read_journal(file_path):
+    """回放日志文件，返回 (有效记录列表, 日志行数)
+
+    修改和删除按记录 ID 经 ID -> 位置索引直接定位；
+    旧日志中没有 ID 的操作行按时间戳定位。
+    """
+    records = []
+    positions = {}  # 记录 ID -> 在 records 中的位置
+    lines = 0
+    with open(file_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                # 末尾残缺的行（写入中途崩溃）直接跳过
+                continue
+            lines += 1
+            op = entry.get('_op')
+            if op is None:
+                record_id = entry.get(RECORD_ID)
+                if record_id:
+                    positions[record_id] = len(records)
+                records.append(entry)
+            elif RECORD_ID in entry:
+                i = positions.get(entry[RECORD_ID])
+                if i is None:
+                    continue
+                if op == 'update':
+                    record = entry['record']
+                    record[RECORD_ID] = entry[RECORD_ID]
+                    records[i] = record
+                elif op == 'delete':
+                    # 先置空，回放结束后统一移除，其余记录的位置不变
+                    records[i] = None
+                    del positions[entry[RECORD_ID]]
+            elif op == 'update':
+                for i, r in enumerate(records):
+                    if r is not None and r.get('timestamp') == entry.get('timestamp'):
+                        records[i] = entry['record']
+                        break
+            elif op == 'delete':
+                for i, r in enumerate(records):
+                    if r is not None and r.get('timestamp') == entry.get('timestamp'):
+                        records[i] = None
+    return [r for r in records if r is not None], lines
+
+
+class Manifest:
+    """组件清单 manifest.json：每个组件的创建时间、记录数和记录文件大小
+
+    列出组件时读取清单而不是扫描目录。记录数为 None 表示尚未读取过，
+    size 为 None 表示组件没有记录文件（只有备注）；flat 标记还留在旧的
+    平铺目录中、尚未移入分片目录的组件。
+    """
+
+    FILE_NAME = "manifest.json"
+    VERSION = 1
+
+    def __init__(self, data_dir, fsync_policy=None):
+        self.manifest_file = os.path.join(data_dir, self.FILE_NAME)
+        self.fsync_policy = fsync_policy
+        self.entries = {}
+        self.dirty = False
+        self.loaded = self.load()
+
+    def load(self):
+        """读取清单，文件不存在或已损坏时返回 False"""
+        try:
+            with open(self.manifest_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if not isinstance(data, dict) or data.get('version') != self.VERSION:
+            return False
+        self.entries = data.get('components', {})
+        return True
+
+    def save(self):
+        atomic_write(
+            self.manifest_file,
+            json.dumps({'version': self.VERSION, 'components': self.entries}, ensure_ascii=False),
+            self.fsync_policy
+        )
+        self.dirty = False
+
+    def add(self, key):
+        """登记新组件，已存在时返回 False"""
+        if key in self.entries:
+            return False
+        self.entries[key] = {'created': created_from_key(key), 'count': 0, 'size': None}
+        self.dirty = True
+        return True
+
+    def remove(self, key):
+        if self.entries.pop(key, None) is not None:
+            self.dirty = True
+
+
+class FileStorage:
+    """基于文件的存储后端基类（备注与组件列表的读写逻辑、目录布局和组件清单）
+
+    每个组件的文件放在分片目录 data/年/月/<组件 ID>/ 中，组件清单记录所有组件，
+    列出组件不需要扫描目录。旧的平铺目录在第一次打开时登记到清单，之后由
+    migrate_layout() 分批移入分片目录，迁移期间两种位置的组件都可以正常读写。
+    """
+
+    NOTE_SUFFIX = "_note.txt"
+    # 归档后的记录文件（只读的压缩格式，见 archive.py）
+    ARCHIVE_SUFFIX = ".archive"
+    SUPPORTS_ARCHIVE = True
+
+    def __init__(self, data_dir, fsync_policy=None):
+        self.data_dir = data_dir
+        self.components_file = os.path.join(self.data_dir, "components.json")
+        self.fsync_policy = fsync_policy or FsyncPolicy()
+        # 记录文件的读写锁：读取时可能迁移并重写文件，需要与后台写入互斥
+        self._lock = threading.RLock()
+        # 组件键 -> 打开的归档记录序列（归档被删除或移走前把内容读进内存）
+        self._archive_readers = {}
+        self.manifest = Manifest(self.data_dir, self.fsync_policy)
+        # 组件键 -> 文件所在目录（路径拼接在热路径上，缓存起来）
+        self._dirs = {}
+        self._session_file = os.path.join(self.data_dir, SESSION_FILE)
+        self._recovered = []
+        if not self.manifest.loaded or os.path.exists(self._session_file):
+            # 没有清单（旧的平铺目录）或上次没有正常关闭：扫描整个目录重建清单
+            self._recovered = self._scan_layout()
+            self.manifest.save()
+        else:
+            self._adopt_flat_files()
+        self._dirs.clear()
+        # 会话标记必须落盘，否则崩溃后可能看不到它而跳过目录扫描
+        with open(self._session_file, 'w') as f:
+            os.fsync(f.fileno())
+        _fsync_path(self.data_dir)
+
+    def recover(self):
+        """返回启动时清理的临时文件和修复的残缺文件（只在上次异常退出时扫描目录）"""
+        recovered, self._recovered = self._recovered, []
+        return recovered
+
+    def _recover_file(self, path):
+        """扫描目录时检查一个组件文件，做了修复时返回 True"""
+        return False
+
+    def _scan_layout(self):
+        """扫描整个数据目录：清理临时文件，修复残缺文件，按文件实际所在位置重建清单"""
+        recovered = []
+        found = {}  # 组件键 -> 文件是否在平铺目录中的集合
+        for dirpath, dirnames, filenames in os.walk(self.data_dir):
+            if dirpath == self.data_dir:
+                dirnames[:] = [name for name in dirnames if name != TRASH_DIR]
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                if filename.endswith(TMP_SUFFIX):
+                    # 写入中途崩溃留下的临时文件，目标文件本身仍是完整的旧版本
+                    os.remove(path)
+                    recovered.append(filename)
+                    continue
+                key = component_key(filename)
+                if key is None:
+                    continue
+                if self._recover_file(path):
+                    recovered.append(filename)
+                found.setdefault(key, set()).add(dirpath == self.data_dir)
+
+        entries = self.manifest.entries
+        for key in list(entries):
+            if key not in found:
+                del entries[key]
+        for key, places in found.items():
+            if self.manifest.add(key):
+                entries[key]['count'] = None
+            entries[key].pop('flat', None)
+            if True in places:
+                if False in places:
+                    # 上次移入分片目录时中断，把剩下的文件也移过去
+                    self._move_to_shard(key)
+                else:
+                    entries[key]['flat'] = True
+            size = self._record_size(key)
+            if size != entries[key]['size']:
+                entries[key]['size'] = size
+                entries[key]['count'] = None if size is not None else 0
+        self.manifest.dirty = True
+        return recovered
+
+    def _adopt_flat_files(self):
+        """数据目录根下的组件文件（手动放入或上次迁移中断留下的）登记为平铺组件
+
+        迁移完成后根目录只剩少量文件和年份目录，列出它的开销与组件数无关。
+        """
+        for filename in os.listdir(self.data_dir):
+            key = component_key(filename)
+            if key is None:
+                continue
+            entry = self.manifest.entries.get(key)
+            if entry is None:
+                self.manifest.add(key)
+                entry = self.manifest.entries[key]
+                entry['flat'] = True
+                entry['count'] = None
+                entry['size'] = self._record_size(key)
+            elif not entry.get('flat'):
+                self._move_to_shard(key)
+
+    def component_dir(self, key):
+        """组件文件所在的目录：分片目录 年/月/<键>/，尚未迁移的组件仍在数据目录下"""
+        directory = self._dirs.get(key)
+        if directory is None:
+            entry = self.manifest.entries.get(key)
+            if entry is not None and entry.get('flat'):
+                directory = self.data_dir
+            else:
+                directory = os.path.join(self.data_dir, *shard_parts(key))
+            self._dirs[key] = directory
+        return directory
+
+    def _register(self, key):
+        """第一次写入组件的文件前登记到清单并建立分片目录"""
+        if self.manifest.add(key):
+            os.makedirs(self.component_dir(key), exist_ok=True)
+
+    def _record_size(self, key):
+        for path in self.record_paths(key):
+            try:
+                return os.stat(path).st_size
+            except OSError:
+                continue
+        return None
+
+    def _update_entry(self, key, count=None, delta=0):
+        """写入记录后更新清单中的文件大小和记录数（count 为新的记录数，delta 为增减的条数）"""
+        entry = self.manifest.entries.get(key)
+        if entry is None:
+            return
+        entry['size'] = self._record_size(key)
+        if count is not None:
+            entry['count'] = count
+        elif delta and entry['count'] is not None:
+            entry['count'] = max(entry['count'] + delta, 0)
+        self.manifest.dirty = True
+
+    def _remember_count(self, key, count):
+        """读取记录后记下记录数"""
+        entry = self.manifest.entries.get(key)
+        if entry is not None and entry['count'] != count:
+            entry['count'] = count
+            self.manifest.dirty = True
+
+    def _drop_if_empty(self, key):
+        """组件的文件都已删除时从清单中移除，并删除空的分片目录"""
+        if any(os.path.exists(path) for path in self._component_paths(key)):
+            self._update_entry(key)
+            return
+        directory = self.component_dir(key)
+        self.manifest.remove(key)
+        self._dirs.pop(key, None)
+        if directory != self.data_dir:
+            try:
+                os.rmdir(directory)
+            except OSError:
+                pass
+
+    def _move_to_shard(self, key):
+        """把组件的文件从平铺目录移入分片目录（改名，修改时间和大小不变，签名仍然有效）"""
+        self._release_files(key)
+        self.manifest.entries[key].pop('flat', None)
+        self.manifest.dirty = True
+        self._dirs.pop(key, None)
+        directory = self.component_dir(key)
+        os.makedirs(directory, exist_ok=True)
+        for target in self._component_paths(key):
+            source = os.path.join(self.data_dir, os.path.basename(target))
+            if os.path.exists(source) and not os.path.exists(target):
+                os.replace(source, target)
+        self.fsync_policy.sync_dir(directory)
+
+    def pending_layout_migration(self):
+        """还留在平铺目录中的组件数"""
+        with self._lock:
+            return sum(1 for entry in self.manifest.entries.values() if entry.get('flat'))
+
+    def migrate_layout(self, limit=None):
+        """把平铺目录中的组件移入分片目录（每次最多 limit 个），返回剩余的数量"""
+        with self._lock:
+            flat = [key for key, entry in self.manifest.entries.items() if entry.get('flat')]
+            batch = flat if limit is None else flat[:limit]
+            for key in batch:
+                self._move_to_shard(key)
+            if batch:
+                self.fsync_policy.sync_dir(self.data_dir)
+            return len(flat) - len(batch)
+
+    def list_keys(self):
+        """列出有记录文件（包括归档）的组件键（读取清单，不扫描目录）"""
+        with self._lock:
+            return sorted(key for key, entry in self.manifest.entries.items() if entry['size'] is not None)
+
+    def get_note_path(self, key):
+        """获取备注文件路径"""
+        return os.path.join(self.component_dir(key), f"{key}{self.NOTE_SUFFIX}")
+
+    def load_note(self, key):
+        """读取备注"""
+        with self._lock:
+            note_file = self.get_note_path(key)
+            if os.path.exists(note_file):
+                with open(note_file, 'r', encoding='utf-8') as f:
+                    return f.read().strip()
+            return ""
+
+    def save_note(self, key, note):
+        """写入备注"""
+        with self._lock:
+            self._register(key)
+            atomic_write(self.get_note_path(key), note, self.fsync_policy)
+
+    def delete_note(self, key):
+        """删除备注文件"""
+        with self._lock:
+            note_file = self.get_note_path(key)
+            if os.path.exists(note_file):
+                os.remove(note_file)
+            self._drop_if_empty(key)
+
+    def load_components(self):
+        """读取组件列表（组件可能带有摘要 summary 字段，见 component_summaries.py）"""
+        if os.path.exists(self.components_file):
+            with open(self.components_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        return []
+
+    def save_components(self, components_data):
+        """写入组件列表"""
+        atomic_write(
+            self.components_file,
+            # 每个组件带有摘要，不再缩进以减小文件、加快启动时的解析
+            json.dumps(components_data, ensure_ascii=False),
+            self.fsync_policy
+        )
+
+    def signature(self, key):
+        """记录文件（或归档文件）的签名 (修改时间, 大小)，文件不存在时返回 None"""
+        with self._lock:
+            for path in (self.get_path(key), self.get_archive_path(key)):
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                return (st.st_mtime_ns, st.st_size)
+            return None
+
+    def note_signature(self, key):
+        """备注文件的签名 (修改时间, 大小)，文件不存在时返回 None"""
+        with self._lock:
+            try:
+                st = os.stat(self.get_note_path(key))
+            except OSError:
+                return None
+            return (st.st_mtime_ns, st.st_size)
+
+    def record_paths(self, key):
+        """组件的所有记录文件路径（文件不一定存在）"""
+        return [self.get_path(key), self.get_archive_path(key)]
+
+    def open_records(self, key, newest_first=False):
+        """用于显示或遍历的记录序列，顺序与 load_records() 相同（newest_first 时按时间戳倒序）
+
+        归档的组件返回按块解压的序列（见 archive.py），日志后端返回按需解码
+        的序列，其余返回完整列表。
+        """
+        with self._lock:
+            if self.is_archived(key):
+                records = open_archive(self.get_archive_path(key), newest_first)
+                self._remember_count(key, len(records))
+                self._archive_readers.setdefault(key, weakref.WeakSet()).add(records)
+                return records
+        records = self.load_records(key)
+        return sort_newest_first(records) if newest_first else records
+
+    def _release_archive(self, key):
+        # 打开的归档序列按需读取文件，文件被删除或移走之前把内容读进内存
+        for records in list(self._archive_readers.pop(key, ())):
+            records.detach()
+
+    def _release_files(self, key):
+        """组件的记录文件即将被改写、删除或移走"""
+        self._release_archive(key)
+
+    def get_archive_path(self, key):
+        return os.path.join(self.component_dir(key), f"{key}{self.ARCHIVE_SUFFIX}")
+
+    def is_archived(self, key):
+        return os.path.exists(self.get_archive_path(key))
+
+    def load_archive(self, key):
+        """读取归档中的全部记录（解除归档、导出时使用），组件没有归档时返回 None"""
+        path = self.get_archive_path(key)
+        if not os.path.exists(path):
+            return None
+        return ArchiveReader(path).records()
+
+    def archive(self, key):
+        """把组件的记录写成压缩归档并删除原记录文件，返回是否归档
+
+        归档后读取不受影响；之后再写入记录时自动先解除归档。
+        """
+        with self._lock:
+            if self.is_archived(key):
+                return False
+            records = self.load_records(key)
+            atomic_write(self.get_archive_path(key), encode_archive(records), self.fsync_policy)
+            self._release_files(key)
+            for path in self.record_paths(key):
+                if path != self.get_archive_path(key) and os.path.exists(path):
+                    os.remove(path)
+            self._forget_key(key)
+            self._update_entry(key)
+            return True
+
+    def unarchive(self, key):
+        """把归档还原为普通记录文件，返回是否还原"""
+        with self._lock:
+            records = self.load_archive(key)
+            if records is None:
+                return False
+            self.replace_records(key, records)
+            return True
+
+    def _remove_archive(self, key):
+        path = self.get_archive_path(key)
+        if os.path.exists(path):
+            self._release_archive(key)
+            os.remove(path)
+
+    def _component_paths(self, key):
+        return self.record_paths(key) + [self.get_note_path(key)]
+
+    def _forget_key(self, key):
+        """组件的文件被移走或移回后清除该键的内部状态"""
+
+    def trash_components(self, keys, trash_dir):
+        """把一批组件的记录和备注文件移入回收目录（同一文件系统内改名，不复制内容）"""
+        os.makedirs(trash_dir, exist_ok=True)
+        with self._lock:
+            for key in keys:
+                self._release_files(key)
+                directory = self.component_dir(key)
+                for path in self._component_paths(key):
+                    if os.path.exists(path):
+                        os.replace(path, os.path.join(trash_dir, os.path.basename(path)))
+                self._forget_key(key)
+                self._drop_if_empty(key)
+                # 空的分片目录已被删除，同步它的上级目录
+                self.fsync_policy.sync_dir(directory if os.path.isdir(directory) else os.path.dirname(directory))
+        self.fsync_policy.sync_dir(trash_dir)
+
+    def restore_components(self, keys, trash_dir):
+        """把回收目录中这批组件的文件移回数据目录（数据目录中已有同名文件时保留现有文件）"""
+        with self._lock:
+            for key in keys:
+                self._register(key)
+                for path in self._component_paths(key):
+                    trashed = os.path.join(trash_dir, os.path.basename(path))
+                    if os.path.exists(trashed) and not os.path.exists(path):
+                        os.replace(trashed, path)
+                self._forget_key(key)
+                # 移回的文件记录数未知，下次读取时记下
+                self._update_entry(key)
+                self.manifest.entries[key]['count'] = None
+                self.fsync_policy.sync_dir(self.component_dir(key))
+
+    def close(self):
+        """保存组件清单，执行被推迟的 fsync，释放后端资源"""
+        with self._lock:
+            if self.manifest.dirty:
+                self.manifest.save()
+            if os.path.exists(self._session_file):
+                os.remove(self._session_file)
+        self.fsync_policy.flush()
+
+
+class JsonArrayStorage(FileStorage):
+    """旧格式：每个组件一个 JSON 数组文件，每次保存整体重写"""
+
+    SUFFIX = ".json"
+
+    def get_path(self, key):
+        return os.path.join(self.component_dir(key), f"{key}{self.SUFFIX}")
+
+    def load_records(self, key):
+        """读取记录，没有 ID 的旧记录分配 ID 后写回"""
+        with self._lock:
+            archived = self.load_archive(key)
+            if archived is not None:
+                return archived
+            file_path = self.get_path(key)
+            if not os.path.exists(file_path):
+                return []
+            with open(file_path, 'r', encoding='utf-8') as f:
+                records = json.load(f)
+            if ensure_record_ids(records):
+                self.replace_records(key, records)
+            self._remember_count(key, len(records))
+            return records
+
+    def replace_records(self, key, records):
+        """整体写入记录文件（组件已归档时同时解除归档）"""
+        with self._lock:
+            self._register(key)
+            atomic_write(
+                self.get_path(key),
+                json.dumps(records, ensure_ascii=False, indent=2),
+                self.fsync_policy
+            )
+            self._remove_archive(key)
+            self._update_entry(key, count=len(records))
+
+    def append_record(self, key, record):
+        self.append_records(key, [record])
+
+    def append_records(self, key, new_records):
+        ensure_record_ids(new_records)
+        with self._lock:
+            records = self.load_records(key)
+            records.extend(new_records)
+            self.replace_records(key, records)
+
+    def update_record(self, key, record_id, record):
+        """按 ID 替换一条记录（数组格式只能整体重写文件）"""
+        with self._lock:
+            records = self.load_records(key)
+            for i, r in enumerate(records):
+                if r.get(RECORD_ID) == record_id:
+                    records[i] = dict(record, **{RECORD_ID: record_id})
+                    self.replace_records(key, records)
+                    break
+
+    def delete_record(self, key, record_id):
+        """按 ID 删除一条记录"""
+        with self._lock:
+            records = self.load_records(key)
+            kept = [r for r in records if r.get(RECORD_ID) != record_id]
+            if len(kept) != len(records):
+                self.replace_records(key, kept)
+
+    def delete_records(self, key):
+        with self._lock:
+            self._release_files(key)
+            for file_path in self.record_paths(key):
+                if os.path.exists(file_path):
+                    os.remove(file_path)
+            self._drop_if_empty(key)
+
+
+class JournalStorage(FileStorage):
+    """追加式日志存储：每条记录占一行 (JSON Lines)
+
+    普通行即一条新增记录；修改和删除以带 "_op" 的操作行追加，
+    读取时按顺序回放。失效行累积过多时自动压缩为只含有效记录的文件。
+    旧的 <id>.json 数组文件在第一次访问时迁移为 <id>.jsonl。
+    """
+
+    SUFFIX = ".jsonl"
+    LEGACY_SUFFIX = ".json"
+    # 失效行数超过 max(COMPACT_MIN_DEAD, 有效记录数) 时触发压缩
+    COMPACT_MIN_DEAD = 64
+
+    def __init__(self, data_dir, fsync_policy=None):
+        # key -> [总行数, 有效记录数]，仅在读取或压缩后可知
+        self._line_stats = {}
+        # key -> 仍在使用的按需解码序列（映射着该组件的日志文件）
+        self._readers = {}
+        # 本次运行中已检查过末行的组件
+        self._tails_checked = set()
+        # 基类打开时可能扫描目录、移动文件，上面的状态需要先建立
+        super().__init__(data_dir, fsync_policy)
+
+    def _recover_file(self, path):
+        """修复日志文件残缺的末行"""
+        return path.endswith(self.SUFFIX) and repair_journal_tail(path)
+
+    def get_path(self, key):
+        return os.path.join(self.component_dir(key), f"{key}{self.SUFFIX}")
+
+    def get_legacy_path(self, key):
+        return os.path.join(self.component_dir(key), f"{key}{self.LEGACY_SUFFIX}")
+
+    def record_paths(self, key):
+        return [self.get_path(key), self.get_legacy_path(key), self.get_archive_path(key)]
+
+    def _forget_key(self, key):
+        self._line_stats.pop(key, None)
+
+    def _release_files(self, key):
+        super()._release_files(key)
+        # Windows 上被映射的文件不能被替换、删除或改名，先把映射复制到内存；
+        # 其他系统上旧映射仍指向原来的文件内容，不受影响
+        if os.name != 'nt':
+            return
+        for reader in list(self._readers.pop(key, ())):
+            reader.detach()
+
+    def migrate(self, key):
+        """将旧的 JSON 数组文件迁移为日志文件（只执行一次），同时分配记录 ID"""
+        with self._lock:
+            legacy_path = self.get_legacy_path(key)
+            if os.path.exists(self.get_path(key)) or not os.path.exists(legacy_path):
+                return False
+            with open(legacy_path, 'r', encoding='utf-8') as f:
+                records = json.load(f)
+            ensure_record_ids(records)
+            self._write_compacted(key, records)
+            os.replace(legacy_path, legacy_path + ".bak")
+            return True
+
+    def migrate_all(self):
+        """迁移数据目录中所有旧格式文件"""
+        return sum(1 for key in self.list_keys() if self.migrate(key))
+
+    def load_records(self, key):
+        """回放日志；含有没有 ID 的旧记录时分配 ID 并压缩写回"""
+        with self._lock:
+            archived = self.load_archive(key)
+            if archived is not None:
+                return archived
+            self.migrate(key)
+            file_path = self.get_path(key)
+            if not os.path.exists(file_path):
+                return []
+
+            records, lines = read_journal(file_path)
+            if ensure_record_ids(records):
+                self._write_compacted(key, records)
+            else:
+                self._line_stats[key] = [lines, len(records)]
+            self._remember_count(key, len(records))
+            return records
+
+    def open_records(self, key, newest_first=False):
+        """映射日志文件并建立偏移索引，返回按需解码的记录序列（见 lazy_records.py）"""
+        with self._lock:
+            if self.is_archived(key):
+                return super().open_records(key, newest_first)
+            self.migrate(key)
+            file_path = self.get_path(key)
+            if not os.path.exists(file_path):
+                return []
+            records = open_journal(file_path, newest_first)
+            if records is None:
+                # 含有没有 ID 的旧记录或操作行：完整回放（会分配 ID 并压缩写回）
+                return super().open_records(key, newest_first)
+            self._remember_count(key, len(records))
+            self._readers.setdefault(key, weakref.WeakSet()).add(records)
+            return records
+
+    def _append_lines(self, key, entries, live_delta):
+        with self._lock:
+            # 归档是只读的，写入前先还原为日志文件
+            self.unarchive(key)
+            self.migrate(key)
+            self._register(key)
+            file_path = self.get_path(key)
+            is_new = not os.path.exists(file_path)
+            if not is_new and key not in self._tails_checked:
+                self._repair_tail(key, file_path)
+            self._tails_checked.add(key)
+            with open(file_path, 'a+', encoding='utf-8') as f:
+                data = "".join(json.dumps(entry, ensure_ascii=False) + "\n" for entry in entries)
+                if not is_new and not _ends_with_newline(f.buffer):
+                    # 末行残缺（写入中途崩溃）时另起一行，新记录不能接在残行后面
+                    data = "\n" + data
+                f.write(data)
+                self.fsync_policy.sync_file(f, file_path)
+            if is_new:
+                self.fsync_policy.sync_dir(os.path.dirname(file_path))
+            self._update_entry(key, delta=live_delta)
+
+            stats = self._line_stats.get(key)
+            if stats is not None:
+                stats[0] += len(entries)
+                stats[1] = max(stats[1] + live_delta, 0)
+                self._maybe_compact(key)
+
+    def _repair_tail(self, key, file_path):
+        """第一次追加之前修复残缺的末行
+
+        会话标记由同一数据目录的所有进程共用，另一个进程正常关闭时会删掉
+        它，异常退出留下的残行不一定在启动时被扫描到，所以追加前再检查一次。
+        """
+        with open(file_path, 'rb') as f:
+            if _ends_with_newline(f):
+                return
+        # 截断映射着的文件后再访问映射会出错，先把映射复制到内存
+        for reader in list(self._readers.pop(key, ())):
+            reader.detach()
+        if repair_journal_tail(file_path):
+            logger.warning("已修复残缺的日志末行: %s", file_path)
+
+    def _append_line(self, key, entry, live_delta):
+        self._append_lines(key, [entry], live_delta)
+
+    def append_record(self, key, record):
+        self.append_records(key, [record])
+
+    def append_records(self, key, records):
+        """一次写入多条记录（一次打开、一次 fsync）"""
+        ensure_record_ids(records)
+        self._append_lines(key, records, len(records))
+
+    def update_record(self, key, record_id, record):
+        """追加一条按 ID 定位的修改操作，不重写文件"""
+        self._append_line(key, {'_op': 'update', RECORD_ID: record_id, 'record': record}, 0)
+
+    def delete_record(self, key, record_id):
+        """追加一条按 ID 定位的删除操作，不重写文件"""
+        self._append_line(key, {'_op': 'delete', RECORD_ID: record_id}, -1)
+
+    def replace_records(self, key, records):
+        """整体写入记录（组件已归档时同时解除归档）"""
+        ensure_record_ids(records)
+        with self._lock:
+            self._write_compacted(key, records)
+            self._remove_archive(key)
+
+    def delete_records(self, key):
+        with self._lock:
+            self._release_files(key)
+            for file_path in self.record_paths(key):
+                if os.path.exists(file_path):
+                    os.remove(file_path)
+            self._line_stats.pop(key, None)
+            self._drop_if_empty(key)
+
+    def _maybe_compact(self, key):
+        lines, live = self._line_stats[key]
+        if lines - live > max(self.COMPACT_MIN_DEAD, live):
+            self.compact(key)
+
+    def compact(self, key):
+        """压缩日志：回放后只保留有效记录"""
+        with self._lock:
+            self._write_compacted(key, self.load_records(key))
+
+    def _write_compacted(self, key, records):
+        with self._lock:
+            self._release_files(key)
+            self._register(key)
+            atomic_write(
+                self.get_path(key),
+                "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in records),
+                self.fsync_policy
+            )
+            self._line_stats[key] = [len(records), len(records)]
+            self._update_entry(key, count=len(records))
+
+
+def _to_number(value, cast):
+    """把表单中的字符串转成数字，无法转换时返回 None"""
+    try:
+        return cast(str(value).strip())
+    except (TypeError, ValueError):
+        return None
+
+
+class SQLiteStorage:
+    """SQLite 存储后端：组件、记录、备注分别存放在三张表中
+
+    记录的完整内容以 JSON 保存在 data 列，同时把常用字段拆成独立列
+    （timestamp、活动、类别、实际时间、体验感）以便建索引和直接用 SQL 聚合。
+    """
+
+    DB_NAME = "records.db"
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS components (
+            component_id TEXT PRIMARY KEY,
+            position INTEGER NOT NULL,
+            date_str TEXT,
+            date TEXT,
+            summary TEXT
+        );
+        CREATE TABLE IF NOT EXISTS records (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            component_id TEXT NOT NULL,
+            record_id TEXT,
+            timestamp TEXT,
+            activity TEXT,
+            category TEXT,
+            actual_minutes INTEGER,
+            score REAL,
+            data TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS notes (
+            component_id TEXT PRIMARY KEY,
+            note TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_records_component ON records (component_id);
+        CREATE INDEX IF NOT EXISTS idx_records_timestamp ON records (timestamp);
+        CREATE INDEX IF NOT EXISTS idx_records_category ON records (category);
+    """
+    # 数据库本身已是紧凑格式，不提供归档
+    SUPPORTS_ARCHIVE = False
+
+    def __init__(self, data_dir, fsync_policy=None):
+        self.data_dir = data_dir
+        self.db_path = os.path.join(self.data_dir, self.DB_NAME)
+        self.fsync_policy = fsync_policy or FsyncPolicy()
+        is_new = not os.path.exists(self.db_path)
+        self._lock = threading.RLock()
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        # SQLite 自己保证原子性；batch 策略下使用 WAL 并降低同步级别
+        if self.fsync_policy.mode == 'batch':
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+        else:
+            self.conn.execute("PRAGMA synchronous=FULL")
+        self.conn.executescript(self.SCHEMA)
+        self._migrate_record_ids()
+        self._migrate_summaries()
+        if is_new:
+            # 第一次启用时导入现有的 data/ 目录
+            self.import_data_dir(self.data_dir)
+
+    def get_path(self, key):
+        return self.db_path
+
+    def is_archived(self, key):
+        return False
+
+    def open_records(self, key, newest_first=False):
+        records = self.load_records(key)
+        return sort_newest_first(records) if newest_first else records
+
+    def migrate_layout(self, limit=None):
+        """数据库没有目录布局，无需迁移"""
+        return 0
+
+    def archive(self, key):
+        raise ValueError("SQLite 后端不支持归档（数据库本身已是紧凑格式）")
+
+    def recover(self):
+        """SQLite 在打开数据库时会自动回滚未完成的事务"""
+        return []
+
+    def _migrate_record_ids(self):
+        """旧数据库：增加 record_id 列并为已有记录分配 ID"""
+        with self._lock, self.conn:
+            columns = [row[1] for row in self.conn.execute("PRAGMA table_info(records)")]
+            if 'record_id' not in columns:
+                self.conn.execute("ALTER TABLE records ADD COLUMN record_id TEXT")
+            updates = []
+            for seq, data in self.conn.execute("SELECT seq, data FROM records WHERE record_id IS NULL").fetchall():
+                record = json.loads(data)
+                ensure_record_ids([record])
+                updates.append((record[RECORD_ID], json.dumps(record, ensure_ascii=False), seq))
+            self.conn.executemany("UPDATE records SET record_id = ?, data = ? WHERE seq = ?", updates)
+            self.conn.execute(
+                "CREATE UNIQUE INDEX IF NOT EXISTS idx_records_record_id ON records (component_id, record_id)"
+            )
+
+    def _migrate_summaries(self):
+        """旧数据库：components 表增加 summary 列（组件摘要，JSON）"""
+        with self._lock, self.conn:
+            columns = [row[1] for row in self.conn.execute("PRAGMA table_info(components)")]
+            if 'summary' not in columns:
+                self.conn.execute("ALTER TABLE components ADD COLUMN summary TEXT")
+
+    def _record_row(self, key, record):
+        return (
+            key,
+            record.get(RECORD_ID),
+            record.get('timestamp'),
+            record.get('活动'),
+            record.get('类别'),
+            _to_number(record.get('实际时间'), int),
+            _to_number(record.get('体验感'), float),
+            json.dumps(record, ensure_ascii=False),
+        )
+
+    def signature(self, key):
+        """组件记录的签名 (记录数, 最大序号, 内容总长度)"""
+        with self._lock:
+            return tuple(self.conn.execute(
+                "SELECT COUNT(*), MAX(seq), TOTAL(LENGTH(data)) FROM records WHERE component_id = ?",
+                (key,)
+            ).fetchone())
+
+    def list_keys(self):
+        with self._lock:
+            rows = self.conn.execute("SELECT DISTINCT component_id FROM records").fetchall()
+        return sorted(row[0] for row in rows)
+
+    def load_records(self, key):
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT data FROM records WHERE component_id = ? ORDER BY seq", (key,)
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def append_record(self, key, record):
+        self.append_records(key, [record])
+
+    def append_records(self, key, records):
+        ensure_record_ids(records)
+        with self._lock, self.conn:
+            self.conn.executemany(
+                "INSERT INTO records (component_id, record_id, timestamp, activity, category, "
+                "actual_minutes, score, data) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [self._record_row(key, record) for record in records]
+            )
+
+    def update_record(self, key, record_id, record):
+        """按 (组件, 记录 ID) 索引定位并修改一条记录"""
+        record = dict(record, **{RECORD_ID: record_id})
+        row = self._record_row(key, record)
+        with self._lock, self.conn:
+            self.conn.execute(
+                "UPDATE records SET timestamp = ?, activity = ?, category = ?, "
+                "actual_minutes = ?, score = ?, data = ? WHERE component_id = ? AND record_id = ?",
+                row[2:] + (key, record_id)
+            )
+
+    def delete_record(self, key, record_id):
+        with self._lock, self.conn:
+            self.conn.execute(
+                "DELETE FROM records WHERE component_id = ? AND record_id = ?", (key, record_id)
+            )
+
+    def replace_records(self, key, records):
+        ensure_record_ids(records)
+        with self._lock, self.conn:
+            self.conn.execute("DELETE FROM records WHERE component_id = ?", (key,))
+            self.conn.executemany(
+                "INSERT INTO records (component_id, record_id, timestamp, activity, category, "
+                "actual_minutes, score, data) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [self._record_row(key, record) for record in records]
+            )
+
+    def delete_records(self, key):
+        with self._lock, self.conn:
+            self.conn.execute("DELETE FROM records WHERE component_id = ?", (key,))
+
+    def load_note(self, key):
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT note FROM notes WHERE component_id = ?", (key,)
+            ).fetchone()
+        return row[0].strip() if row else ""
+
+    def save_note(self, key, note):
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO notes (component_id, note) VALUES (?, ?)", (key, note)
+            )
+
+    def delete_note(self, key):
+        with self._lock, self.conn:
+            self.conn.execute("DELETE FROM notes WHERE component_id = ?", (key,))
+
+    def _trash_path(self, trash_dir, key):
+        return os.path.join(trash_dir, f"{key}.json")
+
+    def trash_components(self, keys, trash_dir):
+        """把一批组件的记录和备注导出到回收目录，再在一个事务中删除"""
+        os.makedirs(trash_dir, exist_ok=True)
+        with self._lock:
+            for key in keys:
+                note = self.conn.execute(
+                    "SELECT note FROM notes WHERE component_id = ?", (key,)
+                ).fetchone()
+                atomic_write(
+                    self._trash_path(trash_dir, key),
+                    json.dumps({'records': self.load_records(key), 'note': note[0] if note else None},
+                               ensure_ascii=False),
+                    self.fsync_policy
+                )
+            with self.conn:
+                self.conn.executemany("DELETE FROM records WHERE component_id = ?", [(key,) for key in keys])
+                self.conn.executemany("DELETE FROM notes WHERE component_id = ?", [(key,) for key in keys])
+
+    def restore_components(self, keys, trash_dir):
+        """把回收目录中导出的记录和备注写回数据库（已有记录的组件保留现有数据）"""
+        with self._lock:
+            restored = []
+            with self.conn:
+                for key in keys:
+                    path = self._trash_path(trash_dir, key)
+                    if not os.path.exists(path) or self.signature(key)[0]:
+                        continue
+                    with open(path, 'r', encoding='utf-8') as f:
+                        data = json.load(f)
+                    self.conn.executemany(
+                        "INSERT INTO records (component_id, record_id, timestamp, activity, category, "
+                        "actual_minutes, score, data) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                        [self._record_row(key, record) for record in data['records']]
+                    )
+                    if data['note'] is not None:
+                        self.conn.execute(
+                            "INSERT OR REPLACE INTO notes (component_id, note) VALUES (?, ?)", (key, data['note'])
+                        )
+                    restored.append(path)
+            for path in restored:
+                os.remove(path)
+
+    def note_signature(self, key):
+        """备注的签名 (长度, CRC32)，没有备注时返回 None"""
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT note FROM notes WHERE component_id = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        return (len(row[0]), zlib.crc32(row[0].encode('utf-8')))
+
+    def load_components(self):
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT component_id, date_str, date, summary FROM components ORDER BY position"
+            ).fetchall()
+        components_data = []
+        for row in rows:
+            comp = {'component_id': row[0], 'date_str': row[1], 'date': row[2]}
+            if row[3] is not None:
+                comp['summary'] = json.loads(row[3])
+            components_data.append(comp)
+        return components_data
+
+    def save_components(self, components_data):
+        with self._lock, self.conn:
+            self.conn.execute("DELETE FROM components")
+            self.conn.executemany(
+                "INSERT INTO components (component_id, position, date_str, date, summary) VALUES (?, ?, ?, ?, ?)",
+                [
+                    (
+                        comp['component_id'], i, comp.get('date_str'), comp.get('date'),
+                        json.dumps(comp['summary'], ensure_ascii=False) if comp.get('summary') else None
+                    )
+                    for i, comp in enumerate(components_data)
+                ]
+            )
+
+    def import_data_dir(self, data_dir):
+        """导入文件格式的数据目录（components.json、记录文件和备注文件）"""
+        components_file = os.path.join(data_dir, "components.json")
+        if os.path.exists(components_file):
+            with open(components_file, 'r', encoding='utf-8') as f:
+                self.save_components(json.load(f))
+
+        # 平铺目录和分片目录中的组件文件，按 组件键 -> {后缀: 路径} 收集
+        files = {}
+        for dirpath, dirnames, filenames in os.walk(data_dir):
+            if dirpath == data_dir:
+                dirnames[:] = [name for name in dirnames if name != TRASH_DIR]
+            for filename in filenames:
+                key = component_key(filename)
+                if key is not None:
+                    suffix = filename[len(key):]
+                    files.setdefault(key, {})[suffix] = os.path.join(dirpath, filename)
+
+        count = 0
+        for key, paths in files.items():
+            if JournalStorage.SUFFIX in paths:
+                records, _ = read_journal(paths[JournalStorage.SUFFIX])
+            elif JsonArrayStorage.SUFFIX in paths:
+                with open(paths[JsonArrayStorage.SUFFIX], 'r', encoding='utf-8') as f:
+                    records = json.load(f)
+            elif FileStorage.ARCHIVE_SUFFIX in paths:
+                records = ArchiveReader(paths[FileStorage.ARCHIVE_SUFFIX]).records()
+            else:
+                records = None
+            if records is not None:
+                self.replace_records(key, records)
+                count += 1
+            if FileStorage.NOTE_SUFFIX in paths:
+                with open(paths[FileStorage.NOTE_SUFFIX], 'r', encoding='utf-8') as f:
+                    self.save_note(key, f.read().strip())
+        return count
+
+    def category_totals(self, component_id=None):
+        """按类别汇总实际时间（分钟），可限定组件"""
+        sql = "SELECT category, SUM(actual_minutes) FROM records WHERE category IS NOT NULL"
+        params = ()
+        if component_id is not None:
+            sql += " AND component_id = ?"
+            params = (component_id,)
+        sql += " GROUP BY category"
+        with self._lock:
+            return {row[0]: row[1] or 0 for row in self.conn.execute(sql, params)}
+
+    def average_score(self, component_id=None):
+        """计算平均体验感，没有有效数据时返回 None"""
+        sql = "SELECT AVG(score) FROM records WHERE score IS NOT NULL"
+        params = ()
+        if component_id is not None:
+            sql += " AND component_id = ?"
+            params = (component_id,)
+        with self._lock:
+            return self.conn.execute(sql, params).fetchone()[0]
+
+    def find_records(self, category=None, activity=None, start=None, end=None):
+        """按类别、活动名和时间戳范围查找记录，返回 (component_id, record) 列表"""
+        conditions = []
+        params = []
+        if category is not None:
+            conditions.append("category = ?")
+            params.append(category)
+        if activity is not None:
+            conditions.append("activity = ?")
+            params.append(activity)
+        if start is not None:
+            conditions.append("timestamp >= ?")
+            params.append(start)
+        if end is not None:
+            conditions.append("timestamp < ?")
+            params.append(end)
+
+        sql = "SELECT component_id, data FROM records"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY timestamp"
+        with self._lock:
+            rows = self.conn.execute(sql, params).fetchall()
+        return [(row[0], json.loads(row[1])) for row in rows]
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+
+STORAGE_BACKENDS = {
+    'json': JsonArrayStorage,
+    'journal': JournalStorage,
+    'sqlite': SQLiteStorage,
+}
+
+
+def create_storage(backend, data_dir, fsync_policy=None):
+    """根据名称创建存储后端"""
+    if backend not in STORAGE_BACKENDS:
+        raise ValueError(f"未知的存储后端: {backend}")
+    return STORAGE_BACKENDS[backend](data_dir, fsync_policy)
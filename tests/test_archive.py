@@ -0,0 +1,130 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from archive import (CODEC_ZLIB, FOOTER, HEADER, ArchiveError, ArchiveReader, _compress, _decompress, _dumps,
+                     encode_archive, open_archive)
+from storage import FsyncPolicy, JournalStorage, sort_newest_first
+
+KEY = '20240101080000'
+
+
+def make_records():
+    # 时间戳乱序、有重复和缺失，字段不完全相同
+    stamps = ['2024-01-01 09:00:00', '2024-01-01 08:00:00', '2024-01-03 08:00:00', None,
+              '2024-01-02 08:00:00', '2024-01-01 08:00:00', '2024-01-04 08:00:00', '2024-01-02 12:00:00']
+    records = []
+    for i, stamp in enumerate(stamps):
+        record = {'活动': f'活动{i}', 'id': str(i)}
+        if stamp:
+            record['timestamp'] = stamp
+        if i % 3 == 0:
+            record['体验感'] = str(i)
+        records.append(record)
+    return records
+
+
+class ArchiveFormatTest(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.path = os.path.join(self.root, 'x.archive')
+
+    def tearDown(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def write(self, data):
+        with open(self.path, 'wb') as f:
+            f.write(data)
+
+    def test_round_trip(self):
+        records = make_records()
+        self.write(encode_archive(records, block_size=3))
+        reader = ArchiveReader(self.path)
+        self.assertEqual(len(reader), len(records))
+        self.assertEqual(len(reader.blocks), 3)
+        self.assertEqual(reader.records(), records)
+        self.assertEqual([reader.record(i) for i in range(len(records))], records)
+        # 按时间范围只解压可能相关的块
+        self.assertEqual(list(reader.iter_records(start='2024-01-04')), records[6:])
+
+        self.write(encode_archive([]))
+        self.assertEqual(ArchiveReader(self.path).records(), [])
+
+    def test_newest_first_matches_sorted_records(self):
+        records = make_records()
+        expected = sort_newest_first(list(records))
+        self.write(encode_archive(records, block_size=3))
+        self.assertEqual(list(open_archive(self.path, newest_first=True)), expected)
+        self.assertEqual(list(open_archive(self.path)), records)
+
+    def test_old_archive_without_order_falls_back_to_timestamps(self):
+        records = make_records()
+        data = encode_archive(records, block_size=3, codec=CODEC_ZLIB)
+        length, magic = FOOTER.unpack(data[-FOOTER.size:])
+        body = data[:-FOOTER.size - length]
+        directory = json.loads(_decompress(data[-FOOTER.size - length:-FOOTER.size], CODEC_ZLIB))
+        del directory['newest_first']
+        directory = _compress(_dumps(directory), CODEC_ZLIB)
+        self.write(body + directory + FOOTER.pack(len(directory), magic))
+        self.assertEqual(list(open_archive(self.path, newest_first=True)), sort_newest_first(list(records)))
+
+    def test_damaged_archive_is_rejected(self):
+        data = encode_archive(make_records())
+        self.write(data[:-1])
+        with self.assertRaises(ArchiveError):
+            ArchiveReader(self.path)
+        self.write(b"XXXX" + data[4:])
+        with self.assertRaises(ArchiveError):
+            ArchiveReader(self.path)
+        self.write(data[:HEADER.size])
+        with self.assertRaises(ArchiveError):
+            ArchiveReader(self.path)
+        self.write(b"")
+        with self.assertRaises(ArchiveError):
+            ArchiveReader(self.path)
+
+    def test_edits_stay_in_memory(self):
+        records = make_records()
+        self.write(encode_archive(records, block_size=3))
+        archived = open_archive(self.path)
+        archived.insert(0, {'活动': 'new'})
+        archived[1] = {'活动': 'changed'}
+        del archived[2]
+        self.assertEqual([r['活动'] for r in archived[:3]], ['new', 'changed', '活动2'])
+        self.assertEqual(len(archived), len(records))
+        self.assertEqual(ArchiveReader(self.path).records(), records)
+
+
+class StorageArchiveTest(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.data_dir = os.path.join(self.root, 'data')
+        os.makedirs(self.data_dir)
+        self.storage = JournalStorage(self.data_dir, FsyncPolicy('batch'))
+
+    def tearDown(self):
+        self.storage.close()
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def test_archive_then_append_unarchives(self):
+        records = make_records()
+        self.storage.append_records(KEY, records)
+        self.assertTrue(self.storage.archive(KEY))
+        self.assertFalse(self.storage.archive(KEY))
+        self.assertFalse(os.path.exists(self.storage.get_path(KEY)))
+        self.assertEqual(self.storage.list_keys(), [KEY])
+        self.assertEqual(self.storage.load_records(KEY), records)
+
+        opened = self.storage.open_records(KEY, newest_first=True)
+        self.storage.append_record(KEY, {'活动': 'new'})
+        self.assertFalse(self.storage.is_archived(KEY))
+        self.assertEqual([r['活动'] for r in self.storage.load_records(KEY)],
+                         [r['活动'] for r in records] + ['new'])
+        # 归档文件已删除，之前打开的序列仍可读取
+        self.assertEqual(list(opened), sort_newest_first(list(records)))
+
+
+if __name__ == '__main__':
+    unittest.main()
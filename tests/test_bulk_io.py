@@ -0,0 +1,107 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from bulk_io import RecordError, export_records, import_records
+from data_manager import DataManager
+
+COMPONENT = '20240101080000'
+
+
+class BulkIOTest(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.data_dir = os.path.join(self.root, 'data')
+        self.dm = DataManager(self.data_dir, fsync='batch')
+
+    def tearDown(self):
+        self.dm.close()
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def write_jsonl(self, *rows):
+        path = os.path.join(self.root, 'in.jsonl')
+        with open(path, 'w', encoding='utf-8') as f:
+            for row in rows:
+                f.write((row if isinstance(row, str) else json.dumps(row, ensure_ascii=False)) + "\n")
+        return path
+
+    def reopen(self):
+        self.dm.close()
+        self.dm = DataManager(self.data_dir, fsync='batch')
+
+    def test_import_export_round_trip(self):
+        path = self.write_jsonl(
+            {'component_id': COMPONENT, '活动': '读书', '实际时间': '30', 'timestamp': '2024-01-01 08:00:00'},
+            {'活动': '跑步', '类别': '健康', 'timestamp': '2024-01-02 08:00:00'},
+        )
+        self.assertEqual(import_records(self.dm, path, component_id='20240102080000'), (2, 0))
+        self.reopen()
+        self.assertEqual(
+            sorted(comp['component_id'] for comp in self.dm.load_components()),
+            [COMPONENT, '20240102080000']
+        )
+
+        out = os.path.join(self.root, 'out.csv')
+        self.assertEqual(export_records(self.dm, out), 2)
+        self.reopen()
+        self.assertEqual(import_records(self.dm, out), (2, 0))
+        self.assertEqual([r['活动'] for r in self.dm.load_component_records(COMPONENT)], ['读书', '读书'])
+
+    def test_invalid_rows_are_skipped(self):
+        path = self.write_jsonl(
+            '5',
+            '[1]',
+            '{bad',
+            {'component_id': '../x', '活动': 'a'},
+            {'component_id': 'misc', '活动': 'a'},
+            {'component_id': COMPONENT, '活动': ''},
+            {'component_id': COMPONENT, '活动': 'a', '体验感': '11'},
+            {'component_id': COMPONENT, '活动': 'ok'},
+        )
+        self.assertEqual(import_records(self.dm, path), (1, 7))
+        self.assertFalse(os.path.exists(os.path.join(self.root, 'x')))
+
+    def test_invalid_component_option_is_rejected(self):
+        path = self.write_jsonl({'活动': 'a'})
+        with self.assertRaises(RecordError):
+            import_records(self.dm, path, component_id='../../x')
+
+    def test_strict_abort_registers_written_batches(self):
+        path = self.write_jsonl(
+            {'component_id': COMPONENT, '活动': 'a'},
+            {'component_id': COMPONENT, '活动': 'b'},
+            {'component_id': '20240102080000', '活动': 'c'},
+            {'component_id': COMPONENT, '活动': ''},
+        )
+        with self.assertRaises(RecordError):
+            import_records(self.dm, path, batch_size=2, strict=True)
+        self.reopen()
+        self.assertEqual([comp['component_id'] for comp in self.dm.load_components()], [COMPONENT])
+        self.assertEqual(len(self.dm.load_component_records(COMPONENT)), 2)
+
+    def test_export_time_range(self):
+        path = self.write_jsonl(*(
+            {'component_id': COMPONENT, '活动': str(hour), 'timestamp': f'2024-05-0{day} {hour:02d}:00:00'}
+            for day in (2, 3) for hour in (8, 13)
+        ))
+        import_records(self.dm, path)
+        out = os.path.join(self.root, 'out.jsonl')
+
+        def exported(start=None, end=None):
+            export_records(self.dm, out, start=start, end=end)
+            with open(out, 'r', encoding='utf-8') as f:
+                return [json.loads(line)['timestamp'] for line in f]
+
+        self.assertEqual(exported(end='2024-05-03T12:00'), [
+            '2024-05-02 08:00:00', '2024-05-02 13:00:00', '2024-05-03 08:00:00'
+        ])
+        self.assertEqual(exported(start='2024-05-02 13:00', end='2024-05-03'), ['2024-05-02 13:00:00'])
+        self.assertEqual(exported(start='2024-05-03'), ['2024-05-03 08:00:00', '2024-05-03 13:00:00'])
+        with self.assertRaises(RecordError):
+            exported(end='May 3')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+from data_manager import DataManager
+
+
+class LoadNoteAsyncTest(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.data_dir = os.path.join(self.root, 'data')
+
+    def tearDown(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def test_uncached_note_is_read_in_background(self):
+        dm = DataManager(self.data_dir)
+        dm.storage.save_note('20240101', "备注内容")
+        dm.close()
+
+        dm = DataManager(self.data_dir)
+        try:
+            self.assertNotIn('20240101', dm.notes)
+            loaded = threading.Event()
+            notes = []
+
+            def callback(note):
+                notes.append(note)
+                loaded.set()
+
+            dm.load_note_async('20240101', callback)
+            self.assertTrue(loaded.wait(5))
+            self.assertEqual(notes, ["备注内容"])
+            self.assertEqual(dm.notes['20240101'], "备注内容")
+        finally:
+            dm.close()
+
+
+class BackgroundNoteReadTest(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.dm = DataManager(os.path.join(self.root, 'data'))
+        # 延迟写入在测试期间不会自己到期
+        self.dm.write_buffer.delay = 60
+
+    def tearDown(self):
+        self.dm.close()
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def in_worker(self, func, *args):
+        return self.dm.io.submit_read('test', func, *args).result(5)
+
+    def test_read_current_note_sees_pending_edit(self):
+        self.dm.save_note('20240101080000', "刚改的备注")
+        self.dm.notes.clear()
+        self.assertEqual(self.in_worker(self.dm.read_current_note, '20240101080000'), "刚改的备注")
+        self.assertEqual(self.dm.notes, {})
+
+    def test_background_search_finds_pending_note_without_touching_caches(self):
+        self.dm.append_component_record('20240101080000', {'活动': '读书'})
+        self.dm.flush()
+        self.dm.save_note('20240101080000', "备注里的关键词")
+        self.dm.notes.clear()
+        hits = self.in_worker(self.dm.search, "关键词", 50, frozenset())
+        self.assertEqual([component_id for component_id, _ in hits], ['20240101080000'])
+        self.assertEqual(self.dm.notes, {})
+
+    def test_prefetch_reads_pending_note_edit(self):
+        self.dm.append_component_record('20240101080000', {'活动': '读书'})
+        self.dm.save_note('20240101080000', "刚改的备注")
+        self.dm.notes.clear()
+        task = self.dm.prefetch_component('20240101080000')
+        records, note = task.future.result(5)
+        self.assertEqual(note, "刚改的备注")
+
+
+class RestoreComponentsTest(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.dm = DataManager(os.path.join(self.root, 'data'))
+
+    def tearDown(self):
+        self.dm.close()
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def test_restore_runs_after_queued_writes_without_blocking(self):
+        self.dm.append_component_record('20240101080000', {'活动': '读书'})
+        self.dm.flush()
+        comp = {'component_id': '20240101080000', 'date_str': '2024-01-01', 'date': '2024-01-01 08:00:00'}
+        self.dm.registry.register(comp)
+        batch_id = self.dm.delete_components(['20240101080000'])
+
+        # 撤销排在一个还没完成的写入之后，调用本身不等待
+        release = threading.Event()
+        self.dm.io.submit_write('slow', release.wait, 5)
+        restored = threading.Event()
+        self.dm.restore_components(batch_id, [comp], callback=restored.set)
+        self.assertFalse(restored.is_set())
+        self.assertIsNone(self.dm.registry.get('20240101080000'))
+
+        release.set()
+        self.assertTrue(restored.wait(5))
+        self.assertIsNotNone(self.dm.registry.get('20240101080000'))
+        self.assertEqual([r['活动'] for r in self.dm.load_component_records('20240101080000')], ['读书'])
+        self.dm.flush()
+        self.assertFalse(os.path.exists(self.dm.trash_path(batch_id)))
+
+
+if __name__ == '__main__':
+    unittest.main()
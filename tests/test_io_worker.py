@@ -0,0 +1,50 @@
+import threading
+import unittest
+
+from io_worker import IOWorker
+
+
+class IOWorkerTest(unittest.TestCase):
+    def setUp(self):
+        self.io = IOWorker()
+
+    def tearDown(self):
+        self.io.shutdown()
+
+    def wait_for(self, submit):
+        done = threading.Event()
+        results = []
+
+        def deliver(kind):
+            def callback(value):
+                results.append((kind, value))
+                done.set()
+            return callback
+
+        submit(deliver('ok'), deliver('error'))
+        self.assertTrue(done.wait(5))
+        return results
+
+    def test_callback_receives_result(self):
+        results = self.wait_for(lambda ok, error: self.io.submit_read('k', lambda: 42, callback=ok, errback=error))
+        self.assertEqual(results, [('ok', 42)])
+
+    def test_errback_receives_exception(self):
+        def fail():
+            raise OSError("磁盘错误")
+
+        results = self.wait_for(lambda ok, error: self.io.submit_read('k', fail, callback=ok, errback=error))
+        self.assertEqual(len(results), 1)
+        kind, value = results[0]
+        self.assertEqual(kind, 'error')
+        self.assertIsInstance(value, OSError)
+
+    def test_reads_wait_for_earlier_writes_to_the_same_key(self):
+        written = []
+        self.io.submit_write('k', written.append, 1)
+        results = self.wait_for(lambda ok, error: self.io.submit_read('k', lambda: list(written), callback=ok))
+        self.assertEqual(results, [('ok', [1])])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from storage import FsyncPolicy, JournalStorage, read_journal
+
+KEY = '20240101080000'
+
+
+class JournalStorageTest(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.data_dir = os.path.join(self.root, 'data')
+        os.makedirs(self.data_dir)
+        self.storage = self.open_storage()
+
+    def tearDown(self):
+        self.storage.close()
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def open_storage(self):
+        return JournalStorage(self.data_dir, FsyncPolicy('batch'))
+
+    def reopen(self):
+        self.storage.close()
+        self.storage = self.open_storage()
+
+    def activities(self):
+        return [r['活动'] for r in self.storage.load_records(KEY)]
+
+    def test_update_and_delete_are_replayed_by_id(self):
+        self.storage.append_records(KEY, [{'活动': 'a'}, {'活动': 'b'}, {'活动': 'c'}])
+        a, b, c = self.storage.load_records(KEY)
+        self.storage.update_record(KEY, b['id'], {'活动': 'B'})
+        self.storage.delete_record(KEY, a['id'])
+        # 已删除的记录上的操作被忽略
+        self.storage.update_record(KEY, a['id'], {'活动': 'A'})
+        self.reopen()
+        records = self.storage.load_records(KEY)
+        self.assertEqual([r['活动'] for r in records], ['B', 'c'])
+        self.assertEqual([r['id'] for r in records], [b['id'], c['id']])
+        self.assertEqual(self.storage.manifest.entries[KEY]['count'], 2)
+
+    def test_old_operation_lines_are_matched_by_timestamp(self):
+        path = self.storage.get_path(KEY)
+        os.makedirs(os.path.dirname(path))
+        lines = [
+            {'活动': 'a', 'timestamp': '2024-01-01 08:00:00'},
+            {'活动': 'b', 'timestamp': '2024-01-01 09:00:00'},
+            {'_op': 'update', 'timestamp': '2024-01-01 08:00:00', 'record': {'活动': 'A', 'timestamp': '2024-01-01 08:00:00'}},
+            {'_op': 'delete', 'timestamp': '2024-01-01 09:00:00'},
+        ]
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write("".join(json.dumps(line, ensure_ascii=False) + "\n" for line in lines))
+        self.assertEqual(read_journal(path)[0], [{'活动': 'A', 'timestamp': '2024-01-01 08:00:00'}])
+
+        # 第一次完整读取时分配 ID 并压缩写回
+        self.reopen()
+        records = self.storage.load_records(KEY)
+        self.assertEqual([r['活动'] for r in records], ['A'])
+        self.assertEqual(read_journal(path), (records, 1))
+
+    def test_compaction_keeps_only_live_records(self):
+        self.storage.append_records(KEY, [{'活动': str(i)} for i in range(3)])
+        first = self.storage.load_records(KEY)[0]
+        for i in range(JournalStorage.COMPACT_MIN_DEAD):
+            self.storage.update_record(KEY, first['id'], {'活动': f'x{i}'})
+        self.assertEqual(read_journal(self.storage.get_path(KEY))[1], 3 + JournalStorage.COMPACT_MIN_DEAD)
+
+        # 失效行超过阈值，下一次追加触发压缩
+        self.storage.update_record(KEY, first['id'], {'活动': 'last'})
+        records, lines = read_journal(self.storage.get_path(KEY))
+        self.assertEqual(lines, 3)
+        self.assertEqual([r['活动'] for r in records], ['last', '1', '2'])
+        self.assertEqual(records[0]['id'], first['id'])
+
+    def test_legacy_json_array_is_migrated_once(self):
+        legacy = [{'活动': 'a'}, {'活动': 'b', 'id': 'kept'}]
+        with open(os.path.join(self.data_dir, f"{KEY}.json"), 'w', encoding='utf-8') as f:
+            json.dump(legacy, f, ensure_ascii=False)
+        self.reopen()
+        self.assertEqual(self.storage.list_keys(), [KEY])
+
+        records = self.storage.load_records(KEY)
+        self.assertEqual([r['活动'] for r in records], ['a', 'b'])
+        self.assertEqual(records[1]['id'], 'kept')
+        self.assertTrue(records[0]['id'])
+        legacy_path = self.storage.get_legacy_path(KEY)
+        self.assertFalse(os.path.exists(legacy_path))
+        self.assertTrue(os.path.exists(legacy_path + ".bak"))
+        self.assertFalse(self.storage.migrate(KEY))
+
+        # 迁移后的日志可以继续追加，ID 保持不变
+        self.storage.append_record(KEY, {'活动': 'c'})
+        self.reopen()
+        self.assertEqual(self.activities(), ['a', 'b', 'c'])
+        self.assertEqual(self.storage.load_records(KEY)[0]['id'], records[0]['id'])
+
+
+if __name__ == '__main__':
+    unittest.main()
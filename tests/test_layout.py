@@ -0,0 +1,103 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from storage import SESSION_FILE, FsyncPolicy, JournalStorage, Manifest, shard_parts
+
+KEY = '20240101080000'
+
+
+class ShardLayoutTest(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.data_dir = os.path.join(self.root, 'data')
+        os.makedirs(self.data_dir)
+        self.storage = self.open_storage()
+
+    def tearDown(self):
+        self.storage.close()
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def open_storage(self):
+        return JournalStorage(self.data_dir, FsyncPolicy('batch'))
+
+    def reopen(self):
+        self.storage.close()
+        self.storage = self.open_storage()
+
+    def read_manifest(self):
+        with open(os.path.join(self.data_dir, Manifest.FILE_NAME), 'r', encoding='utf-8') as f:
+            return json.load(f)['components']
+
+    def write_flat(self, key, records):
+        with open(os.path.join(self.data_dir, f"{key}.jsonl"), 'w', encoding='utf-8') as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def test_shard_parts(self):
+        self.assertEqual(shard_parts(KEY), ('2024', '01', KEY))
+        self.assertEqual(shard_parts('20240101'), ('2024', '01', '20240101'))
+        self.assertEqual(shard_parts('misc_key'), ('misc', 'misc_key'))
+
+    def test_new_component_is_sharded_and_listed_from_manifest(self):
+        self.storage.append_records(KEY, [{'活动': 'a'}, {'活动': 'b'}])
+        self.storage.save_note(KEY, "备注")
+        directory = os.path.join(self.data_dir, '2024', '01', KEY)
+        self.assertEqual(sorted(os.listdir(directory)), [f"{KEY}.jsonl", f"{KEY}_note.txt"])
+        self.reopen()
+        entry = self.read_manifest()[KEY]
+        self.assertEqual(entry['count'], 2)
+        self.assertEqual(entry['size'], os.path.getsize(self.storage.get_path(KEY)))
+        self.assertEqual(entry['created'], '2024-01-01 08:00:00')
+        self.assertEqual(self.storage.list_keys(), [KEY])
+
+        # 文件全部删除后清单项和空的分片目录一起移除
+        self.storage.delete_records(KEY)
+        self.storage.delete_note(KEY)
+        self.assertFalse(os.path.exists(directory))
+        self.reopen()
+        self.assertEqual(self.read_manifest(), {})
+
+    def test_flat_files_migrate_in_batches(self):
+        keys = ['20240101080000', '20240215080000', 'other']
+        for key in keys:
+            self.write_flat(key, [{'活动': key, 'id': key}])
+        self.reopen()
+        self.assertEqual(self.storage.pending_layout_migration(), 3)
+        self.assertEqual(self.storage.list_keys(), sorted(keys))
+
+        self.assertEqual(self.storage.migrate_layout(limit=1), 2)
+        # 迁移中途两种位置的组件都可以读写
+        for key in keys:
+            self.storage.append_record(key, {'活动': 'more'})
+        self.reopen()
+        self.assertEqual(self.storage.pending_layout_migration(), 2)
+        self.assertEqual(self.storage.migrate_layout(), 0)
+        self.reopen()
+        self.assertEqual(self.storage.pending_layout_migration(), 0)
+        for key in keys:
+            self.assertEqual(os.path.dirname(self.storage.get_path(key)),
+                             os.path.join(self.data_dir, *shard_parts(key)))
+            self.assertEqual([r['活动'] for r in self.storage.load_records(key)], [key, 'more'])
+        self.assertFalse([name for name in os.listdir(self.data_dir) if name.endswith('.jsonl')])
+
+    def test_unclean_exit_rebuilds_manifest_from_files(self):
+        self.storage.append_record(KEY, {'活动': 'a'})
+        self.reopen()
+        # 清单保存之后又写入了文件，随后异常退出（会话标记还在）
+        other = '20240301080000'
+        directory = os.path.join(self.data_dir, *shard_parts(other))
+        os.makedirs(directory)
+        with open(os.path.join(directory, f"{other}.jsonl"), 'w', encoding='utf-8') as f:
+            f.write(json.dumps({'活动': 'b', 'id': '1'}, ensure_ascii=False) + "\n")
+        os.remove(self.storage.get_path(KEY))
+        self.assertTrue(os.path.exists(os.path.join(self.data_dir, SESSION_FILE)))
+        self.storage = self.open_storage()
+        self.assertEqual(self.storage.list_keys(), [other])
+        self.assertEqual([r['活动'] for r in self.storage.load_records(other)], ['b'])
+
+
+if __name__ == '__main__':
+    unittest.main()
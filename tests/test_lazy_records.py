@@ -0,0 +1,90 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from lazy_records import open_journal, scan_journal
+from storage import FsyncPolicy, JournalStorage, read_journal
+
+
+def journal(*entries):
+    return "".join(
+        (entry if isinstance(entry, str) else json.dumps(entry, ensure_ascii=False)) + "\n"
+        for entry in entries
+    )
+
+
+class LazyRecordsTest(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def write(self, content):
+        path = os.path.join(self.root, 'x.jsonl')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        return path
+
+    def assertSameAsReplay(self, path):
+        records = open_journal(path)
+        replayed, _ = read_journal(path)
+        self.assertEqual(list(records), replayed)
+        self.assertEqual([records[i] for i in range(len(records))], replayed)
+        return records
+
+    def test_update_and_delete_ops(self):
+        path = self.write(journal(
+            {'活动': 'a', 'timestamp': '2024-01-01 08:00:00', 'id': '1'},
+            {'活动': 'b', 'timestamp': '2024-01-01 09:00:00', 'id': '2'},
+            {'活动': 'c', 'timestamp': '2024-01-01 10:00:00', 'id': '3'},
+            {'_op': 'update', 'id': '1', 'record': {'活动': 'a2', 'timestamp': '2024-01-01 11:00:00'}},
+            {'_op': 'delete', 'id': '2'},
+            {'_op': 'delete', 'id': 'missing'},
+        ))
+        records = self.assertSameAsReplay(path)
+        self.assertEqual([r['活动'] for r in records], ['a2', 'c'])
+        newest = open_journal(path, newest_first=True)
+        self.assertEqual([r['活动'] for r in newest], ['a2', 'c'])
+
+    def test_newest_first_keeps_order_of_equal_timestamps(self):
+        path = self.write(journal(
+            {'活动': 'a', 'timestamp': '2024-01-01 08:00:00', 'id': '1'},
+            {'活动': 'b', 'timestamp': '2024-01-01 09:00:00', 'id': '2'},
+            {'活动': 'c', 'timestamp': '2024-01-01 09:00:00', 'id': '3'},
+        ))
+        self.assertEqual([r['活动'] for r in open_journal(path, newest_first=True)], ['b', 'c', 'a'])
+
+    def test_old_format_falls_back_to_replay(self):
+        path = self.write(journal({'活动': 'a', 'id': '1'}, {'活动': 'b'}))
+        self.assertIsNone(open_journal(path))
+        self.assertIsNone(scan_journal(journal({'_op': 'delete', 'timestamp': 'x'}).encode('utf-8')))
+
+    def test_torn_lines_are_skipped(self):
+        path = self.write(journal(
+            {'活动': 'a', 'id': '1'},
+            '{"活动": "torn", "id": "y',
+            '{"活动": "torn2", "id": "y{"活动": "glued", "id": "2"}',
+            {'活动': 'b', 'nested': {'k': 1}, 'id': '3'},
+        ) + '{"活动": "tail", "id": "4"')
+        records = self.assertSameAsReplay(path)
+        self.assertEqual([r['活动'] for r in records], ['a', 'b'])
+
+    def test_append_after_torn_tail_starts_a_new_line(self):
+        data_dir = os.path.join(self.root, 'data')
+        os.makedirs(data_dir)
+        storage = JournalStorage(data_dir, FsyncPolicy('batch'))
+        storage.append_record('20240101080000', {'活动': 'a'})
+        path = storage.get_path('20240101080000')
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write('{"活动": "torn", "id": "y')
+        storage.append_record('20240101080000', {'活动': 'b'})
+        self.assertEqual([r['活动'] for r in storage.open_records('20240101080000')], ['a', 'b'])
+        self.assertEqual([r['活动'] for r in storage.load_records('20240101080000')], ['a', 'b'])
+        storage.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
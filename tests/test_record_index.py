@@ -0,0 +1,75 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from record_index import RecordIndex
+from storage import FsyncPolicy, JournalStorage
+
+KEY = '20240101080000'
+OTHER = '20240102080000'
+
+
+class RecordIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.data_dir = os.path.join(self.root, 'data')
+        os.makedirs(self.data_dir)
+        self.storage = JournalStorage(self.data_dir, FsyncPolicy('batch'))
+        self.storage.append_records(KEY, [
+            {'活动': '读书', '类别': '学习', 'timestamp': '2024-01-01 08:00:00'},
+            {'活动': ' 跑步 ', '类别': '健康', 'timestamp': '2024-01-01 09:00:00'},
+        ])
+        self.storage.append_records(OTHER, [{'活动': 'Piano', '类别': '学习', 'timestamp': '2024-01-02 08:00:00'}])
+        self.loaded = []
+
+    def tearDown(self):
+        self.storage.close()
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def load_records(self, component_id):
+        self.loaded.append(component_id)
+        return self.storage.load_records(component_id)
+
+    def open_index(self):
+        index = RecordIndex(self.data_dir, self.storage)
+        index.verify_all(self.load_records)
+        return index
+
+    def test_index_is_reused_while_signatures_match(self):
+        index = self.open_index()
+        self.assertEqual(index.lookup(category='学习'), {KEY: [0], OTHER: [0]})
+        self.assertEqual(index.lookup(activity='跑步', date='2024-01-01'), {KEY: [1]})
+        self.assertEqual(index.lookup(activity='ｐｉａｎｏ'), {OTHER: [0]})
+        self.assertEqual(index.lookup(start='2024-01-02'), {OTHER: [0]})
+        self.assertEqual(index.dates(), ['2024-01-01', '2024-01-02'])
+        index.save()
+
+        self.loaded.clear()
+        self.open_index()
+        self.assertEqual(self.loaded, [])
+
+    def test_stale_signature_triggers_rebuild(self):
+        self.open_index().save()
+        # 绕过索引直接修改记录文件（例如另一个进程写入）
+        self.storage.append_record(OTHER, {'活动': '读书', '类别': '学习', 'timestamp': '2024-01-03 08:00:00'})
+        self.storage.delete_records(KEY)
+
+        self.loaded.clear()
+        index = self.open_index()
+        self.assertEqual(self.loaded, [OTHER])
+        self.assertEqual(index.lookup(activity='读书'), {OTHER: [1]})
+        self.assertEqual(index.dates(), ['2024-01-02', '2024-01-03'])
+
+    def test_damaged_index_file_is_rebuilt(self):
+        self.open_index().save()
+        with open(os.path.join(self.data_dir, RecordIndex.FILE_NAME), 'w', encoding='utf-8') as f:
+            f.write('{"version": 2, "components": {')
+        self.loaded.clear()
+        index = self.open_index()
+        self.assertEqual(sorted(self.loaded), [KEY, OTHER])
+        self.assertEqual(index.lookup(category='健康'), {KEY: [1]})
+
+
+if __name__ == '__main__':
+    unittest.main()
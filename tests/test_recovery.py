@@ -0,0 +1,93 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from storage import SESSION_FILE, TMP_SUFFIX, FsyncPolicy, JournalStorage, atomic_write, repair_journal_tail
+
+KEY = '20240101080000'
+
+
+class RecoveryTest(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.data_dir = os.path.join(self.root, 'data')
+        os.makedirs(self.data_dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def open_storage(self):
+        return JournalStorage(self.data_dir, FsyncPolicy('batch'))
+
+    def read(self, path):
+        with open(path, 'r', encoding='utf-8') as f:
+            return f.read()
+
+    def test_atomic_write_replaces_without_leaving_temp_file(self):
+        path = os.path.join(self.root, 'note.txt')
+        atomic_write(path, "旧内容")
+        atomic_write(path, "新内容")
+        self.assertEqual(self.read(path), "新内容")
+        atomic_write(path, b"\x00\x01")
+        with open(path, 'rb') as f:
+            self.assertEqual(f.read(), b"\x00\x01")
+        self.assertFalse(os.path.exists(path + TMP_SUFFIX))
+
+    def test_repair_journal_tail(self):
+        path = os.path.join(self.root, 'x.jsonl')
+        whole = json.dumps({'活动': 'a', 'id': '1'}, ensure_ascii=False) + "\n"
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(whole)
+        self.assertFalse(repair_journal_tail(path))
+
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write('{"活动": "torn", "id": "y')
+        self.assertTrue(repair_journal_tail(path))
+        self.assertEqual(self.read(path), whole)
+
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write('{"活动": "b", "id": "2"}')
+        self.assertTrue(repair_journal_tail(path))
+        self.assertEqual(self.read(path), whole + '{"活动": "b", "id": "2"}\n')
+
+    def test_unclean_exit_cleans_temp_files_and_torn_tails(self):
+        storage = self.open_storage()
+        storage.append_record(KEY, {'活动': 'a'})
+        path = storage.get_path(KEY)
+        storage.close()
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write('{"活动": "torn", "id": "y')
+        with open(path + TMP_SUFFIX, 'w') as f:
+            f.write("half")
+        open(os.path.join(self.data_dir, SESSION_FILE), 'w').close()
+
+        storage = self.open_storage()
+        self.assertEqual(sorted(storage.recover()), sorted([os.path.basename(path), os.path.basename(path) + TMP_SUFFIX]))
+        self.assertFalse(os.path.exists(path + TMP_SUFFIX))
+        self.assertTrue(self.read(path).endswith("}\n"))
+        storage.close()
+        self.assertFalse(os.path.exists(os.path.join(self.data_dir, SESSION_FILE)))
+
+    def test_first_append_repairs_torn_tail_without_session_marker(self):
+        storage = self.open_storage()
+        storage.append_record(KEY, {'活动': 'a'})
+        path = storage.get_path(KEY)
+        storage.close()
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write('{"活动": "torn", "id": "y')
+
+        # 另一个进程正常关闭删掉了会话标记：启动时不扫描目录
+        storage = self.open_storage()
+        self.assertEqual(storage.recover(), [])
+        records = storage.open_records(KEY)
+        storage.append_record(KEY, {'活动': 'b'})
+        self.assertNotIn("torn", self.read(path))
+        self.assertEqual([r['活动'] for r in records], ['a'])
+        self.assertEqual([r['活动'] for r in storage.load_records(KEY)], ['a', 'b'])
+        storage.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
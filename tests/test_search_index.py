@@ -0,0 +1,75 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from search_index import SearchIndex
+from storage import FsyncPolicy, JournalStorage
+
+KEY = '20240101080000'
+OTHER = '20240102080000'
+
+
+class SearchIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.data_dir = os.path.join(self.root, 'data')
+        os.makedirs(self.data_dir)
+        self.storage = JournalStorage(self.data_dir, FsyncPolicy('batch'))
+        self.storage.append_records(KEY, [{'活动': '练习钢琴', '优化建议': 'practice scales'}])
+        self.storage.append_records(OTHER, [{'活动': '读书'}])
+        self.storage.save_note(OTHER, "读完第三章")
+        self.loaded = []
+
+    def tearDown(self):
+        self.storage.close()
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def load_records(self, component_id):
+        self.loaded.append(component_id)
+        return self.storage.load_records(component_id)
+
+    def open_index(self):
+        index = SearchIndex(self.data_dir, self.storage)
+        index.verify_all(self.storage.list_keys(), self.load_records, self.storage.load_note)
+        return index
+
+    def hits(self, index, query):
+        return [component_id for component_id, _ in index.search(query)]
+
+    def test_index_is_reused_while_signatures_match(self):
+        index = self.open_index()
+        self.assertEqual(self.hits(index, "钢琴"), [KEY])
+        self.assertEqual(self.hits(index, "Practice"), [KEY])
+        self.assertEqual(self.hits(index, "第三章"), [OTHER])
+        self.assertEqual(self.hits(index, "钢琴 读书"), [])
+        index.save()
+
+        self.loaded.clear()
+        index = self.open_index()
+        self.assertEqual(self.loaded, [])
+        self.assertEqual(self.hits(index, "scales"), [KEY])
+
+    def test_stale_record_or_note_signature_triggers_rebuild(self):
+        self.open_index().save()
+        # 绕过索引直接修改记录和备注文件
+        self.storage.append_record(KEY, {'活动': '游泳'})
+        self.storage.save_note(OTHER, "读完第四章和第五章")
+
+        self.loaded.clear()
+        index = self.open_index()
+        self.assertEqual(sorted(self.loaded), [KEY, OTHER])
+        self.assertEqual(self.hits(index, "游泳"), [KEY])
+        self.assertEqual(self.hits(index, "第四章"), [OTHER])
+        self.assertEqual(self.hits(index, "第三章"), [])
+
+    def test_removed_component_is_dropped(self):
+        self.open_index().save()
+        self.storage.delete_records(KEY)
+        index = self.open_index()
+        self.assertEqual(self.hits(index, "钢琴"), [])
+        self.assertEqual(self.hits(index, "读书"), [OTHER])
+
+
+if __name__ == '__main__':
+    unittest.main()
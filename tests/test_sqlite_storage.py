@@ -0,0 +1,114 @@
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+from storage import FsyncPolicy, JournalStorage, SQLiteStorage
+
+KEY = '20240101080000'
+
+
+class SQLiteStorageTest(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.data_dir = os.path.join(self.root, 'data')
+        os.makedirs(self.data_dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def open_storage(self):
+        return SQLiteStorage(self.data_dir, FsyncPolicy('batch'))
+
+    def test_first_open_imports_file_data(self):
+        journal = JournalStorage(self.data_dir, FsyncPolicy('batch'))
+        journal.append_records(KEY, [{'活动': 'a'}, {'活动': 'b'}])
+        records = journal.load_records(KEY)
+        journal.delete_record(KEY, records[0]['id'])
+        journal.save_note(KEY, "备注")
+        journal.save_components([{'component_id': KEY, 'date_str': '2024-01-01', 'date': '2024-01-01 08:00:00'}])
+        journal.close()
+
+        storage = self.open_storage()
+        try:
+            self.assertEqual(storage.list_keys(), [KEY])
+            self.assertEqual(storage.load_records(KEY), records[1:])
+            self.assertEqual(storage.load_note(KEY), "备注")
+            self.assertEqual([comp['component_id'] for comp in storage.load_components()], [KEY])
+        finally:
+            storage.close()
+
+    def test_records_are_edited_by_id_and_persist(self):
+        storage = self.open_storage()
+        storage.append_records(KEY, [
+            {'活动': 'a', '类别': '学习', '实际时间': '30', '体验感': '8', 'timestamp': '2024-01-01 08:00:00'},
+            {'活动': 'b', '类别': '健康', '实际时间': '', '体验感': '6', 'timestamp': '2024-01-01 09:00:00'},
+            {'活动': 'c', '类别': '学习', '实际时间': '15', 'timestamp': '2024-01-02 08:00:00'},
+        ])
+        a, b, c = storage.load_records(KEY)
+        signature = storage.signature(KEY)
+        storage.update_record(KEY, b['id'], {'活动': 'B', '类别': '学习', '实际时间': '45', '体验感': '6',
+                                             'timestamp': '2024-01-01 09:00:00'})
+        storage.delete_record(KEY, a['id'])
+        self.assertNotEqual(storage.signature(KEY), signature)
+        storage.close()
+
+        storage = self.open_storage()
+        try:
+            records = storage.load_records(KEY)
+            self.assertEqual([r['活动'] for r in records], ['B', 'c'])
+            self.assertEqual(records[0]['id'], b['id'])
+            self.assertEqual(storage.category_totals(), {'学习': 60})
+            self.assertEqual(storage.average_score(KEY), 6)
+            self.assertEqual(
+                [r['活动'] for _, r in storage.find_records(category='学习', end='2024-01-02')], ['B']
+            )
+        finally:
+            storage.close()
+
+    def test_trash_and_restore(self):
+        storage = self.open_storage()
+        try:
+            storage.append_records(KEY, [{'活动': 'a'}])
+            storage.save_note(KEY, "备注")
+            records = storage.load_records(KEY)
+            trash_dir = os.path.join(self.root, 'trash')
+            storage.trash_components([KEY], trash_dir)
+            self.assertEqual(storage.load_records(KEY), [])
+            self.assertEqual(storage.load_note(KEY), "")
+
+            storage.restore_components([KEY], trash_dir)
+            self.assertEqual(storage.load_records(KEY), records)
+            self.assertEqual(storage.load_note(KEY), "备注")
+            self.assertEqual(os.listdir(trash_dir), [])
+        finally:
+            storage.close()
+
+    def test_old_database_gets_record_ids(self):
+        conn = sqlite3.connect(os.path.join(self.data_dir, SQLiteStorage.DB_NAME))
+        conn.executescript("""
+            CREATE TABLE components (component_id TEXT PRIMARY KEY, position INTEGER NOT NULL,
+                                     date_str TEXT, date TEXT);
+            CREATE TABLE records (seq INTEGER PRIMARY KEY AUTOINCREMENT, component_id TEXT NOT NULL,
+                                  timestamp TEXT, activity TEXT, category TEXT, actual_minutes INTEGER,
+                                  score REAL, data TEXT NOT NULL);
+        """)
+        conn.execute("INSERT INTO records (component_id, data) VALUES (?, ?)",
+                     (KEY, json.dumps({'活动': 'a'}, ensure_ascii=False)))
+        conn.commit()
+        conn.close()
+
+        storage = self.open_storage()
+        try:
+            record, = storage.load_records(KEY)
+            self.assertTrue(record['id'])
+            storage.update_record(KEY, record['id'], {'活动': 'A'})
+            self.assertEqual(storage.load_records(KEY), [{'活动': 'A', 'id': record['id']}])
+        finally:
+            storage.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
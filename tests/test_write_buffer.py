@@ -0,0 +1,60 @@
+import unittest
+
+from io_worker import IOWorker
+from write_buffer import WriteBuffer
+
+
+class WriteBufferTest(unittest.TestCase):
+    def setUp(self):
+        self.io = IOWorker()
+        self.buffer = WriteBuffer(self.io, delay=60)
+        self.disk = {}
+        self.fail = False
+
+    def tearDown(self):
+        self.io.shutdown()
+
+    def write(self, key, value):
+        if self.fail:
+            raise OSError("磁盘已满")
+        self.disk[key] = value
+
+    def put(self, value):
+        return self.buffer.put('k', value, self.write, 'k', value)
+
+    def flush(self):
+        self.buffer.flush()
+        self.io.flush()
+
+    def test_unchanged_content_is_skipped(self):
+        self.assertTrue(self.put("a"))
+        self.assertTrue(self.put("b"))
+        self.flush()
+        self.assertEqual(self.disk, {'k': "b"})
+        self.assertFalse(self.put("b"))
+        self.buffer.remember('k', "c")
+        self.assertFalse(self.put("c"))
+
+    def test_failed_write_is_retried_on_next_save(self):
+        self.fail = True
+        self.put("a")
+        self.flush()
+        self.assertEqual(self.disk, {})
+        self.fail = False
+        self.assertTrue(self.put("a"))
+        self.flush()
+        self.assertEqual(self.disk, {'k': "a"})
+
+    def test_reverting_while_write_is_in_flight_is_not_skipped(self):
+        self.put("a")
+        self.flush()
+        self.put("b")
+        self.buffer.flush()
+        # "b" 已提交但可能还没写完，改回 "a" 仍然需要写入
+        self.assertTrue(self.put("a"))
+        self.flush()
+        self.assertEqual(self.disk, {'k': "a"})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,268 @@
+import bisect
+from instrumentation import metrics
+from archive import ArchiveRecords
+from lazy_records import LazyRecords
+
+# 按需解码的记录序列，直接使用而不复制成列表
+LAZY_SEQUENCES = (LazyRecords, ArchiveRecords)
+
+
+class VirtualList:
+    """画布上的虚拟列表：只为可见范围内的条目创建行控件，离开视野的行回收复用
+
+    create_row() 返回一个包含 'frame'（画布的子控件）的字典，
+    bind_row(row, item) 把行控件填充为指定条目。uniform=True 时所有行
+    高度相同，只测量一次；否则每次绑定后按实际高度修正布局。
+    条目可以是按需解码的 LazyRecords 或 ArchiveRecords，列表只访问可见范围内的条目。
+
+    drawn=True 时行不是控件，而是画布上共用一个标签的一组图元：create_row()
+    返回的字典中有 'tag'（以及空行的 'height'），bind_row() 以 (0, 0) 为原点
+    按 row['width'] 绘制并把高度写入 row['height']，列表负责移动和显示隐藏。
+    """
+
+    def __init__(self, canvas, scrollbar, create_row, bind_row, key=id, uniform=True, x=10, spacing=10,
+                 drawn=False):
+        self.canvas = canvas
+        self.scrollbar = scrollbar
+        self.create_row = create_row
+        self.bind_row = bind_row
+        self.key = key
+        self.uniform = uniform
+        self.x = x
+        self.spacing = spacing
+        self.drawn = drawn
+
+        self.items = []
+        self.heights = []  # 每个条目的实测高度，None 表示使用默认高度
+        self.offsets = [0]
+        self.offsets_dirty = False
+        self.default_height = None
+
+        self.visible_rows = {}  # key -> 行控件
+        self.row_pool = []  # 空闲的行控件
+        self._refreshing = False
+
+        self.canvas.configure(yscrollcommand=self.on_scroll)
+        self.canvas.bind("<Configure>", lambda e: self.refresh())
+
+    def on_scroll(self, first, last):
+        """滚动时更新滚动条并补齐可见行"""
+        self.scrollbar.set(first, last)
+        self.refresh()
+
+    def new_row(self):
+        row = self.create_row()
+        if self.drawn:
+            row['item'] = row['tag']
+            row['pos'] = (0, 0)
+            row.setdefault('width', None)
+            self.canvas.itemconfigure(row['item'], state='hidden')
+        else:
+            row['item'] = self.canvas.create_window(
+                self.x, 0, window=row['frame'], anchor="nw", state='hidden'
+            )
+        return row
+
+    def recycle(self, key):
+        """隐藏行控件并放回空闲池"""
+        row = self.visible_rows.pop(key, None)
+        if row is not None:
+            self.canvas.itemconfigure(row['item'], state='hidden')
+            self.row_pool.append(row)
+
+    def _bind(self, row, item, width=None):
+        if self.drawn:
+            if width is not None:
+                row['width'] = width
+            self.bind_row(row, item)
+            # 图元重新画在原点，布局时再移到行的位置
+            row['pos'] = (0, 0)
+        else:
+            self.bind_row(row, item)
+
+    def _place(self, row, y, width):
+        if self.drawn:
+            x0, y0 = row['pos']
+            if (x0, y0) != (self.x, y):
+                self.canvas.move(row['item'], self.x - x0, y - y0)
+                row['pos'] = (self.x, y)
+            self.canvas.itemconfigure(row['item'], state='normal')
+        else:
+            self.canvas.coords(row['item'], self.x, y)
+            self.canvas.itemconfigure(row['item'], state='normal', width=width)
+
+    def all_rows(self):
+        """所有已创建的行控件（包括空闲行）"""
+        return list(self.visible_rows.values()) + self.row_pool
+
+    def find_row(self, key):
+        """查找当前显示的行控件，不在可见范围时返回 None"""
+        return self.visible_rows.get(key)
+
+    def set_items(self, items):
+        """替换全部条目"""
+        for key in list(self.visible_rows):
+            self.recycle(key)
+        # 按需解码的序列直接使用（复制会解码全部条目），其余复制一份
+        self.items = items if isinstance(items, LAZY_SEQUENCES) else list(items)
+        self.heights = [None] * len(self.items)
+        self.offsets_dirty = True
+        self.refresh()
+
+    def insert(self, index, item):
+        self.items.insert(index, item)
+        self.heights.insert(index, None)
+        self.offsets_dirty = True
+        self.refresh()
+
+    def append(self, item):
+        self.insert(len(self.items), item)
+
+    def remove(self, keys):
+        """移除一组条目，只回收它们的行，其余行仅移动位置"""
+        removed = set(keys)
+        if isinstance(self.items, LAZY_SEQUENCES):
+            self._remove_lazy(removed)
+            return
+        kept = [
+            (item, height) for item, height in zip(self.items, self.heights)
+            if self.key(item) not in removed
+        ]
+        self.items = [item for item, _ in kept]
+        self.heights = [height for _, height in kept]
+        for key in removed:
+            self.recycle(key)
+        self.offsets_dirty = True
+        self.refresh()
+
+    def _remove_lazy(self, removed):
+        """从按需解码的序列中移除：可见的条目按行记下的位置定位，不解码其余条目"""
+        indices = {
+            row['index'] for key, row in self.visible_rows.items()
+            if key in removed and row.get('index') is not None
+        }
+        if len(indices) < len(removed):
+            indices.update(i for i, item in enumerate(self.items) if self.key(item) in removed)
+        for i in sorted(indices, reverse=True):
+            del self.items[i]
+            del self.heights[i]
+        for key in removed:
+            self.recycle(key)
+        self.offsets_dirty = True
+        self.refresh()
+
+    def update(self, index, item):
+        """替换一个条目，只重新绑定它自己的行"""
+        old_key = self.key(self.items[index])
+        self.items[index] = item
+        row = self.visible_rows.pop(old_key, None)
+        if row is not None:
+            self._bind(row, item)
+            row['index'] = index
+            self.visible_rows[self.key(item)] = row
+            if not self.uniform:
+                self.measure(index, row)
+        self.refresh()
+
+    def index_of(self, key):
+        """按键查找条目位置（先查可见的行）
+
+        不按对象身份比较：按需解码的序列中，条目被挤出缓存后再次访问会
+        解码出新的对象。
+        """
+        row = self.visible_rows.get(key)
+        if row is not None:
+            i = row.get('index')
+            if i is not None and i < len(self.items) and self.key(self.items[i]) == key:
+                return i
+        for i, existing in enumerate(self.items):
+            if self.key(existing) == key:
+                return i
+        return -1
+
+    def measure(self, index, row):
+        """测量行的实际高度，与记录值不同时返回 True"""
+        if self.drawn:
+            height = row['height'] + self.spacing
+        else:
+            row['frame'].update_idletasks()
+            height = row['frame'].winfo_reqheight() + self.spacing
+        if self.heights[index] == height:
+            return False
+        self.heights[index] = height
+        self.offsets_dirty = True
+        return True
+
+    def rebuild_offsets(self):
+        offsets = [0]
+        total = 0
+        for height in self.heights:
+            total += height if height is not None else self.default_height
+            offsets.append(total)
+        self.offsets = offsets
+        self.offsets_dirty = False
+
+    def refresh(self):
+        """重新计算可见范围并布局行控件"""
+        if self._refreshing:
+            return
+        self._refreshing = True
+        try:
+            with metrics.span('list.refresh'):
+                if self.default_height is None:
+                    # 以一个空行的实际高度作为默认行高
+                    row = self.new_row()
+                    if self.drawn:
+                        self.default_height = row['height'] + self.spacing
+                    else:
+                        row['frame'].update_idletasks()
+                        self.default_height = row['frame'].winfo_reqheight() + self.spacing
+                    self.row_pool.append(row)
+                    self.offsets_dirty = True
+                # 实测高度与估计不同时会改变可见范围，重新布局几次直到稳定
+                for _ in range(3):
+                    if not self.layout():
+                        break
+        finally:
+            self._refreshing = False
+
+    def layout(self):
+        if self.offsets_dirty:
+            self.rebuild_offsets()
+
+        total = len(self.items)
+        width = max(self.canvas.winfo_width() - 2 * self.x, 1)
+        scrollregion = f"0 0 {width} {self.offsets[-1]}"
+        if self.canvas.cget('scrollregion') != scrollregion:
+            self.canvas.configure(scrollregion=scrollregion)
+
+        top = max(self.canvas.canvasy(0), 0)
+        bottom = top + self.canvas.winfo_height()
+        first = min(max(bisect.bisect_right(self.offsets, top) - 1, 0), total)
+        last = min(bisect.bisect_left(self.offsets, bottom), total)
+        wanted = {self.key(self.items[i]): i for i in range(first, last)}
+
+        # 回收离开可见范围的行
+        for key in list(self.visible_rows):
+            if key not in wanted:
+                self.recycle(key)
+
+        # 为进入可见范围的条目绑定行控件
+        changed = False
+        for key, i in wanted.items():
+            row = self.visible_rows.get(key)
+            if row is None:
+                row = self.row_pool.pop() if self.row_pool else self.new_row()
+                self._bind(row, self.items[i], width)
+                metrics.count('list.rows_bound')
+                self.visible_rows[key] = row
+                if not self.uniform and self.measure(i, row):
+                    changed = True
+            elif self.drawn and row['width'] != width:
+                # 绘制的行随宽度重新排版（按钮靠右、文字折行）
+                self._bind(row, self.items[i], width)
+                if not self.uniform and self.measure(i, row):
+                    changed = True
+            row['index'] = i
+            self._place(row, self.offsets[i] + self.spacing // 2, width)
+        return changed
@@ -0,0 +1,96 @@
+import hashlib
+import json
+import threading
+from instrumentation import metrics
+
+
+def content_hash(value):
+    """计算待写入内容的哈希，用于跳过内容没有变化的写入"""
+    text = value if isinstance(value, str) else json.dumps(value, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+class WriteBuffer:
+    """延迟写入缓冲：同一个键在 delay 秒内的多次写入只保留最后一次
+
+    与上次写入（或读取）内容哈希相同的写入直接跳过。到期的写入交给
+    IOWorker 在后台执行，flush() 立即提交所有排队的写入。写入成功后才
+    记下它的哈希，写入失败的内容下次保存时会重新写入。
+    """
+
+    def __init__(self, io, delay=0.5):
+        self.io = io
+        self.delay = delay
+        self._lock = threading.Lock()
+        self._pending = {}  # 键 -> (写入函数, 参数, 内容哈希)
+        self._hashes = {}  # 键 -> 最后一次写入成功或读取的内容哈希
+        self._submitted = {}  # 键 -> 已提交、还没有写完的内容哈希
+        self._timer = None
+
+    def remember(self, key, value):
+        """记录磁盘上已有的内容（读取之后调用）"""
+        with self._lock:
+            self._hashes[key] = content_hash(value)
+
+    def forget(self, key):
+        """丢弃键的哈希和排队中的写入（数据被删除时调用）"""
+        with self._lock:
+            self._hashes.pop(key, None)
+            self._submitted.pop(key, None)
+            self._pending.pop(key, None)
+
+    def put(self, key, value, func, *args):
+        """排队写入 func(*args)，value 是用于比较的内容；返回是否真的排队"""
+        digest = content_hash(value)
+        with self._lock:
+            # 已提交的写入完成后磁盘上就是它的内容
+            if self._submitted.get(key, self._hashes.get(key)) == digest:
+                # 内容与磁盘上一致，丢弃排队中的旧写入即可
+                self._pending.pop(key, None)
+                metrics.count('write_buffer.unchanged')
+                return False
+            pending = self._pending.get(key)
+            if pending is not None and pending[2] == digest:
+                metrics.count('write_buffer.unchanged')
+                return False
+            if pending is not None:
+                metrics.count('write_buffer.coalesced')
+            self._pending[key] = (func, args, digest)
+            # 每次写入都重新计时，连续修改结束后才真正写入
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = threading.Timer(self.delay, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+        return True
+
+    def flush(self, key=None):
+        """立即提交排队的写入（可只提交一个键）"""
+        with self._lock:
+            if key is None:
+                pending = self._pending
+                self._pending = {}
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+            else:
+                pending = {}
+                if key in self._pending:
+                    pending[key] = self._pending.pop(key)
+            for k, (func, args, digest) in pending.items():
+                self._submitted[k] = digest
+                self.io.submit_write(k, self._write, k, digest, func, args, coalesce=True)
+
+    def _write(self, key, digest, func, args):
+        """在写入线程中执行一次写入，成功后记下内容哈希"""
+        try:
+            func(*args)
+        except Exception:
+            with self._lock:
+                if self._submitted.get(key) == digest:
+                    del self._submitted[key]
+            raise
+        with self._lock:
+            self._hashes[key] = digest
+            if self._submitted.get(key) == digest:
+                del self._submitted[key]